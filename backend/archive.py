@@ -0,0 +1,290 @@
+"""
+Archival of old inquiries, to keep `inquiries` and its indexes small.
+
+Closed inquiries created more than ARCHIVE_AFTER_DAYS ago are moved, in batches
+of ARCHIVE_BATCH_SIZE with one transaction each, to `inquiries_archive`: their
+text, contact details and responses become one compressed JSON document per
+inquiry, and their rows in `inquiries` and `responses`, along with their
+finished classification jobs, are deleted. Inquiries with a pending
+classification or email are left for a later run.
+
+On Postgres the archive is partitioned by month of `created_at`; the partition
+of a month is created when its first inquiry is archived, and old months can
+be detached or dropped as a whole. On SQLite it is a plain table.
+
+`GET /api/inquiries/{id}` falls back to the archive, so archived inquiries can
+still be looked up, read-only. They no longer appear in lists, the open queue,
+search or exports; the daily counts of the statistics keep them.
+
+    python archive.py [--older-than-days 180] [--batch-size 500] [--dry-run]
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import date, datetime, timedelta
+
+import zstandard
+from sqlalchemy import delete, exists, func, insert, select, text, update
+
+from database import (
+    AsyncSessionLocal, async_engine, ClassificationJob, EmailOutboxEntry, InquiryArchiveRecord, InquiryRecord,
+    ResponseRecord,
+)
+from inquiry_status import CLOSED
+from observability import ARCHIVED_INQUIRIES
+import events
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# "zstd" or "zlib". Every row records its codec, so changing this only affects new rows.
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "zstd")
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "6"))
+
+CODECS = {
+    "zstd": (
+        lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    ),
+    "zlib": (zlib.compress, zlib.decompress),
+}
+
+
+def encode_payload(document: dict) -> bytes:
+    return json.dumps(document, separators=(",", ":")).encode()
+
+def compress_payload(payload: bytes, codec: str = ARCHIVE_CODEC, level: int = ARCHIVE_COMPRESSION_LEVEL) -> bytes:
+    compress, _ = CODECS[codec]
+    return compress(payload, level)
+
+def decode_payload(payload: bytes, codec: str) -> dict:
+    _, decompress = CODECS[codec]
+    return json.loads(decompress(payload))
+
+
+class ArchiveReport:
+    def __init__(self):
+        self.batches = 0
+        self.archived = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self._started = time.perf_counter()
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "batches": self.batches,
+            "archived": self.archived,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None,
+            "seconds": round(elapsed, 3),
+            "inquiries_per_second": round(self.archived / elapsed, 1) if elapsed else None,
+        }
+
+
+def _month(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+async def ensure_partitions(db, months):
+    """
+    Creates the monthly partitions of `inquiries_archive` that do not exist
+    yet. Only needed, and only done, on Postgres.
+    """
+    if async_engine.dialect.name != "postgresql":
+        return
+    table = InquiryArchiveRecord.__tablename__
+    for month in sorted(set(months)):
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_{month:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+
+def archivable(cutoff: datetime):
+    """
+    Closed inquiries created before `cutoff` without pending work, oldest first.
+    """
+    return (
+        select(InquiryRecord.id)
+        .where(
+            InquiryRecord.status == CLOSED,
+            InquiryRecord.created_at < cutoff,
+            ~exists().where(
+                ClassificationJob.inquiry_id == InquiryRecord.id,
+                ClassificationJob.status.in_(("pending", "running")),
+            ),
+            ~exists().where(
+                EmailOutboxEntry.inquiry_id == InquiryRecord.id,
+                EmailOutboxEntry.status.in_(("pending", "sending")),
+            ),
+        )
+        .order_by(InquiryRecord.created_at, InquiryRecord.id)
+    )
+
+async def archive_batch(db, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE, report: ArchiveReport = None) -> int:
+    """
+    Moves up to `batch_size` archivable inquiries to the archive in the
+    current transaction. The caller commits.
+
+    :return: The number of archived inquiries; 0 once there are none left.
+    """
+    # On Postgres the rows stay locked until the commit, so that a concurrent
+    # reopen either happens before and keeps the inquiry out, or waits and 404s.
+    inquiry_ids = (await db.execute(
+        archivable(cutoff).limit(batch_size).with_for_update(of=InquiryRecord, skip_locked=True)
+    )).scalars().all()
+    if not inquiry_ids:
+        return 0
+
+    records = (await db.execute(select(InquiryRecord).where(InquiryRecord.id.in_(inquiry_ids)))).scalars().all()
+    threads = {inquiry_id: [] for inquiry_id in inquiry_ids}
+    for r in (await db.execute(
+        select(ResponseRecord)
+        .where(ResponseRecord.inquiry_id.in_(inquiry_ids))
+        .order_by(ResponseRecord.created_at, ResponseRecord.id)
+    )).scalars():
+        threads[r.inquiry_id].append({
+            "id": r.id,
+            "response": r.response_text,
+            "responder": r.responder,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        })
+
+    await ensure_partitions(db, (_month(record.created_at) for record in records))
+    now = datetime.utcnow()
+    rows = []
+    for record in records:
+        document = {
+            "name": record.name,
+            "email": record.email,
+            "inquiry": record.inquiry_text,
+            "summary": record.summary,
+            "responses": threads[record.id],
+        }
+        raw = encode_payload(document)
+        payload = compress_payload(raw)
+        if report:
+            report.raw_bytes += len(raw)
+            report.stored_bytes += len(payload)
+        rows.append({
+            "id": record.id,
+            "created_at": record.created_at,
+            "archived_at": now,
+            "category": record.category,
+            "urgency": record.urgency,
+            "status": record.status,
+            "response_count": record.response_count,
+            "external_id": record.external_id,
+            "codec": ARCHIVE_CODEC,
+            "payload": payload,
+        })
+    await db.execute(insert(InquiryArchiveRecord), rows)
+
+    await db.execute(delete(ResponseRecord).where(ResponseRecord.inquiry_id.in_(inquiry_ids)))
+    await db.execute(delete(ClassificationJob).where(ClassificationJob.inquiry_id.in_(inquiry_ids)))
+    # Sent and failed emails stay in the outbox's history, detached from the inquiry.
+    await db.execute(
+        update(EmailOutboxEntry).where(EmailOutboxEntry.inquiry_id.in_(inquiry_ids)).values(inquiry_id=None)
+    )
+    await db.execute(delete(InquiryRecord).where(InquiryRecord.id.in_(inquiry_ids)))
+    # Bumps the table version, so that cached lists that showed these inquiries
+    # are rebuilt, and tells open dashboards to drop their rows.
+    await events.record_events(db, inquiry_ids, events.INQUIRY_ARCHIVED)
+    return len(rows)
+
+async def archive_inquiries(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                            max_batches: int = None, on_batch=None) -> ArchiveReport:
+    """
+    Archives batch after batch until nothing is left to archive.
+
+    :param on_batch: Called with the report after every committed batch.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    report = ArchiveReport()
+    while max_batches is None or report.batches < max_batches:
+        async with AsyncSessionLocal() as db:
+            archived = await archive_batch(db, cutoff, batch_size, report)
+            await db.commit()
+        if not archived:
+            break
+        report.batches += 1
+        report.archived += archived
+        ARCHIVED_INQUIRIES.inc(archived)
+        logger.info("Archived inquiries", extra={"batch": report.batches, "archived": archived})
+        if on_batch:
+            on_batch(report)
+    return report
+
+async def count_archivable(db, older_than_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    return (await db.execute(select(func.count()).select_from(archivable(cutoff).subquery()))).scalar()
+
+async def get_archived(db, inquiry_id: int):
+    """
+    :return: The archived inquiry in the shape of `GET /api/inquiries/{id}`,
+             plus `archived_at`, or None if it is not archived.
+    """
+    record = (await db.execute(
+        select(InquiryArchiveRecord).where(InquiryArchiveRecord.id == inquiry_id).limit(1)
+    )).scalar_one_or_none()
+    if record is None:
+        return None
+    document = decode_payload(record.payload, record.codec)
+    return {
+        "id": record.id,
+        "name": document["name"],
+        "email": document["email"],
+        "inquiry": document["inquiry"],
+        "category": record.category,
+        "urgency": record.urgency,
+        "summary": document["summary"],
+        "status": record.status,
+        "response_count": record.response_count,
+        "created_at": record.created_at.isoformat(),
+        "archived_at": record.archived_at.isoformat(),
+        "responses": document["responses"],
+    }
+
+async def archived_external_ids(db, external_ids: list) -> set:
+    """
+    :return: Those of `external_ids` that belong to archived inquiries.
+    """
+    if not external_ids:
+        return set()
+    return set((await db.execute(
+        select(InquiryArchiveRecord.external_id).where(InquiryArchiveRecord.external_id.in_(external_ids))
+    )).scalars())
+
+
+async def _run(older_than_days: int, batch_size: int, dry_run: bool) -> dict:
+    if dry_run:
+        async with AsyncSessionLocal() as db:
+            return {"archivable": await count_archivable(db, older_than_days)}
+
+    def progress(report: ArchiveReport):
+        status = report.as_dict()
+        print(f"batch {status['batches']}: {status['archived']} archived ({status['inquiries_per_second']} inquiries/s)")
+
+    report = await archive_inquiries(older_than_days, batch_size, on_batch=progress)
+    return report.as_dict()
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import init_db
+
+    arg_parser = argparse.ArgumentParser(description="Moves old closed inquiries to the archive.")
+    arg_parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    arg_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    arg_parser.add_argument("--dry-run", action="store_true", help="Only count the inquiries that would be archived")
+    args = arg_parser.parse_args()
+
+    init_db()
+    print(json.dumps(asyncio.run(_run(args.older_than_days, args.batch_size, args.dry_run)), indent=2))
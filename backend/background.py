@@ -0,0 +1,169 @@
+"""
+Runs the classification workers and the email sender in one process of the
+deployment.
+
+Under gunicorn every worker process runs the app, but `SES_MAX_SEND_RATE` and
+`CLASSIFICATION_MAX_CONCURRENCY` are limits of the AWS account, so N processes
+each running their own sender and workers would send N times as fast. Instead,
+every process tries to take a cross-process lock (a Postgres advisory lock, or
+a lock file next to a SQLite database), and only the holder starts the
+background workers. The others try again every `BACKGROUND_LOCK_RETRY`
+seconds, so one of them takes over when the holder exits. With
+`RUN_BACKGROUND_WORKERS=false` a process never runs them, e.g. on web-only hosts.
+"""
+import asyncio
+import logging
+import os
+
+from sqlalchemy import text
+
+from database import async_engine
+
+logger = logging.getLogger(__name__)
+
+RUN_BACKGROUND_WORKERS = os.getenv("RUN_BACKGROUND_WORKERS", "true").lower() == "true"
+BACKGROUND_LOCK_RETRY = float(os.getenv("BACKGROUND_LOCK_RETRY", "10"))
+# Arbitrary, but fixed: every process must lock the same key.
+BACKGROUND_LOCK_KEY = 727_151_002
+
+
+class BackgroundLock:
+    """
+    Non-blocking, cross-process lock held for as long as this process runs the
+    background workers. It is released when the process exits, however it exits.
+    """
+
+    def __init__(self, engine=async_engine):
+        self.engine = engine
+        self._connection = None
+        self._lock_file = None
+
+    async def acquire(self) -> bool:
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            connection = await self.engine.connect()
+            try:
+                await connection.execution_options(isolation_level="AUTOCOMMIT")
+                locked = await connection.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": BACKGROUND_LOCK_KEY})
+            except Exception:
+                await connection.close()
+                raise
+            if not locked:
+                await connection.close()
+                return False
+            self._connection = connection
+            return True
+
+        database = self.engine.url.database
+        if dialect != "sqlite" or not database or database == ":memory:":
+            return True
+
+        import fcntl
+
+        lock_file = open(f"{database}.workers.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def held(self) -> bool:
+        """
+        :return: False if the lock was lost, e.g. because the database closed
+                 the connection that holds it.
+        """
+        if self._connection is None:
+            return True
+        try:
+            await self._connection.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def release(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            try:
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": BACKGROUND_LOCK_KEY})
+                await connection.close()
+            except Exception:
+                # A session lock outlives the connection in the pool; never return it there.
+                await connection.invalidate()
+        if self._lock_file is not None:
+            # Closing the file releases the flock.
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class BackgroundWorkers:
+    """
+    Starts the given workers (anything with async `start` and `stop`) once this
+    process holds the background lock, and stops them if it loses the lock.
+    """
+
+    def __init__(self, workers: list, enabled: bool = RUN_BACKGROUND_WORKERS,
+                 retry_interval: float = BACKGROUND_LOCK_RETRY, lock: BackgroundLock = None):
+        self.workers = workers
+        self.enabled = enabled
+        self.retry_interval = retry_interval
+        self.lock = lock or BackgroundLock()
+        self.state = "disabled" if not enabled else "stopped"
+        self._stopping = None
+        self._task = None
+
+    async def start(self):
+        if not self.enabled or self._task:
+            return
+        self._stopping = asyncio.Event()
+        self.state = "standby"
+        self._task = asyncio.create_task(self._run(), name="background-workers")
+
+    async def stop(self, timeout: float = 15.0):
+        if not self._task:
+            return
+        self._stopping.set()
+        _, still_running = await asyncio.wait([self._task], timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        self._task = None
+        if self.state == "running":
+            await self._stop_workers()
+        self.state = "stopped"
+
+    async def _stop_workers(self):
+        for worker in reversed(self.workers):
+            await worker.stop()
+        await self.lock.release()
+
+    async def _wait(self) -> bool:
+        """
+        :return: True if the process is stopping.
+        """
+        try:
+            await asyncio.wait_for(self._stopping.wait(), self.retry_interval)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                if self.state == "standby" and await self.lock.acquire():
+                    try:
+                        for worker in self.workers:
+                            await worker.start()
+                    except Exception:
+                        await self._stop_workers()
+                        raise
+                    self.state = "running"
+                    logger.info("Running the background workers in this process", extra={"pid": os.getpid()})
+                elif self.state == "running" and not await self.lock.held():
+                    logger.warning("Lost the background lock, stopping the background workers")
+                    self.state = "standby"
+                    await self._stop_workers()
+            except Exception:
+                logger.exception("Background worker election failed")
+            if await self._wait():
+                return
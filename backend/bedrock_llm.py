@@ -1,45 +1,97 @@
-from langchain_aws import ChatBedrock
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+# LangChain is imported where it is used: it takes about a second to import,
+# which would otherwise delay every process start and `/api/health`.
 from pydantic import BaseModel
 from typing import Literal
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+MODEL_ID = "mistral.mistral-small-2402-v1:0"
 
 class InquiryClassification(BaseModel):
     category: Literal["Technical", "Billing", "Sales", "General", "N/A"]
     urgency: Literal["High", "Medium", "Low", "N/A"]
     summary: str
 
+def build_chain(model):
+    """
+    Builds the classification chain around any LangChain chat model, so a fake
+    model can stand in for Bedrock in tests and benchmarks.
+    """
+    from langchain_core.output_parsers import JsonOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    parser = JsonOutputParser(pydantic_object=InquiryClassification)
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You are an AI assistant that classifies customer inquiries.\n"
+                   "Decide the correct values strictly based on the inquiry.\n" 
+                   "Valid values:\n" 
+                   "- category: 'Technical', 'Billing', 'Sales', 'General', or 'N/A'\n" 
+                   "- urgency: 'High', 'Medium', 'Low', or 'N/A'\n" 
+                   "- summary: one short sentence.\n\n" 
+                   "Guidelines:\n" 
+                   "- If the inquiry is about bugs, errors, or something not working → 'Technical'.\n" 
+                   "- If it's about invoices, payments, refunds, subscriptions → 'Billing'.\n" 
+                   "- If it's about pricing, plans, discounts, buying something → 'Sales'.\n" 
+                   "- Otherwise → 'General'.\n\n" 
+                   "Do not always default to 'Technical' or 'High'.\n"),
+        ("human", "Customer inquiry: {inquiry_text}"),
+        ("system", "{format_instructions}"),
+    ])
+
+    chain = prompt | model | parser
+    return chain, parser
+
+def chain_fingerprint(chain) -> str:
+    """
+    Identifies the prompt and model behind a chain. Cached classifications are
+    only reused for the same fingerprint, so changing either invalidates them.
+    """
+    prompt = chain.first
+    model = chain.middle[0] if chain.middle else None
+    model_id = getattr(model, "model_id", None) or type(model).__name__
+    model_kwargs = getattr(model, "model_kwargs", None) or {}
+    temperature = getattr(model, "temperature", None)
+    source = "\n".join([prompt.pretty_repr(), str(model_id), repr(sorted(model_kwargs.items())), repr(temperature)])
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
 def get_llm_chain():
     try:
+        from langchain_aws import ChatBedrock
+
         model = ChatBedrock(
-            model_id="mistral.mistral-small-2402-v1:0",
+            model_id=MODEL_ID,
             region_name="us-east-1",
             model_kwargs={"temperature": 0.1},
         )
-
-        parser = JsonOutputParser(pydantic_object=InquiryClassification)
-
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an AI assistant that classifies customer inquiries.\n"
-                       "Decide the correct values strictly based on the inquiry.\n" 
-                       "Valid values:\n" 
-                       "- category: 'Technical', 'Billing', 'Sales', 'General', or 'N/A'\n" 
-                       "- urgency: 'High', 'Medium', 'Low', or 'N/A'\n" 
-                       "- summary: one short sentence.\n\n" 
-                       "Guidelines:\n" 
-                       "- If the inquiry is about bugs, errors, or something not working → 'Technical'.\n" 
-                       "- If it's about invoices, payments, refunds, subscriptions → 'Billing'.\n" 
-                       "- If it's about pricing, plans, discounts, buying something → 'Sales'.\n" 
-                       "- Otherwise → 'General'.\n\n" 
-                       "Do not always default to 'Technical' or 'High'.\n"),
-            ("human", "Customer inquiry: {inquiry_text}"),
-            ("system", "{format_instructions}"),
-        ])
-
-        chain = prompt | model | parser
-        return chain, parser
-    except Exception as e:
-        print(f"FATAL: Failed to initialize LangChain components on startup: {e}")
+        return build_chain(model)
+    except Exception:
+        logger.critical("Failed to initialize LangChain components", exc_info=True)
         return None, None
 
-chain, parser = get_llm_chain()
+_chain = None
+_chain_lock = threading.Lock()
+
+def chain_state() -> str:
+    """
+    :return: "not_initialized" before the first `get_chain()`, then "ready" or
+             "failed".
+    """
+    if _chain is None:
+        return "not_initialized"
+    return "ready" if _chain[0] is not None else "failed"
+
+def get_chain():
+    """
+    Returns the Bedrock chain and its parser, building them on first use rather
+    than when the module is imported, so that importing the app (e.g. in every
+    worker process, or in scripts) creates no LLM client.
+    """
+    global _chain
+    with _chain_lock:
+        if _chain is None:
+            _chain = get_llm_chain()
+        return _chain
@@ -0,0 +1,110 @@
+"""
+Benchmarks the local rendering of outbox emails (see email_rendering.py).
+
+Renders `--messages` emails, alternating between the confirmation and the
+response template, with inquiry texts of `--text-size` characters that contain
+markup to escape, and reports emails per second and microseconds per email for:
+
+- `render`: the precompiled templates, as the outbox worker renders them,
+- `render+mime`: the same plus building the MIME message and serializing it to
+  the bytes that SES or SMTP receive,
+- `compile+render`: compiling the templates again for every email, i.e. what
+  rendering would cost without the cache.
+
+    python -m benchmarks.bench_email_render --messages 20000 --text-size 2000
+"""
+import argparse
+import json
+import random
+import time
+
+import email_rendering
+
+SENDER = "support@example.com"
+
+
+def sample_data(count: int, text_size: int) -> list:
+    rng = random.Random(42)
+    words = ["invoice", "refund", "<b>urgent</b>", "delivery", "R&D", "\"quoted\"", "login", "order", "\n"]
+    samples = []
+    for i in range(count):
+        text = ""
+        while len(text) < text_size:
+            text += rng.choice(words) + " "
+        if i % 2:
+            samples.append((email_rendering.RESPONSE_TEMPLATE, email_rendering.response_email_data(
+                i, "Thank you for your patience, we have fixed this for you.", text[:text_size],
+            )))
+        else:
+            samples.append((email_rendering.CONFIRMATION_TEMPLATE, email_rendering.confirmation_email_data(
+                f"Customer {i}", i, text[:text_size],
+            )))
+    return samples
+
+def render(samples: list) -> int:
+    size = 0
+    for template_name, data in samples:
+        rendered = email_rendering.render(template_name, data)
+        size += len(rendered.html) + len(rendered.text)
+    return size
+
+def render_mime(samples: list) -> int:
+    size = 0
+    for i, (template_name, data) in enumerate(samples):
+        rendered = email_rendering.render(template_name, data)
+        size += len(email_rendering.build_message(SENDER, f"customer{i}@example.com", rendered).as_bytes())
+    return size
+
+def compile_render(samples: list) -> int:
+    size = 0
+    for template_name, data in samples:
+        email_rendering._compiled.clear()
+        rendered = email_rendering.render(template_name, data)
+        size += len(rendered.html) + len(rendered.text)
+    return size
+
+def run(name: str, function, samples: list) -> dict:
+    started = time.perf_counter()
+    size = function(samples)
+    elapsed = time.perf_counter() - started
+    return {
+        "scenario": name,
+        "messages": len(samples),
+        "seconds": elapsed,
+        "messages_per_second": len(samples) / elapsed,
+        "us_per_message": elapsed / len(samples) * 1e6,
+        "bytes_per_message": size / len(samples),
+    }
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--messages", type=int, default=20000)
+    arg_parser.add_argument("--text-size", type=int, default=500, help="Characters of inquiry text per email")
+    arg_parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    args = arg_parser.parse_args()
+
+    samples = sample_data(args.messages, args.text_size)
+    email_rendering.load_templates()
+    # Compiling is far slower, so a tenth of the emails suffice to measure it.
+    scenarios = (
+        ("render", render, samples),
+        ("render+mime", render_mime, samples),
+        ("compile+render", compile_render, samples[:max(1, len(samples) // 10)]),
+    )
+    results = []
+    print(f"{'scenario':<16} {'messages':>9} {'emails/s':>10} {'us/email':>9} {'bytes/email':>12}")
+    for name, function, scenario_samples in scenarios:
+        result = run(name, function, scenario_samples)
+        results.append(result)
+        print(
+            f"{name:<16} {result['messages']:>9} {result['messages_per_second']:>10.0f} "
+            f"{result['us_per_message']:>9.1f} {result['bytes_per_message']:>12.0f}"
+        )
+    email_rendering.load_templates()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
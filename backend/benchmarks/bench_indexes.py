@@ -0,0 +1,169 @@
+"""
+Benchmarks the dashboard queries on a seeded inquiries table before and after
+the index migration, printing query plans and median timings.
+
+    python -m benchmarks.bench_indexes --rows 1000000
+    python -m benchmarks.bench_indexes --database-url postgresql://user:pw@localhost/bench
+
+The target database is wiped, so never point it at a real one.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text, bindparam, DateTime
+
+from database import Base, InquiryRecord
+from migrations import run_migrations
+from search import FTS_TABLE
+
+CATEGORIES = ["Technical", "Billing", "Sales", "General", "N/A"]
+URGENCIES = ["High", "Medium", "Low", "N/A"]
+MIGRATED_INDEXES = [
+    "ix_inquiries_created_at_id",
+    "ix_inquiries_category_created_at_id",
+    "ix_inquiries_urgency_created_at_id",
+    "ix_inquiries_email",
+]
+LIST_COLUMNS = "id, name, email, category, urgency, summary, created_at"
+
+
+def build_queries(now: datetime, rows: int):
+    date_params = [bindparam("created_from", type_=DateTime), bindparam("created_to", type_=DateTime)]
+    cursor_params = [bindparam("cursor_created_at", type_=DateTime)]
+    return {
+        "first page": (
+            text(f"SELECT {LIST_COLUMNS} FROM inquiries ORDER BY created_at DESC, id DESC LIMIT 51"),
+            {},
+        ),
+        "category page": (
+            text(
+                f"SELECT {LIST_COLUMNS} FROM inquiries WHERE category = :category "
+                "ORDER BY created_at DESC, id DESC LIMIT 51"
+            ),
+            {"category": "Billing"},
+        ),
+        "urgency + date range": (
+            text(
+                f"SELECT {LIST_COLUMNS} FROM inquiries WHERE urgency = :urgency "
+                "AND created_at >= :created_from AND created_at < :created_to "
+                "ORDER BY created_at DESC, id DESC LIMIT 51"
+            ).bindparams(*date_params),
+            {"urgency": "High", "created_from": now - timedelta(days=60), "created_to": now - timedelta(days=30)},
+        ),
+        "deep cursor page": (
+            text(
+                f"SELECT {LIST_COLUMNS} FROM inquiries "
+                "WHERE (created_at, id) < (:cursor_created_at, :cursor_id) "
+                "ORDER BY created_at DESC, id DESC LIMIT 51"
+            ).bindparams(*cursor_params),
+            {"cursor_created_at": now - timedelta(days=365), "cursor_id": rows // 2},
+        ),
+        "email lookup": (
+            text(f"SELECT {LIST_COLUMNS} FROM inquiries WHERE email = :email ORDER BY created_at DESC"),
+            {"email": "customer42@example.com"},
+        ),
+    }
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        if connection.dialect.name == "sqlite":
+            connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for name in MIGRATED_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        # Mark everything but the index migration as applied.
+        connection.execute(text(
+            "CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, "
+            "description VARCHAR(255) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+        connection.execute(
+            text("INSERT INTO schema_migrations VALUES (1, 'seeded by benchmark', :now)"),
+            {"now": datetime.utcnow()},
+        )
+
+def seed(engine, rows: int, now: datetime, chunk_size: int = 10000):
+    rng = random.Random(42)
+    table = InquiryRecord.__table__
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        for offset in range(0, rows, chunk_size):
+            connection.execute(table.insert(), [
+                {
+                    "name": f"Customer {i}",
+                    "email": f"customer{rng.randrange(50000)}@example.com",
+                    "inquiry_text": "Lorem ipsum dolor sit amet " * rng.randint(2, 20),
+                    "category": rng.choice(CATEGORIES),
+                    "urgency": rng.choice(URGENCIES),
+                    "summary": "Seeded inquiry.",
+                    "created_at": now - timedelta(seconds=rng.randrange(2 * 365 * 86400)),
+                }
+                for i in range(offset, min(offset + chunk_size, rows))
+            ])
+    print(f"Seeded {rows} rows in {time.perf_counter() - started:.1f}s")
+
+def analyze(engine):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+
+def explain(connection, query, params) -> str:
+    if connection.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    else:
+        prefix = "EXPLAIN QUERY PLAN "
+    plan_query = text(prefix + query.text).bindparams(*query._bindparams.values())
+    rows = connection.execute(plan_query, params).fetchall()
+    return "\n".join("    " + " | ".join(str(column) for column in row) for row in rows)
+
+def measure(engine, queries: dict, repeat: int) -> dict:
+    timings = {}
+    with engine.connect() as connection:
+        for name, (query, params) in queries.items():
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                connection.execute(query, params).fetchall()
+                samples.append(time.perf_counter() - started)
+            timings[name] = statistics.median(samples)
+            print(f"  {name}: {timings[name] * 1000:.2f} ms")
+            print(explain(connection, query, params))
+    return timings
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--database-url", default="sqlite:///./bench_indexes.db")
+    arg_parser.add_argument("--rows", type=int, default=1_000_000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    now = datetime.utcnow()
+    queries = build_queries(now, args.rows)
+
+    reset_schema(engine)
+    seed(engine, args.rows, now)
+    analyze(engine)
+
+    print("\nBefore migration:")
+    before = measure(engine, queries, args.repeat)
+
+    started = time.perf_counter()
+    run_migrations(engine, target=2)
+    print(f"\nMigration took {time.perf_counter() - started:.1f}s")
+    analyze(engine)
+
+    print("\nAfter migration:")
+    after = measure(engine, queries, args.repeat)
+
+    print(f"\n{'query':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in queries:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<22} {before[name] * 1000:>10.2f} {after[name] * 1000:>10.2f} {speedup:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
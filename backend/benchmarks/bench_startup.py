@@ -0,0 +1,153 @@
+"""
+Startup benchmark: how long importing the app takes, and how long a fresh
+uvicorn process needs until it answers liveness and readiness probes.
+
+Import time comes from `python -X importtime -c "import main"`, with the
+slowest direct imports of `main` listed. Every measurement runs in a new
+process on a scratch SQLite database, and the median of `--runs` is reported.
+Pass several `--app-dir`s to compare checkouts, e.g. a worktree of an older
+commit:
+
+    python -m benchmarks.bench_startup
+    git worktree add /tmp/before <commit>
+    python -m benchmarks.bench_startup --app-dir /tmp/before/backend --app-dir .
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_env(database: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{database}",
+        "FAST_CLASSIFIER_ENABLED": "false",
+        "LOG_LEVEL": "ERROR",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    env.pop("ASYNC_DATABASE_URL", None)
+    return env
+
+def measure_imports(app_dir: str, database: str) -> dict:
+    """
+    :return: The cumulative import time of `main` and of each module it
+             imports directly, by top-level package, in seconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=app_dir, env=app_env(database), capture_output=True, text=True, check=True,
+    )
+    packages = defaultdict(float)
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        cumulative, name = cumulative.strip(), raw_name.strip()
+        if not cumulative.isdigit():
+            continue
+        # Nested imports are indented by two more spaces per level.
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if name == "main":
+            total = int(cumulative) / 1e6
+        elif depth == 1:
+            packages[name.split(".")[0]] += int(cumulative) / 1e6
+    return {"total": total, "packages": dict(packages)}
+
+def measure_startup(app_dir: str, database: str, port: int, timeout: float) -> dict:
+    """
+    :return: Seconds from spawning uvicorn until liveness answered 200, and
+             until readiness did (None if the app has no readiness endpoint).
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, env=app_env(database), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - started < timeout and ready is None:
+                try:
+                    if live is None and client.get("/api/health").status_code == 200:
+                        live = time.perf_counter() - started
+                    if live is not None:
+                        response = client.get("/api/health/ready")
+                        if response.status_code == 404:
+                            break
+                        if response.status_code == 200:
+                            ready = time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait()
+    return {"live": live, "ready": ready}
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+def benchmark(app_dir: str, args) -> dict:
+    imports, startups = [], []
+    with tempfile.TemporaryDirectory() as scratch:
+        for run in range(args.runs):
+            database = os.path.join(scratch, f"startup_{run}.db")
+            imports.append(measure_imports(app_dir, database))
+            startups.append(measure_startup(app_dir, database, args.port, args.timeout))
+
+    packages = defaultdict(list)
+    for run in imports:
+        for name, seconds in run["packages"].items():
+            packages[name].append(seconds)
+    slowest = sorted(((name, median(values)) for name, values in packages.items()), key=lambda p: -p[1])
+    return {
+        "app_dir": os.path.abspath(app_dir),
+        "import_seconds": median([run["total"] for run in imports]),
+        "live_seconds": median([run["live"] for run in startups]),
+        "ready_seconds": median([run["ready"] for run in startups]),
+        "slowest_imports": dict(slowest[:args.top]),
+    }
+
+def report(results: list):
+    def ms(value):
+        return f"{value * 1000:>10.0f}" if value is not None else f"{'-':>10}"
+
+    print(f"\n{'app':<40} {'import ms':>10} {'live ms':>10} {'ready ms':>10}")
+    for result in results:
+        print(f"{result['app_dir'][-40:]:<40} {ms(result['import_seconds'])} "
+              f"{ms(result['live_seconds'])} {ms(result['ready_seconds'])}")
+    for result in results:
+        print(f"\nslowest imports of {result['app_dir']}:")
+        for name, seconds in result["slowest_imports"].items():
+            print(f"  {name:<30} {seconds * 1000:>8.0f} ms")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--app-dir", action="append", help="Backend directory; may be repeated")
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("--port", type=int, default=8766)
+    arg_parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for readiness")
+    arg_parser.add_argument("--top", type=int, default=8, help="Number of slowest imports to list")
+    arg_parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    args = arg_parser.parse_args()
+
+    results = [benchmark(app_dir, args) for app_dir in args.app_dir or [BACKEND_DIR]]
+    report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Load test for the HTTP request path with local stand-ins for Bedrock and SES.
+
+Starts the app with uvicorn on a fresh SQLite database, replaces the chat model
+with a fake one and the SES calls with a fixed delay, and then has concurrent
+clients submit inquiries, page through the manager list and open inquiries.
+Reports requests per second and latency percentiles per route.
+
+    python -m benchmarks.load_test --clients 50 --duration 20
+    python -m benchmarks.load_test --app-dir /path/to/other/checkout/backend
+
+`--app-dir` loads `main` from another checkout, which allows comparing two
+versions of the app with the same harness. The database file is wiped.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+import uvicorn
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import Runnable
+
+FAKE_CLASSIFICATION = json.dumps({
+    "category": "Billing",
+    "urgency": "Medium",
+    "summary": "Customer asks about an invoice.",
+})
+
+
+class SlowFakeChatModel(FakeListChatModel):
+    """
+    Fake chat model that waits `latency` seconds per call, blocking in the sync
+    path and yielding to the event loop in the async one, like a real client.
+    A `failure_rate` share of calls raises after the wait, like a throttled or
+    timed out Bedrock call.
+    """
+    latency: float = 0.5
+    failure_rate: float = 0.0
+
+    # FakeListChatModel's own batch methods fail the whole batch if one call
+    # fails; real chat models fail per input.
+    batch = Runnable.batch
+    abatch = Runnable.abatch
+
+    def _maybe_fail(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("Simulated LLM failure")
+
+    def _generate(self, *args, **kwargs):
+        time.sleep(self.latency)
+        self._maybe_fail()
+        return super()._generate(*args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return super()._generate(*args, **kwargs)
+
+
+def fake_email_sender(original, latency: float):
+    """
+    Stand-in for an SES send function with the same sync/async signature as
+    `original`.
+    """
+    if inspect.iscoroutinefunction(original):
+        async def send(*args, **kwargs):
+            await asyncio.sleep(latency)
+            return "load-test-message-id"
+    else:
+        def send(*args, **kwargs):
+            time.sleep(latency)
+            return "load-test-message-id"
+    return send
+
+def fake_bulk_email_sender(latency: float):
+    async def send(template_name, destinations):
+        await asyncio.sleep(latency)
+        return [{"Status": "Success", "MessageId": "load-test-message-id"} for _ in destinations]
+    return send
+
+def load_app(args):
+    if args.app_dir:
+        sys.path.insert(0, os.path.abspath(args.app_dir))
+    if os.path.exists(args.database):
+        os.remove(args.database)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.database}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["FAST_CLASSIFIER_ENABLED"] = "false"
+    os.environ["CLASSIFICATION_CACHE_PERSISTENT"] = "false"
+    # All requests come from one address; the benchmarks measure the app, not the limiter.
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    import main
+    from database import init_db
+    import bedrock_llm
+    import ses
+    import classification_engine
+
+    # The tables must exist for seeding, before the lifespan would create them.
+    init_db()
+    model = SlowFakeChatModel(responses=[FAKE_CLASSIFICATION], latency=args.llm_latency)
+    chain, parser = bedrock_llm.build_chain(model)
+    classification_engine.set_engine(classification_engine.ClassificationEngine(chain=chain, parser=parser))
+    # Older versions send from the request handlers, newer ones from the email outbox.
+    for name in ("send_confirmation_email", "send_response_email"):
+        if hasattr(main, name):
+            setattr(main, name, fake_email_sender(getattr(main, name), args.ses_latency))
+    if hasattr(ses, "send_raw_email"):
+        ses.send_raw_email = fake_email_sender(ses.send_raw_email, args.ses_latency)
+    elif hasattr(ses, "send_bulk_templated_email"):
+        ses.send_templated_email = fake_email_sender(ses.send_templated_email, args.ses_latency)
+        ses.send_bulk_templated_email = fake_bulk_email_sender(args.ses_latency)
+    return main
+
+def seed(rows: int, start: int = 0):
+    """
+    Inserts seeded inquiries number `start` up to `rows`, so that a table can be
+    grown in steps.
+    """
+    from database import engine, InquiryRecord
+    from stats import rebuild_daily_counts
+
+    rng = random.Random(42 + start)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(InquiryRecord.__table__.insert(), [
+            {
+                "name": f"Customer {i}",
+                "email": f"customer{i}@example.com",
+                "inquiry_text": f"Seeded inquiry {i} about an invoice.",
+                "category": rng.choice(["Technical", "Billing", "Sales", "General"]),
+                "urgency": rng.choice(["High", "Medium", "Low"]),
+                "summary": "Seeded inquiry.",
+                "created_at": now - timedelta(seconds=rng.randrange(30 * 86400)),
+            }
+            for i in range(start, rows)
+        ])
+        # The inserts bypass the app, so recount the days instead of counting them one by one.
+        rebuild_daily_counts(connection)
+
+def start_server(app, port: int):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+async def client_loop(client, deadline: float, rows: int, rng: random.Random, samples: dict, errors: dict):
+    counter = 0
+    while time.perf_counter() < deadline:
+        roll = rng.random()
+        counter += 1
+        if roll < 0.2:
+            route = "POST /api/inquiries"
+            request = client.post("/api/inquiries", json={
+                "name": "Load Test",
+                "email": "load@example.com",
+                "inquiry": f"Load test inquiry {id(rng)}-{counter}: where is my invoice?",
+            })
+        elif roll < 0.8:
+            route = "GET /api/manager/inquiries"
+            request = client.get("/api/manager/inquiries", params={"limit": 50})
+        else:
+            route = "GET /api/inquiries/{id}"
+            request = client.get(f"/api/inquiries/{rng.randint(1, rows)}")
+
+        started = time.perf_counter()
+        try:
+            response = await request
+            if response.status_code >= 400:
+                errors[route] += 1
+        except httpx.HTTPError:
+            errors[route] += 1
+        samples[route].append(time.perf_counter() - started)
+
+async def run_load(port: int, clients: int, duration: float, rows: int):
+    samples, errors = defaultdict(list), defaultdict(int)
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(client, deadline, rows, random.Random(i), samples, errors)
+            for i in range(clients)
+        ))
+        elapsed = time.perf_counter() - started
+    return samples, errors, elapsed
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def report(samples: dict, errors: dict, elapsed: float):
+    print(f"\n{'route':<28} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    routes = sorted(samples) + ["total"]
+    for route in routes:
+        if route == "total":
+            values = [v for route_samples in samples.values() for v in route_samples]
+            failed = sum(errors.values())
+        else:
+            values, failed = samples[route], errors[route]
+        if not values:
+            continue
+        print(
+            f"{route:<28} {len(values):>8} {failed:>6} {len(values) / elapsed:>8.1f} "
+            f"{statistics.median(values) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f} "
+            f"{percentile(values, 99) * 1000:>8.1f}"
+        )
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--app-dir", default=None, help="Backend directory to load the app from")
+    arg_parser.add_argument("--database", default="./bench_load.db")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--clients", type=int, default=50)
+    arg_parser.add_argument("--duration", type=float, default=20.0)
+    arg_parser.add_argument("--rows", type=int, default=5000)
+    arg_parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake chat model call")
+    arg_parser.add_argument("--ses-latency", type=float, default=0.1, help="Seconds per fake SES call")
+    args = arg_parser.parse_args()
+
+    app_module = load_app(args)
+    seed(args.rows)
+    server, thread = start_server(app_module.app, args.port)
+    try:
+        samples, errors, elapsed = asyncio.run(run_load(args.port, args.clients, args.duration, args.rows))
+    finally:
+        server.should_exit = True
+        thread.join()
+    report(samples, errors, elapsed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Bulk import of inquiries from other channels, such as mailbox dumps or partner
+forms, as NDJSON: one JSON object per line with `external_id`, `name`, `email`,
+`inquiry` and optionally `created_at`.
+
+Lines are validated and inserted in chunks of IMPORT_CHUNK_SIZE, each chunk in
+one transaction: a multi-row INSERT ... ON CONFLICT (external_id) DO NOTHING,
+plus one executemany each for the classification jobs, the events, the daily
+counts and, if requested, the confirmation emails. The external id is unique, so re-running an
+import after a partial failure skips what was already stored and continues
+where it stopped. Inquiries archived since (see archive.py) are skipped as well.
+
+    python bulk_import.py mailbox.ndjson [--send-confirmation]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from database import AsyncSessionLocal, async_engine, dialect_insert, InquiryRecord
+from classification_queue import enqueue_classifications, PENDING_CLASSIFICATION
+from email_outbox import enqueue_emails
+from observability import IMPORTED_INQUIRIES
+import archive
+import email_rendering
+import events
+import stats
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Invalid lines beyond this many are counted but not listed in the report.
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportedInquiry(BaseModel):
+    external_id: str = Field(min_length=1, max_length=255)
+    name: str = Field(min_length=1, max_length=255)
+    email: str = Field(min_length=1, max_length=255)
+    inquiry: str = Field(min_length=1)
+    created_at: Optional[datetime] = None
+
+    @field_validator("created_at")
+    @classmethod
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """
+        Timestamps are stored as naive UTC. Values with an offset are converted
+        to UTC; values without one are taken to be UTC already.
+        """
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class ImportReport:
+    def __init__(self):
+        self.lines = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.chunks = 0
+        self.errors = []
+        self.failure = None
+        self._started = time.perf_counter()
+
+    def invalid_line(self, line_number: int, error: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "error": error})
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "completed": self.failure is None,
+            "lines": self.lines,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 3),
+            "lines_per_second": round(self.lines / elapsed, 1) if elapsed else None,
+            "errors": self.errors,
+            "failure": self.failure,
+        }
+
+
+async def import_chunk(db, records: list, send_confirmation: bool = False) -> int:
+    """
+    Inserts a chunk of validated inquiries that are not stored yet, with their
+    classification jobs, events, daily counts and optionally confirmation
+    emails, into the current transaction. The caller commits.
+
+    :return: The number of inserted inquiries; the others were duplicates.
+    """
+    # Inquiries archived since an earlier import are no longer in `inquiries`.
+    archived = await archive.archived_external_ids(db, [record.external_id for record in records])
+    records = [record for record in records if record.external_id not in archived]
+    if not records:
+        return 0
+    now = datetime.utcnow()
+    insert = dialect_insert(async_engine.dialect.name)
+    inserted = (await db.execute(
+        insert(InquiryRecord.__table__)
+        .on_conflict_do_nothing(index_elements=["external_id"])
+        .returning(
+            InquiryRecord.id, InquiryRecord.name, InquiryRecord.email, InquiryRecord.inquiry_text,
+            InquiryRecord.category, InquiryRecord.urgency, InquiryRecord.created_at,
+        ),
+        [
+            {
+                "external_id": record.external_id,
+                "name": record.name,
+                "email": record.email,
+                "inquiry_text": record.inquiry,
+                "category": PENDING_CLASSIFICATION["category"],
+                "urgency": PENDING_CLASSIFICATION["urgency"],
+                "summary": PENDING_CLASSIFICATION["summary"],
+                "created_at": record.created_at or now,
+            }
+            for record in records
+        ],
+    )).all()
+    if not inserted:
+        return 0
+
+    inquiry_ids = [row.id for row in inserted]
+    await enqueue_classifications(db, inquiry_ids)
+    if send_confirmation:
+        await enqueue_emails(db, [
+            (row.email, email_rendering.CONFIRMATION_TEMPLATE,
+             email_rendering.confirmation_email_data(row.name, row.id, row.inquiry_text), row.id)
+            for row in inserted
+        ])
+    await stats.count_created(db, [(row.created_at, row.category, row.urgency) for row in inserted])
+    await events.record_events(db, inquiry_ids, events.INQUIRY_CREATED)
+    return len(inserted)
+
+async def iter_lines(byte_chunks):
+    """
+    Splits a stream of bytes, e.g. `request.stream()`, into lines.
+    """
+    pending = b""
+    async for chunk in byte_chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+async def import_lines(lines, send_confirmation: bool = False, chunk_size: int = IMPORT_CHUNK_SIZE,
+                       on_chunk=None) -> ImportReport:
+    """
+    Imports NDJSON lines chunk by chunk; invalid lines are reported and skipped.
+    Stops at the first chunk that cannot be stored, which is then not stored
+    at all, so that the import can simply be run again.
+
+    :param lines: An async iterator of lines (bytes or str).
+    :param on_chunk: Called with the report after every committed chunk.
+    """
+    report = ImportReport()
+    records = []
+
+    async def flush():
+        async with AsyncSessionLocal() as db:
+            try:
+                inserted = await import_chunk(db, records, send_confirmation)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.exception("Bulk import chunk failed", extra={"chunk": report.chunks + 1})
+                report.failure = {"chunk": report.chunks + 1, "error": str(e)}
+                return False
+        report.chunks += 1
+        report.inserted += inserted
+        report.duplicates += len(records) - inserted
+        IMPORTED_INQUIRIES.labels(result="inserted").inc(inserted)
+        IMPORTED_INQUIRIES.labels(result="duplicate").inc(len(records) - inserted)
+        records.clear()
+        if on_chunk:
+            on_chunk(report)
+        return True
+
+    async for line in lines:
+        report.lines += 1
+        if not line.strip():
+            continue
+        try:
+            records.append(ImportedInquiry.model_validate(json.loads(line)))
+        except ValidationError as e:
+            report.invalid_line(report.lines, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'line'}: {error['msg']}" for error in e.errors()
+            ))
+            IMPORTED_INQUIRIES.labels(result="invalid").inc()
+            continue
+        except ValueError as e:
+            report.invalid_line(report.lines, f"Invalid JSON: {e}")
+            IMPORTED_INQUIRIES.labels(result="invalid").inc()
+            continue
+        if len(records) >= chunk_size and not await flush():
+            return report
+    if records:
+        await flush()
+    return report
+
+
+async def _import_file(path: str, send_confirmation: bool, chunk_size: int) -> dict:
+    async def read_lines():
+        with open(path, "rb") as f:
+            for line in f:
+                yield line
+
+    def progress(report: ImportReport):
+        status = report.as_dict()
+        print(
+            f"chunk {status['chunks']}: {status['lines']} lines, {status['inserted']} inserted, "
+            f"{status['duplicates']} duplicates, {status['invalid']} invalid "
+            f"({status['lines_per_second']} lines/s)"
+        )
+
+    report = await import_lines(read_lines(), send_confirmation, chunk_size, on_chunk=progress)
+    return report.as_dict()
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import init_db
+
+    arg_parser = argparse.ArgumentParser(description="Imports inquiries from an NDJSON file.")
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--send-confirmation", action="store_true",
+                            help="Queue a confirmation email for every imported inquiry")
+    arg_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = arg_parser.parse_args()
+
+    init_db()
+    result = asyncio.run(_import_file(args.path, args.send_confirmation, args.chunk_size))
+    print(json.dumps({key: value for key, value in result.items() if key != "errors"}, indent=2))
+    for error in result["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    sys.exit(0 if result["completed"] else 1)
@@ -0,0 +1,227 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+
+from database import AsyncSessionLocal, ClassificationCacheEntry
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("CLASSIFICATION_CACHE_TTL", "86400"))
+CACHE_PERSISTENT = os.getenv("CLASSIFICATION_CACHE_PERSISTENT", "false").lower() in ("1", "true", "yes")
+
+# Part of every key: bump it whenever `normalize_inquiry_text` changes, so that
+# entries stored under the old normalization are never hit again.
+NORMALIZATION_VERSION = 2
+# A line starting with one of these may open a signature block.
+SIGNATURE_PATTERN = re.compile(
+    r"^\s*(?:--\s*$|(?:best|kind|warm)?\s*regards\b|best wishes\b|sincerely\b|sent from my\b|"
+    r"(?:many\s+)?thanks[\s,!.]*$|thank you[\s,!.]*$|cheers[\s,!.]*$)",
+    re.IGNORECASE,
+)
+# A signature block is at most this many lines at the end of the text. Below
+# the closing come only short lines: a name or company (a few capitalized
+# words, not ending like "Refund please." or "Can you help?"), an email or web
+# address, or a phone number. Anything else means the text goes on.
+SIGNATURE_MAX_LINES = 6
+SIGNATURE_MAX_LINE_LENGTH = 60
+SIGNATURE_MAX_NAME_WORDS = 4
+NAME_LINE_PATTERN = re.compile(r"^(?:[^\W\d_a-z][\w.'&-]*,?\s*)+$")
+SENTENCE_END_PATTERN = re.compile(r"\w{5,}\.$")
+CONTACT_LINE_PATTERN = re.compile(
+    r"^(?:[\w.-]+\s*:\s*)?(?:\S+@\S+|(?:https?://|www\.)\S+|\+?[\d\s()/.-]{6,})$", re.IGNORECASE,
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _is_signature_line(line: str) -> bool:
+    line = line.strip()
+    if not line or CONTACT_LINE_PATTERN.match(line):
+        return True
+    if len(line) > SIGNATURE_MAX_LINE_LENGTH:
+        return False
+    # E.g. "Thanks!" followed by "Best regards,".
+    if SIGNATURE_PATTERN.match(line):
+        return True
+    return (
+        len(line.split()) <= SIGNATURE_MAX_NAME_WORDS
+        and bool(NAME_LINE_PATTERN.match(line))
+        and not SENTENCE_END_PATTERN.search(line)
+    )
+
+def strip_signature(inquiry_text: str) -> str:
+    """
+    Drops a trailing signature block: a closing matching SIGNATURE_PATTERN
+    among the last SIGNATURE_MAX_LINES non-blank lines, followed by nothing but
+    name or contact lines. A closing further up, or one followed by the actual
+    request, is kept.
+    """
+    lines = inquiry_text.rstrip().splitlines()
+    # Index of the first line that may still open the block.
+    remaining = SIGNATURE_MAX_LINES
+    first = len(lines)
+    while first > 0 and remaining > 0:
+        first -= 1
+        if lines[first].strip():
+            remaining -= 1
+    for i in range(first, len(lines)):
+        if not SIGNATURE_PATTERN.match(lines[i]):
+            continue
+        # Only treat it as a signature if there is an inquiry left above it.
+        if all(map(_is_signature_line, lines[i:])) and "".join(lines[:i]).strip():
+            return "\n".join(lines[:i])
+    return inquiry_text
+
+def normalize_inquiry_text(inquiry_text: str) -> str:
+    """
+    Normalizes an inquiry so that trivially different submissions share a cache
+    entry: drops a trailing signature, lowercases and collapses whitespace.
+    """
+    return WHITESPACE_PATTERN.sub(" ", strip_signature(inquiry_text)).strip().lower()
+
+def cache_key(inquiry_text: str, fingerprint: str) -> str:
+    normalized = normalize_inquiry_text(inquiry_text)
+    return hashlib.sha256(f"{NORMALIZATION_VERSION}\0{fingerprint}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """
+    Two-tier cache of classifications keyed on the normalized inquiry text and
+    the chain fingerprint. The in-process tier is an LRU with TTL; the optional
+    persistent tier lives in the `classification_cache` table and is shared by
+    all workers and restarts.
+    """
+
+    def __init__(self, fingerprint: str, max_size: int = CACHE_MAX_SIZE, ttl: float = CACHE_TTL,
+                 persistent: bool = CACHE_PERSISTENT):
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged = not persistent
+        self._counters = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def key(self, inquiry_text: str) -> str:
+        return cache_key(inquiry_text, self.fingerprint)
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, classification = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return dict(classification)
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+        classification = await self._get_persistent(key) if self.persistent else None
+        with self._lock:
+            if classification is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["persistent_hits"] += 1
+        self._put_memory(key, classification)
+        return dict(classification)
+
+    async def put(self, key: str, classification: dict):
+        self._put_memory(key, classification)
+        if self.persistent:
+            await self._put_persistent(key, classification)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["persistent_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": hits / lookups if lookups else None,
+                "persistent": self.persistent,
+                "fingerprint": self.fingerprint,
+            }
+
+    def _put_memory(self, key: str, classification: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(classification))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    async def _get_persistent(self, key: str):
+        if not self._purged:
+            self._purged = True
+            await self._purge_other_fingerprints()
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        async with AsyncSessionLocal() as db:
+            try:
+                entry = (await db.execute(
+                    select(ClassificationCacheEntry)
+                    .where(ClassificationCacheEntry.key == key, ClassificationCacheEntry.created_at > cutoff)
+                )).scalar_one_or_none()
+            except Exception:
+                logger.exception("Classification cache lookup failed")
+                return None
+        if entry is None:
+            return None
+        return {"category": entry.category, "urgency": entry.urgency, "summary": entry.summary}
+
+    async def _put_persistent(self, key: str, classification: dict):
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.merge(ClassificationCacheEntry(
+                    key=key,
+                    fingerprint=self.fingerprint,
+                    category=classification["category"],
+                    urgency=classification["urgency"],
+                    summary=classification["summary"],
+                    created_at=datetime.utcnow(),
+                ))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                logger.exception("Classification cache write failed")
+
+    async def _purge_other_fingerprints(self):
+        """
+        Deletes persistent entries written for a different prompt or model.
+        Runs once, before the first persistent lookup.
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await db.execute(
+                    delete(ClassificationCacheEntry)
+                    .where(ClassificationCacheEntry.fingerprint != self.fingerprint)
+                )
+                await db.commit()
+                if result.rowcount:
+                    logger.info(
+                        "Purged classification cache entries of a previous prompt/model",
+                        extra={"entries": result.rowcount},
+                    )
+            except Exception:
+                await db.rollback()
+                logger.exception("Classification cache purge failed")
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+import bedrock_llm
+from bedrock_llm import InquiryClassification
+from classification_cache import ClassificationCache
+from fast_classifier import FastClassifier, FAST_CLASSIFIER_ENABLED
+from observability import LLM_BATCH_SECONDS, LLM_CLASSIFICATIONS
+from resilience import CircuitBreaker, CircuitOpenError
+
+BATCH_SIZE = int(os.getenv("CLASSIFICATION_BATCH_SIZE", "16"))
+BATCH_WINDOW = float(os.getenv("CLASSIFICATION_BATCH_WINDOW", "0.2"))
+MAX_CONCURRENCY = int(os.getenv("CLASSIFICATION_MAX_CONCURRENCY", "4"))
+# Circuit breaker around every LLM call, see resilience.py.
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))
+LLM_CIRCUIT_RESET_TIMEOUT = float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30"))
+LLM_TIMEOUT_MIN = float(os.getenv("LLM_TIMEOUT_MIN", "5"))
+LLM_TIMEOUT_MAX = float(os.getenv("LLM_TIMEOUT_MAX", "60"))
+LLM_TIMEOUT_MULTIPLIER = float(os.getenv("LLM_TIMEOUT_MULTIPLIER", "3"))
+
+LATENCY_SAMPLES = 1000
+
+
+def _percentile(samples, percentile: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ClassificationEngine:
+    """
+    Classifies inquiries in batches. The LLM calls of a batch run concurrently up
+    to `max_concurrency`, each through the circuit breaker on its own, and the
+    parsed results are mapped back to the inquiries in input order. Inquiries
+    the fast classifier is confident about, and previously seen inquiries in
+    the cache, skip the LLM entirely.
+    """
+
+    def __init__(self, chain=None, parser=None, max_concurrency: int = MAX_CONCURRENCY,
+                 cache: ClassificationCache = None, fast_classifier: FastClassifier = None,
+                 breaker: CircuitBreaker = None):
+        self.chain = chain
+        self.parser = parser
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.fast_classifier = fast_classifier
+        self.breaker = breaker or CircuitBreaker(
+            "llm",
+            failure_threshold=LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=LLM_CIRCUIT_RESET_TIMEOUT,
+            min_timeout=LLM_TIMEOUT_MIN,
+            max_timeout=LLM_TIMEOUT_MAX,
+            timeout_multiplier=LLM_TIMEOUT_MULTIPLIER,
+            # A malformed answer says nothing about Bedrock's health.
+            is_failure=lambda error: not isinstance(error, ValueError),
+        )
+        self._lock = threading.Lock()
+        self._batch_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._started_at = time.monotonic()
+        self._busy_seconds = 0.0
+        self._batches = 0
+        self._classified = 0
+        self._failed = 0
+        self._fast_path = 0
+
+    async def classify_many(self, inquiry_texts: list) -> list:
+        """
+        Classifies a batch of inquiry texts. Texts the fast classifier handles or
+        with a cached classification are not sent to the LLM, and duplicates
+        within the batch are only sent once.
+
+        :param inquiry_texts: The texts to classify.
+        :return: One entry per text, in input order: either the classification
+                 dict, with a "source" key of "fast", "cache" or "llm", or the
+                 exception raised for that text. While the LLM circuit is open,
+                 that exception is a `CircuitOpenError`.
+        """
+        results = [None] * len(inquiry_texts)
+        uncached = {}
+        for index, text in enumerate(inquiry_texts):
+            fast_result = self.fast_classifier.classify(text) if self.fast_classifier else None
+            if fast_result is not None:
+                results[index] = {**fast_result, "source": "fast"}
+                with self._lock:
+                    self._fast_path += 1
+                continue
+
+            key = self.cache.key(text) if self.cache else index
+            cached = await self.cache.get(key) if self.cache else None
+            if cached is not None:
+                results[index] = {**cached, "source": "cache"}
+            else:
+                uncached.setdefault(key, []).append(index)
+
+        if not uncached:
+            return results
+
+        classified = await self._invoke([inquiry_texts[indexes[0]] for indexes in uncached.values()])
+        for (key, indexes), result in zip(uncached.items(), classified):
+            if self.cache and not isinstance(result, Exception):
+                await self.cache.put(key, result)
+            for index in indexes:
+                results[index] = result if isinstance(result, Exception) else {**result, "source": "llm"}
+        return results
+
+    async def _invoke(self, inquiry_texts: list) -> list:
+        if not (self.chain and self.parser):
+            error = RuntimeError("LLM chain is not available")
+            self._record(0.0, 0, len(inquiry_texts))
+            return [error] * len(inquiry_texts)
+
+        format_instructions = self.parser.get_format_instructions()
+        inputs = [
+            {"inquiry_text": text, "format_instructions": format_instructions}
+            for text in inquiry_texts
+        ]
+
+        started = time.perf_counter()
+        raw_results = await self._abatch(inputs)
+        elapsed = time.perf_counter() - started
+        # Calls the open circuit rejected were never sent; not failed classifications.
+        sent = [raw for raw in raw_results if not isinstance(raw, CircuitOpenError)]
+        if not sent:
+            return raw_results
+        outcome = "error" if all(isinstance(raw, Exception) for raw in sent) else "success"
+        LLM_BATCH_SECONDS.labels(outcome=outcome).observe(elapsed)
+
+        results = []
+        for raw in raw_results:
+            if isinstance(raw, Exception):
+                results.append(raw)
+                continue
+            try:
+                results.append(InquiryClassification.model_validate(raw).model_dump())
+            except Exception as e:
+                results.append(e)
+
+        classified = sum(1 for result in results if not isinstance(result, Exception))
+        self._record(elapsed, classified, len(sent) - classified)
+        return results
+
+    async def _abatch(self, inputs: list) -> list:
+        """
+        Sends every input through the breaker on its own, so that its adaptive
+        timeout and latency history are those of one LLM call, however many
+        rounds of `max_concurrency` calls a batch takes.
+
+        :return: One raw result or exception per input.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def invoke(chain_input):
+            async with semaphore:
+                return await self.breaker.call(self.chain.ainvoke, chain_input)
+
+        return await asyncio.gather(*(invoke(chain_input) for chain_input in inputs), return_exceptions=True)
+
+    def _record(self, elapsed: float, classified: int, failed: int):
+        LLM_CLASSIFICATIONS.labels(outcome="success").inc(classified)
+        LLM_CLASSIFICATIONS.labels(outcome="error").inc(failed)
+        with self._lock:
+            self._batches += 1
+            self._classified += classified
+            self._failed += failed
+            self._busy_seconds += elapsed
+            self._batch_latencies.append(elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self._batch_latencies)
+            processed = self._classified + self._failed
+            uptime = time.monotonic() - self._started_at
+            return {
+                "batches": self._batches,
+                "classified": self._classified,
+                "failed": self._failed,
+                "fast_path": self._fast_path,
+                "avg_batch_size": processed / self._batches if self._batches else None,
+                "throughput_per_second": processed / uptime if uptime else None,
+                "busy_throughput_per_second": processed / self._busy_seconds if self._busy_seconds else None,
+                "batch_latency_seconds": {
+                    "p50": _percentile(latencies, 50),
+                    "p95": _percentile(latencies, 95),
+                    "p99": _percentile(latencies, 99),
+                    "max": max(latencies) if latencies else None,
+                },
+                "cache": self.cache.stats() if self.cache else None,
+                "circuit": self.breaker.stats(),
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> ClassificationEngine:
+    """
+    Builds the engine on first use. That imports LangChain and creates the
+    Bedrock client, which takes about a second and may wait for a build in
+    another thread, so never call it on the event loop; use `get_engine_async`.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            chain, parser = bedrock_llm.get_chain()
+            cache = ClassificationCache(bedrock_llm.chain_fingerprint(chain)) if chain else None
+            fast_classifier = FastClassifier() if FAST_CLASSIFIER_ENABLED else None
+            _engine = ClassificationEngine(chain, parser, cache=cache, fast_classifier=fast_classifier)
+        return _engine
+
+async def get_engine_async() -> ClassificationEngine:
+    if _engine is not None:
+        return _engine
+    return await asyncio.to_thread(get_engine)
+
+def current_engine():
+    """
+    :return: The engine if it has been built, else None. Never builds it.
+    """
+    return _engine
+
+def set_engine(engine: ClassificationEngine):
+    """
+    Replaces the engine used by the classification workers, e.g. with one built
+    around a fake chat model via `bedrock_llm.build_chain`.
+    """
+    global _engine
+    with _engine_lock:
+        _engine = engine
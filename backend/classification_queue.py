@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+
+from database import AsyncSessionLocal, InquiryRecord, ClassificationJob
+from classification_engine import ClassificationEngine, get_engine_async, BATCH_SIZE, BATCH_WINDOW
+import fast_classifier
+from observability import CLASSIFICATION_FALLBACKS, CLASSIFICATIONS
+from resilience import CircuitOpenError, jittered_backoff
+import events
+import stats
+
+logger = logging.getLogger(__name__)
+
+PENDING_CLASSIFICATION = {
+    "category": "Pending",
+    "urgency": "Pending",
+    "summary": "Classification pending.",
+}
+
+FAILED_CLASSIFICATION = {
+    "category": "N/A",
+    "urgency": "N/A",
+    "summary": "Classification failed.",
+}
+
+NUM_WORKERS = int(os.getenv("CLASSIFICATION_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("CLASSIFICATION_POLL_INTERVAL", "1.0"))
+MAX_ATTEMPTS = int(os.getenv("CLASSIFICATION_MAX_ATTEMPTS", "5"))
+RETRY_DELAY = float(os.getenv("CLASSIFICATION_RETRY_DELAY", "5.0"))
+STALE_AFTER = float(os.getenv("CLASSIFICATION_STALE_AFTER", "300"))
+# While the LLM circuit is open: "defer" jobs until it closes, or "fast" to
+# classify with any keyword rule that matches, below the fast-path threshold.
+OPEN_CIRCUIT_FALLBACK = os.getenv("CLASSIFICATION_OPEN_CIRCUIT_FALLBACK", "defer")
+
+
+def enqueue_classification(db, record: InquiryRecord):
+    """
+    Adds a pending classification job for an inquiry to the current session.
+    The caller commits, so the inquiry and its job are stored atomically.
+    """
+    job = ClassificationJob(inquiry_id=record.id, status="pending")
+    db.add(job)
+    return job
+
+async def enqueue_classifications(db, inquiry_ids: list):
+    """
+    Adds pending classification jobs for many inquiries to the current
+    transaction, in a single executemany.
+    """
+    if inquiry_ids:
+        await db.execute(insert(ClassificationJob), [
+            {"inquiry_id": inquiry_id, "status": "pending"} for inquiry_id in inquiry_ids
+        ])
+
+async def requeue_stale_jobs(db, stale_after: float = STALE_AFTER):
+    """
+    Puts jobs back into the queue whose worker died or hung while holding them.
+
+    :return: The number of requeued jobs.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    result = await db.execute(
+        update(ClassificationJob)
+        .where(ClassificationJob.status == "running", ClassificationJob.locked_at < cutoff)
+        .values(status="pending", locked_at=None, locked_by=None)
+    )
+    await db.commit()
+    return result.rowcount
+
+async def claim_jobs(db, limit: int):
+    """
+    Atomically claims up to `limit` of the oldest due jobs. The conditional update
+    tags the claimed rows with a fresh token, so concurrent workers (tasks or
+    processes) never claim the same job twice.
+
+    :return: The claimed jobs, possibly fewer than `limit`.
+    """
+    now = datetime.utcnow()
+    job_ids = (await db.execute(
+        select(ClassificationJob.id)
+        .where(ClassificationJob.status == "pending", ClassificationJob.available_at <= now)
+        .order_by(ClassificationJob.id)
+        .limit(limit)
+    )).scalars().all()
+    if not job_ids:
+        return []
+
+    token = uuid.uuid4().hex
+    await db.execute(
+        update(ClassificationJob)
+        .where(ClassificationJob.id.in_(job_ids), ClassificationJob.status == "pending")
+        .values(
+            status="running",
+            locked_at=now,
+            locked_by=token,
+            attempts=ClassificationJob.attempts + 1,
+        )
+    )
+    await db.commit()
+    return (await db.execute(
+        select(ClassificationJob)
+        .where(ClassificationJob.locked_by == token, ClassificationJob.status == "running")
+        .order_by(ClassificationJob.id)
+    )).scalars().all()
+
+def _defer(job: ClassificationJob, error: CircuitOpenError):
+    """
+    Puts a job back until the LLM circuit lets calls through again, without
+    counting the attempt.
+    """
+    job.status = "pending"
+    job.attempts -= 1
+    job.last_error = str(error)
+    job.locked_at = None
+    job.locked_by = None
+    job.available_at = datetime.utcnow() + timedelta(seconds=error.retry_after * random.uniform(1.0, 1.2))
+
+def _open_circuit_fallback(inquiry_text: str):
+    if OPEN_CIRCUIT_FALLBACK != "fast":
+        return None
+    classification, _ = fast_classifier.classify(inquiry_text)
+    return {**classification, "source": "fallback"} if classification else None
+
+def _fail_or_retry(job: ClassificationJob, error: Exception):
+    """
+    Schedules a retry with jittered exponential backoff.
+
+    :return: True if the job ran out of attempts and is now failed.
+    """
+    job.last_error = str(error)
+    job.locked_at = None
+    job.locked_by = None
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = "failed"
+        return True
+    job.status = "pending"
+    job.available_at = datetime.utcnow() + timedelta(seconds=jittered_backoff(RETRY_DELAY, job.attempts))
+    return False
+
+async def process_jobs(db, jobs: list, engine: ClassificationEngine):
+    """
+    Classifies the inquiries of the claimed jobs as one batch and stores the results.
+    """
+    records = {
+        record.id: record for record in (await db.execute(
+            select(InquiryRecord).where(InquiryRecord.id.in_([job.inquiry_id for job in jobs]))
+        )).scalars()
+    }
+
+    runnable = []
+    for job in jobs:
+        if job.inquiry_id in records:
+            runnable.append(job)
+        else:
+            job.status = "failed"
+            job.last_error = "Inquiry not found"
+            job.locked_at = None
+            job.locked_by = None
+
+    # End the read transaction so no connection or lock is held during the LLM calls.
+    await db.commit()
+    results = await engine.classify_many([records[job.inquiry_id].inquiry_text for job in runnable])
+
+    classified = []
+    reclassified = []
+    deferred = 0
+    for job, result in zip(runnable, results):
+        record = records[job.inquiry_id]
+        if isinstance(result, CircuitOpenError):
+            result = _open_circuit_fallback(record.inquiry_text) or result
+        if isinstance(result, CircuitOpenError):
+            _defer(job, result)
+            deferred += 1
+            continue
+        if isinstance(result, Exception):
+            logger.warning(
+                "Error during classification",
+                extra={"inquiry_id": record.id, "attempt": job.attempts, "error": str(result)},
+            )
+            if not _fail_or_retry(job, result):
+                continue
+            CLASSIFICATION_FALLBACKS.inc()
+            classification = FAILED_CLASSIFICATION
+        else:
+            job.status = "done"
+            job.source = result["source"]
+            CLASSIFICATIONS.labels(source=result["source"]).inc()
+            job.last_error = None
+            job.locked_at = None
+            job.locked_by = None
+            classification = result
+
+        if (record.category, record.urgency) != (classification["category"], classification["urgency"]):
+            reclassified.append((
+                record.created_at, record.category, record.urgency,
+                classification["category"], classification["urgency"],
+            ))
+        record.category = classification["category"]
+        record.urgency = classification["urgency"]
+        record.summary = classification["summary"]
+        classified.append(record.id)
+
+    if deferred:
+        logger.info("Deferred classification jobs while the LLM circuit is open", extra={"jobs": deferred})
+    await stats.count_reclassified(db, reclassified)
+    await events.record_events(db, classified, events.INQUIRY_CLASSIFIED)
+    await db.commit()
+    events.broker.notify()
+
+async def process_next_batch(batch_size: int = BATCH_SIZE, batch_window: float = BATCH_WINDOW) -> int:
+    """
+    Claims and processes one batch of jobs. If fewer than `batch_size` jobs are
+    due, waits up to `batch_window` seconds for more to arrive so that bursts
+    are classified together.
+
+    :return: The number of processed jobs, 0 if there was nothing to do.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            jobs = await claim_jobs(db, batch_size)
+            if not jobs:
+                return 0
+            if len(jobs) < batch_size and batch_window > 0:
+                await asyncio.sleep(batch_window)
+                jobs += await claim_jobs(db, batch_size - len(jobs))
+            await process_jobs(db, jobs, await get_engine_async())
+            return len(jobs)
+        except Exception:
+            await db.rollback()
+            logger.exception("Classification worker error")
+            return 0
+
+async def queue_stats(db) -> dict:
+    counts = dict((await db.execute(
+        select(ClassificationJob.status, func.count(ClassificationJob.id))
+        .group_by(ClassificationJob.status)
+    )).all())
+    return {status: counts.get(status, 0) for status in ("pending", "running", "done", "failed")}
+
+
+class ClassificationWorkerPool:
+    """
+    Drains the classification queue in background tasks on the app's event loop,
+    so that the LLM round trip never runs on the request path.
+    """
+
+    def __init__(self, num_workers: int = NUM_WORKERS, poll_interval: float = POLL_INTERVAL,
+                 stale_after: float = STALE_AFTER):
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._stopping = False
+        self._wakeup = None
+        self._tasks = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        await self._requeue_stale_jobs()
+        self._tasks = [
+            asyncio.create_task(self._run(i), name=f"classification-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+
+    async def stop(self, timeout: float = 10.0):
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, still_running = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        self._tasks = []
+
+    def notify(self):
+        """
+        Wakes idle workers, e.g. right after a job was enqueued, instead of
+        letting them wait for the next poll.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _requeue_stale_jobs(self):
+        async with AsyncSessionLocal() as db:
+            try:
+                requeued = await requeue_stale_jobs(db, self.stale_after)
+                if requeued:
+                    logger.warning("Requeued stale classification jobs", extra={"jobs": requeued})
+            except Exception:
+                await db.rollback()
+                logger.exception("Failed to requeue stale classification jobs")
+
+    async def _run(self, worker_index: int):
+        while not self._stopping:
+            if await process_next_batch():
+                continue
+            if worker_index == 0:
+                await self._requeue_stale_jobs()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self._stopping:
+                self._wakeup.clear()
@@ -1,6 +1,8 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import create_engine, event, Column, Integer, Float, String, Text, Date, DateTime, ForeignKey, Index, LargeBinary
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -8,12 +10,96 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./local.db")
 
+# Per process and engine; with N workers the database sees up to
+# N * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections from the app.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Below the idle timeouts of RDS proxies and load balancers.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Postgres only; 0 disables the timeout.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
 connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+def to_async_url(url: str) -> str:
+    """
+    Maps a sync database URL to the matching async driver: aiosqlite for SQLite
+    and asyncpg for Postgres.
+    """
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+def pool_options(url: str) -> dict:
+    """
+    Pool settings for `create_engine`. SQLite gets the dialect's defaults, as
+    there is no server connection to keep alive.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def statement_timeout_args(url: str) -> dict:
+    """
+    Connect arguments that make Postgres cancel statements running longer than
+    DB_STATEMENT_TIMEOUT_MS, for psycopg2 and asyncpg. Only for the app's
+    engine, not for migrations.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "postgresql" or DB_STATEMENT_TIMEOUT_MS <= 0:
+        return {}
+    if url.get_driver_name() == "asyncpg":
+        return {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    return {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets the dashboard read while a worker writes; NORMAL is durable in WAL mode.
+    if SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+# The sync engine serves migrations and command-line scripts; the app itself
+# only uses the async engine. It has no statement timeout: index builds,
+# backfills and waiting for the migration lock may take far longer.
+engine = create_engine(
+    DATABASE_URL,
+    connect_args=connect_args,
+    **pool_options(DATABASE_URL),
+)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=statement_timeout_args(ASYNC_DATABASE_URL),
+    **pool_options(ASYNC_DATABASE_URL),
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _configure_sqlite)
+
 Base = declarative_base()
 
 def get_db():
@@ -23,8 +109,36 @@ def get_db():
     finally:
         db_session.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db_session:
+        yield db_session
+
+def dialect_insert(dialect: str):
+    """
+    :return: The `insert` of the dialect, which supports ON CONFLICT.
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"ON CONFLICT is not supported on {dialect}")
+    return insert
+
 class InquiryRecord(Base):
     __tablename__ = "inquiries"
+    # Match the dashboard access patterns: newest first, optionally filtered by
+    # category or urgency, with (created_at, id) as the keyset cursor.
+    __table_args__ = (
+        Index("ix_inquiries_created_at_id", "created_at", "id"),
+        Index("ix_inquiries_category_created_at_id", "category", "created_at", "id"),
+        Index("ix_inquiries_urgency_created_at_id", "urgency", "created_at", "id"),
+        Index("ix_inquiries_email", "email"),
+        # Open queue: one index range per urgency, oldest first.
+        Index("ix_inquiries_status_urgency_created_at_id", "status", "urgency", "created_at", "id"),
+        # Makes bulk imports idempotent; NULL for inquiries submitted through the form.
+        Index("ix_inquiries_external_id", "external_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
@@ -33,7 +147,154 @@ class InquiryRecord(Base):
     category = Column(String(50), nullable=False)
     urgency = Column(String(50), nullable=False)
     summary = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="open", server_default="open")
+    response_count = Column(Integer, nullable=False, default=0, server_default="0")
+    external_id = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ResponseRecord(Base):
+    __tablename__ = "responses"
+    __table_args__ = (
+        Index("ix_responses_inquiry_id_created_at", "inquiry_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    inquiry_id = Column(Integer, ForeignKey("inquiries.id"), nullable=False)
+    response_text = Column(Text, nullable=False)
+    responder = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ClassificationJob(Base):
+    __tablename__ = "classification_jobs"
+    __table_args__ = (
+        Index("ix_classification_jobs_status_available_at_id", "status", "available_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    inquiry_id = Column(Integer, ForeignKey("inquiries.id"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(32), nullable=True, index=True)
+    last_error = Column(Text, nullable=True)
+    source = Column(String(20), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ClassificationCacheEntry(Base):
+    __tablename__ = "classification_cache"
+
+    key = Column(String(64), primary_key=True)
+    fingerprint = Column(String(64), nullable=False, index=True)
+    category = Column(String(50), nullable=False)
+    urgency = Column(String(50), nullable=False)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class EmailOutboxEntry(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_available_at_id", "status", "available_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    inquiry_id = Column(Integer, ForeignKey("inquiries.id"), nullable=True, index=True)
+    to_address = Column(String(255), nullable=False)
+    template_name = Column(String(100), nullable=False)
+    template_data = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(32), nullable=True, index=True)
+    message_id = Column(String(255), nullable=True)
+    last_error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+class InquiryEvent(Base):
+    __tablename__ = "inquiry_events"
+    # The latest event of an inquiry is its version for conditional requests.
+    __table_args__ = (
+        Index("ix_inquiry_events_inquiry_id_id", "inquiry_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: archiving an inquiry records an event after deleting its row.
+    inquiry_id = Column(Integer, nullable=False)
+    type = Column(String(30), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class DataVersion(Base):
+    """
+    Version counters for conditional requests (see response_cache.py), bumped
+    in the transactions that change the data they cover.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# The version of the inquiry list, bumped by `events.record_events`.
+INQUIRIES_VERSION = "inquiries"
+
+class InquiryDailyCount(Base):
+    """
+    Number of inquiries per day of creation (UTC), category and urgency, kept
+    up to date in the transactions that create or classify inquiries.
+    """
+    __tablename__ = "inquiry_daily_counts"
+
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    urgency = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class InquiryArchiveRecord(Base):
+    """
+    Closed inquiries moved out of `inquiries` by archive.py. The text, contact
+    details and responses are one compressed JSON document in `payload`; the
+    columns the statistics need stay plain. On Postgres the table is
+    partitioned by month of `created_at`, which is therefore part of the key.
+    """
+    __tablename__ = "inquiries_archive"
+    __table_args__ = (
+        Index("ix_inquiries_archive_id", "id"),
+        Index("ix_inquiries_archive_external_id", "external_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, primary_key=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    category = Column(String(50), nullable=False)
+    urgency = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)
+    response_count = Column(Integer, nullable=False)
+    external_id = Column(String(255), nullable=True)
+    codec = Column(String(10), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+
+class RateLimitBucket(Base):
+    """
+    Token bucket of the shared rate limiter (see rate_limit.py), keyed e.g. on
+    "ip:<address>" or "email:<address>".
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Unix time, so that refilling is plain arithmetic in SQL on every database.
+    refilled_at = Column(Float, nullable=False, index=True)
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """
+    Creates missing tables and applies pending migrations. Safe to call from
+    several processes at once: on Postgres they are serialized by an advisory
+    lock, and every later caller finds nothing left to do.
+    """
+    from migrations import migration_lock, run_migrations
+
+    with migration_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
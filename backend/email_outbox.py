@@ -0,0 +1,329 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from botocore.exceptions import ClientError
+from sqlalchemy import func, insert, select, update
+
+from database import AsyncSessionLocal, EmailOutboxEntry
+from email_transport import sender_address, transport
+from observability import EMAIL_FAILURES, EMAILS_SENT
+from resilience import CircuitOpenError, jittered_backoff
+import email_rendering
+import ses
+
+logger = logging.getLogger(__name__)
+
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+# Sends in flight at once; no point in more than the transport's connections.
+EMAIL_SEND_CONCURRENCY = int(os.getenv("EMAIL_SEND_CONCURRENCY", str(ses.SES_MAX_POOL_CONNECTIONS)))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "1.0"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+EMAIL_RETRY_DELAY = float(os.getenv("EMAIL_RETRY_DELAY", "5.0"))
+EMAIL_MAX_RETRY_DELAY = float(os.getenv("EMAIL_MAX_RETRY_DELAY", "900"))
+EMAIL_STALE_AFTER = float(os.getenv("EMAIL_STALE_AFTER", "300"))
+# Maximum send rate of the SES account, in emails per second.
+SES_MAX_SEND_RATE = float(os.getenv("SES_MAX_SEND_RATE", "14"))
+
+
+class RateLimiter:
+    """
+    Token bucket that allows `rate` sends per second with bursts of up to one
+    second's worth.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, count: int = 1):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                # A bulk call larger than the bucket drains it completely and goes into debt.
+                needed = min(count, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= count
+                    return
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
+
+def enqueue_email(db, to_address: str, template_name: str, template_data: dict, inquiry_id: int = None):
+    """
+    Adds an email to the outbox in the current session. The caller commits, so
+    the email is only sent if the change that triggered it is stored.
+    """
+    entry = EmailOutboxEntry(
+        inquiry_id=inquiry_id,
+        to_address=to_address,
+        template_name=template_name,
+        template_data=json.dumps(template_data),
+        status="pending",
+    )
+    db.add(entry)
+    return entry
+
+async def enqueue_emails(db, emails: list):
+    """
+    Adds many emails to the outbox in the current transaction, in a single
+    executemany.
+
+    :param emails: (to_address, template_name, template_data, inquiry_id) tuples.
+    """
+    if emails:
+        await db.execute(insert(EmailOutboxEntry), [
+            {
+                "inquiry_id": inquiry_id,
+                "to_address": to_address,
+                "template_name": template_name,
+                "template_data": json.dumps(template_data),
+                "status": "pending",
+            }
+            for to_address, template_name, template_data, inquiry_id in emails
+        ])
+
+async def requeue_stale_emails(db, stale_after: float = EMAIL_STALE_AFTER):
+    """
+    Puts emails back into the outbox whose sender died while holding them. Such
+    an email may have been sent already, so it can be delivered twice.
+
+    :return: The number of requeued emails.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    result = await db.execute(
+        update(EmailOutboxEntry)
+        .where(EmailOutboxEntry.status == "sending", EmailOutboxEntry.locked_at < cutoff)
+        .values(status="pending", locked_at=None, locked_by=None)
+    )
+    await db.commit()
+    return result.rowcount
+
+async def claim_emails(db, limit: int):
+    """
+    Atomically claims up to `limit` of the oldest due emails, using the same
+    token scheme as `classification_queue.claim_jobs`.
+
+    :return: The claimed emails, possibly fewer than `limit`.
+    """
+    now = datetime.utcnow()
+    entry_ids = (await db.execute(
+        select(EmailOutboxEntry.id)
+        .where(EmailOutboxEntry.status == "pending", EmailOutboxEntry.available_at <= now)
+        .order_by(EmailOutboxEntry.id)
+        .limit(limit)
+    )).scalars().all()
+    if not entry_ids:
+        return []
+
+    token = uuid.uuid4().hex
+    await db.execute(
+        update(EmailOutboxEntry)
+        .where(EmailOutboxEntry.id.in_(entry_ids), EmailOutboxEntry.status == "pending")
+        .values(
+            status="sending",
+            locked_at=now,
+            locked_by=token,
+            attempts=EmailOutboxEntry.attempts + 1,
+        )
+    )
+    await db.commit()
+    return (await db.execute(
+        select(EmailOutboxEntry)
+        .where(EmailOutboxEntry.locked_by == token, EmailOutboxEntry.status == "sending")
+        .order_by(EmailOutboxEntry.id)
+    )).scalars().all()
+
+def _mark_sent(entry: EmailOutboxEntry, message_id: str):
+    entry.status = "sent"
+    entry.message_id = message_id
+    entry.last_error = None
+    entry.locked_at = None
+    entry.locked_by = None
+    entry.sent_at = datetime.utcnow()
+    EMAILS_SENT.inc()
+
+def _defer(entry: EmailOutboxEntry, error: CircuitOpenError):
+    """
+    Puts an email back until the SES circuit lets calls through again, without
+    counting the attempt.
+    """
+    entry.status = "pending"
+    entry.attempts -= 1
+    entry.last_error = str(error)
+    entry.locked_at = None
+    entry.locked_by = None
+    entry.available_at = datetime.utcnow() + timedelta(seconds=error.retry_after * random.uniform(1.0, 1.2))
+
+def _fail_or_retry(entry: EmailOutboxEntry, error: str, permanent: bool = False):
+    """
+    Schedules a retry with capped, jittered exponential backoff.
+    """
+    entry.last_error = error
+    entry.locked_at = None
+    entry.locked_by = None
+    if permanent or entry.attempts >= EMAIL_MAX_ATTEMPTS:
+        entry.status = "failed"
+        EMAIL_FAILURES.labels(result="failed").inc()
+        logger.error(
+            "Giving up on email",
+            extra={"email_id": entry.id, "to_address": entry.to_address, "attempts": entry.attempts, "error": error},
+        )
+        return
+    entry.status = "pending"
+    EMAIL_FAILURES.labels(result="retry").inc()
+    delay = jittered_backoff(EMAIL_RETRY_DELAY, entry.attempts, EMAIL_MAX_RETRY_DELAY)
+    entry.available_at = datetime.utcnow() + timedelta(seconds=delay)
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ClientError):
+        return f"{error.response['Error'].get('Code')}: {error.response['Error'].get('Message')}"
+    return str(error) or type(error).__name__
+
+async def _send(entry: EmailOutboxEntry, rate_limiter: RateLimiter) -> bool:
+    """
+    Renders and sends one email and records the outcome on the entry.
+
+    :return: False if the email was deferred because the circuit is open.
+    """
+    try:
+        rendered = email_rendering.render(entry.template_name, json.loads(entry.template_data))
+    except Exception as e:
+        # Rendering again would fail again, e.g. for an unknown template.
+        _fail_or_retry(entry, f"Rendering failed: {e}", permanent=email_rendering.is_render_error(e))
+        return True
+    await rate_limiter.acquire()
+    try:
+        message_id = await transport.send(
+            email_rendering.build_message(sender_address(), entry.to_address, rendered)
+        )
+    except CircuitOpenError as e:
+        _defer(entry, e)
+        return False
+    except Exception as e:
+        logger.warning(
+            "Email sending failed",
+            extra={"email_id": entry.id, "template": entry.template_name, "error": _error_message(e)},
+        )
+        _fail_or_retry(entry, _error_message(e), permanent=transport.is_permanent(e))
+        return True
+    _mark_sent(entry, message_id)
+    return True
+
+async def process_emails(db, entries: list, rate_limiter: RateLimiter):
+    """
+    Sends the claimed emails concurrently, up to EMAIL_SEND_CONCURRENCY at a
+    time and whatever their templates, throttled to the send rate.
+    """
+    # Release the claim transaction before talking to the transport.
+    await db.commit()
+    slots = asyncio.Semaphore(EMAIL_SEND_CONCURRENCY)
+
+    async def send(entry):
+        async with slots:
+            return await _send(entry, rate_limiter)
+
+    deferred = (await asyncio.gather(*(send(entry) for entry in entries))).count(False)
+    if deferred:
+        logger.info("Deferred emails while the circuit is open", extra={"emails": deferred})
+    await db.commit()
+
+async def send_next_batch(rate_limiter: RateLimiter, batch_size: int = EMAIL_BATCH_SIZE) -> int:
+    """
+    Claims and sends one batch of outbox emails.
+
+    :return: The number of processed emails, 0 if there was nothing to do or
+             the transport's circuit is open.
+    """
+    if transport.breaker.is_open:
+        return 0
+    async with AsyncSessionLocal() as db:
+        try:
+            entries = await claim_emails(db, batch_size)
+            if not entries:
+                return 0
+            await process_emails(db, entries, rate_limiter)
+            return len(entries)
+        except Exception:
+            await db.rollback()
+            logger.exception("Email outbox worker error")
+            return 0
+
+async def outbox_stats(db) -> dict:
+    counts = dict((await db.execute(
+        select(EmailOutboxEntry.status, func.count(EmailOutboxEntry.id))
+        .group_by(EmailOutboxEntry.status)
+    )).all())
+    return {status: counts.get(status, 0) for status in ("pending", "sending", "sent", "failed")}
+
+
+class EmailOutboxWorker:
+    """
+    Drains the email outbox in a background task on the app's event loop,
+    throttled to the SES send rate.
+    """
+
+    def __init__(self, rate: float = SES_MAX_SEND_RATE, poll_interval: float = EMAIL_POLL_INTERVAL,
+                 stale_after: float = EMAIL_STALE_AFTER):
+        self.rate_limiter = RateLimiter(rate)
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._stopping = False
+        self._wakeup = None
+        self._task = None
+
+    async def start(self):
+        if self._task:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="email-outbox-worker")
+
+    async def stop(self, timeout: float = 10.0):
+        if not self._task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, still_running = await asyncio.wait([self._task], timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        self._task = None
+
+    def notify(self):
+        """
+        Wakes the worker right after an email was enqueued.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _requeue_stale_emails(self):
+        async with AsyncSessionLocal() as db:
+            try:
+                requeued = await requeue_stale_emails(db, self.stale_after)
+                if requeued:
+                    logger.warning("Requeued stale outbox emails", extra={"emails": requeued})
+            except Exception:
+                await db.rollback()
+                logger.exception("Failed to requeue stale outbox emails")
+
+    async def _run(self):
+        await self._requeue_stale_emails()
+        while not self._stopping:
+            if await send_next_batch(self.rate_limiter):
+                continue
+            await self._requeue_stale_emails()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self._stopping:
+                self._wakeup.clear()
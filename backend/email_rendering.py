@@ -0,0 +1,144 @@
+"""
+Email content, rendered locally from the Jinja2 templates in `email_templates/`.
+
+Every template has a subject, an HTML part and a text part. They are compiled
+once per process, on first use or at warm-up, so sending an email costs one
+render of already compiled Python code and no SES template lookup. The HTML
+parts are autoescaped, so customer-provided text such as `inquiry_text` cannot
+inject markup; the text parts and the subject are not.
+
+The outbox stores the template name and its data, and renders when it sends.
+"""
+import os
+from dataclasses import dataclass
+from email import charset, policy
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from observability import EMAIL_RENDER_SECONDS, timed
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_templates")
+
+CONFIRMATION_TEMPLATE = "InquiryConfirmationTemplate"
+RESPONSE_TEMPLATE = "InquiryResponseTemplate"
+
+# The legacy `email.mime` classes build and serialize a message about three
+# times faster than `EmailMessage`, whose headers are parsed on every assignment.
+_UTF8 = charset.Charset("utf-8")
+_UTF8.body_encoding = charset.QP
+_CRLF = policy.compat32.clone(linesep="\r\n")
+
+
+@dataclass(frozen=True)
+class EmailTemplate:
+    subject: str
+    html: str
+    text: str
+
+
+@dataclass(frozen=True)
+class RenderedEmail:
+    subject: str
+    html: str
+    text: str
+
+
+# The names are those stored in `email_outbox.template_name`.
+TEMPLATES = {
+    CONFIRMATION_TEMPLATE: EmailTemplate(
+        subject="Confirmation of your inquiry (ID: {{ inquiry_id }})",
+        html="confirmation.html",
+        text="confirmation.txt",
+    ),
+    RESPONSE_TEMPLATE: EmailTemplate(
+        subject="Response to your inquiry (ID: {{ inquiry_id }})",
+        html="response.html",
+        text="response.txt",
+    ),
+}
+
+_compiled = {}
+
+
+def load_templates() -> dict:
+    """
+    Compiles the templates, once per process.
+
+    :return: The compiled (subject, html, text) templates by name.
+    """
+    if len(_compiled) == len(TEMPLATES):
+        return _compiled
+    # Imported here, so that importing the app stays fast.
+    from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+    def environment(autoescape: bool) -> Environment:
+        # Templates ship with the code, so there is no need to check them for changes.
+        return Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=autoescape,
+            undefined=StrictUndefined,
+            auto_reload=False,
+            keep_trailing_newline=True,
+        )
+
+    html_environment, text_environment = environment(autoescape=True), environment(autoescape=False)
+    for name, template in TEMPLATES.items():
+        _compiled[name] = (
+            text_environment.from_string(template.subject),
+            html_environment.get_template(template.html),
+            text_environment.get_template(template.text),
+        )
+    return _compiled
+
+@timed(EMAIL_RENDER_SECONDS)
+def render(template_name: str, data: dict) -> RenderedEmail:
+    """
+    :raises ValueError: If there is no template of that name.
+    :raises jinja2.TemplateError: If `data` lacks a variable of the template.
+    """
+    compiled = _compiled.get(template_name) or load_templates().get(template_name)
+    if compiled is None:
+        raise ValueError(f"Unknown email template: {template_name}")
+    subject, html, text = compiled
+    return RenderedEmail(
+        # A line break in a header would start a new one.
+        subject=" ".join(subject.render(data).split()),
+        html=html.render(data),
+        text=text.render(data),
+    )
+
+def build_message(sender: str, to_address: str, rendered: RenderedEmail) -> MIMEMultipart:
+    """
+    :return: A multipart/alternative message with the text and HTML parts,
+             serialized with CRLF line endings as SMTP and SES expect.
+    """
+    message = MIMEMultipart("alternative", policy=_CRLF)
+    message["From"] = sender
+    message["To"] = to_address
+    message["Subject"] = rendered.subject if rendered.subject.isascii() else Header(rendered.subject, "utf-8")
+    message.attach(MIMEText(rendered.text, "plain", _UTF8))
+    message.attach(MIMEText(rendered.html, "html", _UTF8))
+    return message
+
+def is_render_error(error: Exception) -> bool:
+    """
+    True for errors that rendering the same email again would raise again.
+    """
+    from jinja2 import TemplateError
+
+    return isinstance(error, (ValueError, TemplateError))
+
+def confirmation_email_data(name: str, inquiry_id: int, inquiry_text: str) -> dict:
+    return {
+        "name": name,
+        "inquiry_id": str(inquiry_id),
+        "inquiry_text": inquiry_text
+    }
+
+def response_email_data(inquiry_id: int, response_text: str, inquiry_text: str) -> dict:
+    return {
+        "inquiry_id": str(inquiry_id),
+        "response_text": response_text,
+        "inquiry_text": inquiry_text
+    }
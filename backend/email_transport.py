@@ -0,0 +1,210 @@
+"""
+Delivery of rendered emails (see email_rendering.py).
+
+- `ses` (default): `SendRawEmail` through the shared, connection-pooled SES
+  client of ses.py.
+- `smtp`: any SMTP server, over a pool of up to SMTP_MAX_CONNECTIONS kept-open
+  connections, for deployments without SES or for a local mail catcher.
+
+Both go through a circuit breaker (see resilience.py), which the email outbox
+checks before it claims emails. Other transports implement `EmailTransport`.
+"""
+import asyncio
+import logging
+import os
+import smtplib
+import ssl
+import threading
+from abc import ABC, abstractmethod
+from email.message import Message
+from email.utils import make_msgid
+
+from observability import SMTP_SEND_SECONDS, timed
+from resilience import CircuitBreaker
+import ses
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "ses")
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME") or None
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD") or None
+# "starttls", "ssl" (implicit TLS, usually port 465) or "none".
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "starttls")
+SMTP_MAX_CONNECTIONS = int(os.getenv("SMTP_MAX_CONNECTIONS", "4"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+
+def sender_address() -> str:
+    sender = os.getenv("SENDER_EMAIL")
+    if not sender:
+        raise RuntimeError("SENDER_EMAIL environment variable not set. Cannot send email.")
+    return sender
+
+
+class EmailTransport(ABC):
+    name = None
+    breaker = None
+
+    @abstractmethod
+    async def send(self, message: Message) -> str:
+        """
+        Delivers `message` to the address in its `To` header.
+
+        :return: The message ID.
+        :raises resilience.CircuitOpenError: While the transport is considered down.
+        """
+
+    def is_permanent(self, error: Exception) -> bool:
+        """
+        True if sending the same message again would fail again.
+        """
+        return False
+
+    async def warm_up(self):
+        pass
+
+    def ready(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+
+class SesTransport(EmailTransport):
+    name = "ses"
+    breaker = ses.breaker
+
+    async def send(self, message: Message) -> str:
+        return await ses.send_raw_email(message["From"], message["To"], message.as_bytes())
+
+    def is_permanent(self, error: Exception) -> bool:
+        return ses.is_permanent(error)
+
+    async def warm_up(self):
+        await ses.get_client()
+
+    def ready(self) -> bool:
+        return ses.client_ready()
+
+    async def close(self):
+        await ses.close_client()
+
+
+class SmtpTransport(EmailTransport):
+    """
+    Sends through smtplib in worker threads. Connections are returned to the
+    pool after every message and reused; one that the server closed while
+    idle is replaced once before the send counts as failed.
+    """
+    name = "smtp"
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, username: str = SMTP_USERNAME,
+                 password: str = SMTP_PASSWORD, security: str = SMTP_SECURITY,
+                 max_connections: int = SMTP_MAX_CONNECTIONS, timeout: float = SMTP_TIMEOUT):
+        if security not in ("starttls", "ssl", "none"):
+            raise ValueError(f"Unknown SMTP_SECURITY: {security}")
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.security = security
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(
+            "smtp", failure_threshold=5, reset_timeout=30.0, max_timeout=timeout,
+            is_failure=lambda error: not self.is_permanent(error),
+        )
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.security == "ssl":
+            connection = smtplib.SMTP_SSL(
+                self.host, self.port, timeout=self.timeout, context=ssl.create_default_context(),
+            )
+        else:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                connection.starttls(context=ssl.create_default_context())
+        if self.username:
+            connection.login(self.username, self.password or "")
+        return connection
+
+    def _deliver(self, message: Message):
+        # Runs in a worker thread; the connection goes back to the pool only if it is healthy.
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = self._connect()
+                connection.send_message(message)
+            else:
+                try:
+                    connection.send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    connection = self._connect()
+                    connection.send_message(message)
+        except Exception:
+            self._discard(connection)
+            raise
+        with self._lock:
+            self._idle.append(connection)
+
+    @staticmethod
+    def _discard(connection):
+        if connection is None:
+            return
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @timed(SMTP_SEND_SECONDS)
+    async def send(self, message: Message) -> str:
+        if "Message-ID" not in message:
+            message["Message-ID"] = make_msgid(domain=message["From"].rsplit("@", 1)[-1].strip("> "))
+        async with self._slots:
+            await self.breaker.call(asyncio.to_thread, self._deliver, message)
+        logger.info("Email sent", extra={"message_id": message["Message-ID"]})
+        return message["Message-ID"]
+
+    def is_permanent(self, error: Exception) -> bool:
+        # 5xx replies are permanent by definition; 4xx ones and lost connections
+        # are not. A failed login is the server's configuration, not the message's.
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            return False
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(code >= 500 for code, _ in error.recipients.values())
+        if isinstance(error, smtplib.SMTPResponseException):
+            return error.smtp_code >= 500
+        return False
+
+    async def warm_up(self):
+        connection = await asyncio.to_thread(self._connect)
+        with self._lock:
+            self._idle.append(connection)
+
+    def ready(self) -> bool:
+        return bool(self._idle)
+
+    async def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            try:
+                await asyncio.to_thread(connection.quit)
+            except Exception:
+                self._discard(connection)
+
+
+def create_transport(name: str = EMAIL_TRANSPORT) -> EmailTransport:
+    if name == "ses":
+        return SesTransport()
+    if name == "smtp":
+        return SmtpTransport()
+    raise ValueError(f"Unknown EMAIL_TRANSPORT: {name}")
+
+transport = create_transport()
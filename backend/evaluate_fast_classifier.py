@@ -0,0 +1,126 @@
+"""
+Offline evaluation of the local fast classifier against the labels the LLM
+stored in the inquiries table. Inquiries labeled by the fast path itself or
+without a job record are ignored.
+
+    python evaluate_fast_classifier.py --thresholds 0.65 0.8 0.85 0.9
+
+Without a labeled database, `--labels` evaluates against an NDJSON file of
+{"inquiry", "category", "urgency"} lines instead, such as the hand-labeled
+sample in benchmarks/data/labeled_inquiries.ndjson:
+
+    python evaluate_fast_classifier.py --labels benchmarks/data/labeled_inquiries.ndjson
+
+For every threshold it reports the fraction of LLM calls the fast path would
+have avoided and how often it agrees with the stored LLM category and urgency.
+"""
+import argparse
+import json
+import time
+from collections import Counter
+
+from sqlalchemy import func
+
+from database import SessionLocal, InquiryRecord, ClassificationJob
+import fast_classifier
+
+UNLABELED = ("Pending", "N/A")
+
+
+def load_labeled_inquiries(db, limit: int = None):
+    query = (
+        db.query(InquiryRecord.inquiry_text, InquiryRecord.category, InquiryRecord.urgency)
+        .join(ClassificationJob, ClassificationJob.inquiry_id == InquiryRecord.id)
+        .filter(
+            ClassificationJob.source.in_(("llm", "cache")),
+            InquiryRecord.category.notin_(UNLABELED),
+            InquiryRecord.urgency.notin_(UNLABELED),
+        )
+        .order_by(InquiryRecord.id)
+        .execution_options(yield_per=1000)
+    )
+    if limit:
+        query = query.limit(limit)
+    return query
+
+def load_labeled_file(path: str, limit: int = None):
+    rows = []
+    with open(path, encoding="utf-8") as labels:
+        for line in labels:
+            if line.strip():
+                row = json.loads(line)
+                rows.append((row["inquiry"], row["category"], row["urgency"]))
+    return rows[:limit] if limit else rows
+
+def print_live_sources(db):
+    counts = dict(
+        db.query(ClassificationJob.source, func.count(ClassificationJob.id))
+        .filter(ClassificationJob.status == "done")
+        .group_by(ClassificationJob.source)
+        .all()
+    )
+    total = sum(counts.values())
+    if not total:
+        return
+    print("Classified jobs by source: " + ", ".join(f"{source}={count}" for source, count in sorted(counts.items(), key=str)))
+    avoided = counts.get("fast", 0) + counts.get("cache", 0)
+    print(f"LLM calls avoided in production: {avoided / total:.1%}")
+    print()
+
+def evaluate(rows, thresholds):
+    rows = list(rows)
+    predictions = []
+    started = time.perf_counter()
+    for inquiry_text, category, urgency in rows:
+        classification, confidence = fast_classifier.classify(inquiry_text)
+        predictions.append((classification, confidence, category, urgency))
+    elapsed = time.perf_counter() - started
+
+    total = len(predictions)
+    print(f"Labeled inquiries: {total}")
+    if not total:
+        return
+    print(f"Classifier time: {elapsed / total * 1e6:.1f} µs per inquiry")
+    print()
+    print(f"{'threshold':>9}  {'avoided':>8}  {'category agree':>14}  {'urgency agree':>13}")
+
+    for threshold in thresholds:
+        covered = [p for p in predictions if p[0] is not None and p[1] >= threshold]
+        category_agree = sum(1 for c, _, category, _ in covered if c["category"] == category)
+        urgency_agree = sum(1 for c, _, _, urgency in covered if c["urgency"] == urgency)
+        avoided = len(covered) / total
+        category_rate = category_agree / len(covered) if covered else 0.0
+        urgency_rate = urgency_agree / len(covered) if covered else 0.0
+        print(f"{threshold:>9.2f}  {avoided:>8.1%}  {category_rate:>14.1%}  {urgency_rate:>13.1%}")
+
+    confusion = Counter(
+        (category, c["category"])
+        for c, confidence, category, _ in predictions
+        if c is not None and confidence >= fast_classifier.FAST_CLASSIFIER_THRESHOLD and c["category"] != category
+    )
+    if confusion:
+        print()
+        print(f"Category disagreements at threshold {fast_classifier.FAST_CLASSIFIER_THRESHOLD:.2f} (LLM -> fast):")
+        for (llm_category, fast_category), count in confusion.most_common():
+            print(f"  {llm_category} -> {fast_category}: {count}")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--thresholds", type=float, nargs="+", default=[0.65, 0.8, 0.85, 0.9])
+    arg_parser.add_argument("--labels", default=None, help="NDJSON file of labeled inquiries instead of the database")
+    arg_parser.add_argument("--limit", type=int, default=None, help="Only evaluate the first N inquiries")
+    args = arg_parser.parse_args()
+
+    if args.labels:
+        evaluate(load_labeled_file(args.labels, args.limit), sorted(args.thresholds))
+        return
+
+    db = SessionLocal()
+    try:
+        print_live_sources(db)
+        evaluate(load_labeled_inquiries(db, args.limit), sorted(args.thresholds))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
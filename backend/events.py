@@ -0,0 +1,294 @@
+"""
+Live inquiry updates for the manager dashboard.
+
+Every change the dashboard should see is recorded as a row in `inquiry_events`
+in the same transaction as the change itself. The `EventBroker` reads new rows
+once per wake-up, joined with the current list projection of the inquiry, and
+fans them out to all open streams of this process. It is woken by
+`broker.notify()` after local commits and, with `EVENTS_BACKEND=postgres`, by a
+LISTEN/NOTIFY message from any process sharing the database; otherwise changes
+made by other processes are picked up by polling. Event ids double as SSE ids,
+so a reconnecting client resumes from its `Last-Event-ID`.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.engine import make_url
+
+from database import (
+    AsyncSessionLocal, ASYNC_DATABASE_URL, async_engine, DataVersion, InquiryEvent, InquiryRecord, INQUIRIES_VERSION,
+)
+from serializers import INQUIRY_LIST_COLUMNS, list_item
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "2.0"))
+EVENTS_RETENTION_HOURS = float(os.getenv("EVENTS_RETENTION_HOURS", "24"))
+EVENTS_BACKFILL_LIMIT = int(os.getenv("EVENTS_BACKFILL_LIMIT", "500"))
+# Streams are closed after this long and resumed by the browser, so that open
+# streams never hold up a graceful shutdown for long.
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "300"))
+KEEPALIVE_INTERVAL = 15.0
+RECONNECT_DELAY_MS = 3000
+SUBSCRIBER_QUEUE_SIZE = 1000
+NOTIFY_CHANNEL = "inquiry_events"
+PRUNE_INTERVAL = 600.0
+
+# On Postgres, ids are assigned at insert time but become visible at commit,
+# which can happen out of order, so every read looks this many ids back.
+REORDER_WINDOW = 100
+
+INQUIRY_CREATED = "inquiry.created"
+INQUIRY_CLASSIFIED = "inquiry.classified"
+INQUIRY_STATUS_CHANGED = "inquiry.status"
+INQUIRY_ARCHIVED = "inquiry.archived"
+
+
+async def record_events(db, inquiry_ids: list, event_type: str):
+    """
+    Adds one event per inquiry to the current transaction, in a single
+    executemany, and bumps the version of the inquiry list. The caller commits
+    right away and then calls `broker.notify()`.
+    """
+    if not inquiry_ids:
+        return
+    # The counter row stays locked until the commit, so writers take turns from
+    # here on: versions and the ids of the events below are assigned in commit
+    # order, and a reader that sees one has seen all earlier ones too.
+    await db.execute(
+        update(DataVersion)
+        .where(DataVersion.name == INQUIRIES_VERSION)
+        .values(version=DataVersion.version + 1)
+    )
+    await db.execute(insert(InquiryEvent), [
+        {"inquiry_id": inquiry_id, "type": event_type} for inquiry_id in inquiry_ids
+    ])
+    if EVENTS_BACKEND == "postgres":
+        # Delivered to the listeners of all processes when the transaction commits.
+        await db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+
+async def latest_event_id(db) -> int:
+    return (await db.execute(select(func.max(InquiryEvent.id)))).scalar() or 0
+
+async def load_events(db, after_id: int, limit: int) -> list:
+    """
+    Events after `after_id` with the current list projection of their inquiry.
+    Inquiries archived since have no projection any more; their events carry
+    just the id, and the `inquiry.archived` event tells the dashboard to drop
+    the row.
+    """
+    rows = (await db.execute(
+        select(
+            InquiryEvent.id.label("event_id"), InquiryEvent.type.label("event_type"),
+            InquiryEvent.inquiry_id.label("event_inquiry_id"), *INQUIRY_LIST_COLUMNS,
+        )
+        .select_from(InquiryEvent)
+        .outerjoin(InquiryRecord, InquiryRecord.id == InquiryEvent.inquiry_id)
+        .where(InquiryEvent.id > after_id)
+        .order_by(InquiryEvent.id)
+        .limit(limit)
+    )).all()
+    return [
+        {
+            "id": r.event_id,
+            "type": r.event_type,
+            "inquiry": list_item(r) if r.id is not None else {"id": r.event_inquiry_id},
+        }
+        for r in rows
+    ]
+
+
+class Subscription:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client is too slow; it is told to reload instead.
+            self.overflowed = True
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+class EventBroker:
+    def __init__(self, backend: str = EVENTS_BACKEND, poll_interval: float = EVENTS_POLL_INTERVAL):
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.last_id = 0
+        self._subscribers = set()
+        self._recent = deque(maxlen=10 * REORDER_WINDOW)
+        self._recent_ids = set()
+        self._wakeup = None
+        self._task = None
+        self._listener = None
+        self._stopping = False
+
+    async def start(self):
+        if self._task:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._recent.clear()
+        self._recent_ids.clear()
+        async with AsyncSessionLocal() as db:
+            self.last_id = await latest_event_id(db)
+        if self.backend == "postgres":
+            await self._listen()
+        self._task = asyncio.create_task(self._run(), name="event-broker")
+
+    async def stop(self, timeout: float = 5.0):
+        if not self._task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, still_running = await asyncio.wait([self._task], timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        self._task = None
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        for subscription in list(self._subscribers):
+            subscription.put(None)
+
+    def notify(self):
+        """
+        Wakes the broker right after events were committed.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    async def _listen(self):
+        import asyncpg
+
+        url = make_url(ASYNC_DATABASE_URL).set(drivername="postgresql")
+        self._listener = await asyncpg.connect(url.render_as_string(hide_password=False))
+        await self._listener.add_listener(NOTIFY_CHANNEL, lambda *args: self.notify())
+
+    def _remember(self, event_id: int):
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_ids.discard(self._recent[0])
+        self._recent.append(event_id)
+        self._recent_ids.add(event_id)
+
+    async def _dispatch(self):
+        window = REORDER_WINDOW if async_engine.dialect.name == "postgresql" else 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                events = await load_events(db, max(0, self.last_id - window), EVENTS_BACKFILL_LIMIT)
+                for event in events:
+                    if event["id"] in self._recent_ids:
+                        continue
+                    self._remember(event["id"])
+                    self.last_id = max(self.last_id, event["id"])
+                    for subscription in list(self._subscribers):
+                        subscription.put(event)
+                if len(events) < EVENTS_BACKFILL_LIMIT:
+                    return
+
+    async def _prune(self):
+        cutoff = datetime.utcnow() - timedelta(hours=EVENTS_RETENTION_HOURS)
+        async with AsyncSessionLocal() as db:
+            # The newest event always stays: SQLite hands out max(id) + 1 for new
+            # rows, so ids would start over below `last_id` and never be delivered.
+            newest = select(func.max(InquiryEvent.id)).scalar_subquery()
+            await db.execute(delete(InquiryEvent).where(InquiryEvent.created_at < cutoff, InquiryEvent.id < newest))
+            await db.commit()
+
+    async def _run(self):
+        last_prune = 0.0
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self._dispatch()
+                if loop.time() - last_prune > PRUNE_INTERVAL:
+                    await self._prune()
+                    last_prune = loop.time()
+            except Exception:
+                logger.exception("Event broker error")
+
+
+broker = EventBroker()
+
+
+def _format(event: dict) -> str:
+    return f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+
+def _format_reset(last_id: int) -> str:
+    # Carries the current id, so that the browser resumes from here on reconnect.
+    return f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+
+async def event_stream(request, since_id: int = None):
+    """
+    Server-sent events for the dashboard: one `message` per event with the
+    event type and the inquiry's list projection, or a `reset` event if the
+    client fell too far behind and has to reload its first page.
+
+    :param since_id: The last event id the client has seen; by default the
+                     stream starts with the next event.
+    """
+    subscription = broker.subscribe()
+    sent = deque(maxlen=SUBSCRIBER_QUEUE_SIZE)
+    loop = asyncio.get_running_loop()
+    closes_at = loop.time() + EVENTS_MAX_STREAM_SECONDS
+    try:
+        # The id lets a stream that closes before its first event still resume
+        # from here rather than from whatever happens after the reconnect.
+        yield f"retry: {RECONNECT_DELAY_MS}\nid: {broker.last_id if since_id is None else since_id}\n\n"
+        if since_id is not None:
+            async with AsyncSessionLocal() as db:
+                backlog = await load_events(db, since_id, EVENTS_BACKFILL_LIMIT + 1)
+            if len(backlog) > EVENTS_BACKFILL_LIMIT:
+                yield _format_reset(broker.last_id)
+            else:
+                for event in backlog:
+                    sent.append(event["id"])
+                    yield _format(event)
+
+        while loop.time() < closes_at:
+            if subscription.overflowed:
+                subscription.drain()
+                subscription.overflowed = False
+                yield _format_reset(broker.last_id)
+                continue
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            if since_id is not None and event["id"] <= since_id or event["id"] in sent:
+                continue
+            sent.append(event["id"])
+            yield _format(event)
+    finally:
+        broker.unsubscribe(subscription)
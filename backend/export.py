@@ -0,0 +1,164 @@
+"""
+Streaming bulk export of inquiries as CSV, NDJSON or Parquet.
+
+Rows are read through a server-side cursor (`yield_per`) in chunks of
+EXPORT_CHUNK_SIZE and every chunk is encoded and sent before the next one is
+fetched, so memory use depends on the chunk size, not on the size of the table.
+The response has no Content-Length and is sent with chunked encoding.
+"""
+import csv
+import io
+import json
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, InquiryRecord
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+EXPORT_COLUMNS = (
+    InquiryRecord.id,
+    InquiryRecord.name,
+    InquiryRecord.email,
+    InquiryRecord.inquiry_text,
+    InquiryRecord.category,
+    InquiryRecord.urgency,
+    InquiryRecord.summary,
+    InquiryRecord.status,
+    InquiryRecord.response_count,
+    InquiryRecord.created_at,
+)
+FIELD_NAMES = [column.key for column in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_query(category: str = None, urgency: str = None, status: str = None,
+                 created_from=None, created_to=None):
+    """
+    Oldest first, in the order of the (created_at, id) index, or of the
+    category/urgency index when filtering by one of them.
+    """
+    query = select(*EXPORT_COLUMNS)
+    if category:
+        query = query.where(InquiryRecord.category == category)
+    if urgency:
+        query = query.where(InquiryRecord.urgency == urgency)
+    if status:
+        query = query.where(InquiryRecord.status == status)
+    if created_from:
+        query = query.where(InquiryRecord.created_at >= created_from)
+    if created_to:
+        query = query.where(InquiryRecord.created_at < created_to)
+    return query.order_by(InquiryRecord.created_at, InquiryRecord.id)
+
+async def _chunks(query, chunk_size: int):
+    # A session of its own: the request's session is closed before a streamed body is sent.
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+async def _csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELD_NAMES)
+    async for rows in chunks:
+        writer.writerows(row[:-1] + (_iso(row.created_at),) for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+async def _ndjson(chunks):
+    async for rows in chunks:
+        yield "".join(
+            json.dumps({**row._asdict(), "created_at": _iso(row.created_at)}) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+class _ChunkSink:
+    """
+    Write-only file for pyarrow whose contents are taken out after every row
+    group, so that the Parquet file is never held in memory as a whole.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+async def _parquet(chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("email", pa.string()),
+        ("inquiry_text", pa.string()),
+        ("category", pa.string()),
+        ("urgency", pa.string()),
+        ("summary", pa.string()),
+        ("status", pa.string()),
+        ("response_count", pa.int32()),
+        ("created_at", pa.timestamp("us")),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in chunks:
+            # One row group per chunk.
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)],
+                schema=schema,
+            ))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+ENCODERS = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+
+
+def export_stream(export_format: str, query, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    :return: An async iterator of encoded chunks.
+    :raises HTTPException: 501 for Parquet if pyarrow is not installed on the server.
+    """
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export is not available: pyarrow is not installed")
+    return ENCODERS[export_format](_chunks(query, chunk_size))
@@ -0,0 +1,107 @@
+import os
+import re
+
+FAST_CLASSIFIER_ENABLED = os.getenv("FAST_CLASSIFIER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Lets a single unambiguous keyword hit through, see evaluate_fast_classifier.py.
+FAST_CLASSIFIER_THRESHOLD = float(os.getenv("FAST_CLASSIFIER_THRESHOLD", "0.65"))
+
+# Mirrors the guidelines of the system prompt in bedrock_llm.py.
+CATEGORY_KEYWORDS = {
+    "Technical": [
+        "bug", "bugs", "error", "errors", "crash", "crashes", "crashed", "not working", "doesn't work",
+        "does not work", "broken", "can't log in", "cannot log in", "can't login", "cannot login",
+        "login fails", "exception", "timeout", "outage", "stack trace", "not loading", "won't load",
+    ],
+    "Billing": [
+        "invoice", "invoices", "payment", "payments", "refund", "refunds", "subscription",
+        "subscriptions", "charged", "charge", "billing", "receipt", "credit card", "double charged",
+    ],
+    "Sales": [
+        "pricing", "price", "prices", "plan", "plans", "discount", "discounts", "quote", "buy",
+        "purchase", "upgrade", "demo", "enterprise license", "how much",
+    ],
+}
+
+URGENCY_KEYWORDS = {
+    "High": [
+        "urgent", "urgently", "asap", "immediately", "critical", "emergency", "outage",
+        "production is down", "site is down", "can't access", "cannot access", "blocked",
+    ],
+    "Low": [
+        "no rush", "whenever", "just wondering", "curious", "feedback", "suggestion", "when you have time",
+    ],
+}
+
+SUMMARY_MAX_LENGTH = 120
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _compile(keywords):
+    alternatives = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)", re.IGNORECASE)
+
+CATEGORY_PATTERNS = {category: _compile(keywords) for category, keywords in CATEGORY_KEYWORDS.items()}
+URGENCY_PATTERNS = {urgency: _compile(keywords) for urgency, keywords in URGENCY_KEYWORDS.items()}
+
+
+def _summarize(inquiry_text: str) -> str:
+    """
+    Extractive: the first sentence of the inquiry, not a summary written by the LLM.
+    """
+    text = " ".join(inquiry_text.split())
+    sentence = SENTENCE_END.split(text, maxsplit=1)[0]
+    if len(sentence) > SUMMARY_MAX_LENGTH:
+        sentence = sentence[:SUMMARY_MAX_LENGTH - 3].rstrip() + "..."
+    return sentence
+
+def classify(inquiry_text: str):
+    """
+    Classifies an inquiry with the keyword rules of the system prompt.
+
+    The confidence grows with the number of keyword hits of the winning category
+    and shrinks with hits of competing categories:
+    one unambiguous hit gives 0.67, two give 0.8, three give 0.86.
+
+    :return: A tuple (classification dict, confidence), or (None, 0.0) if no rule matched.
+    """
+    hits = {
+        category: len(pattern.findall(inquiry_text))
+        for category, pattern in CATEGORY_PATTERNS.items()
+    }
+    category, top_hits = max(hits.items(), key=lambda item: item[1])
+    if top_hits == 0:
+        return None, 0.0
+    confidence = top_hits / (sum(hits.values()) + 0.5)
+
+    if URGENCY_PATTERNS["High"].search(inquiry_text):
+        urgency = "High"
+    elif URGENCY_PATTERNS["Low"].search(inquiry_text):
+        urgency = "Low"
+    else:
+        urgency = "Medium"
+
+    classification = {
+        "category": category,
+        "urgency": urgency,
+        "summary": _summarize(inquiry_text),
+    }
+    return classification, confidence
+
+
+class FastClassifier:
+    """
+    Answers inquiries locally when the keyword rules are confident enough, so
+    only ambiguous inquiries need an LLM call.
+    """
+
+    def __init__(self, threshold: float = FAST_CLASSIFIER_THRESHOLD):
+        self.threshold = threshold
+
+    def classify(self, inquiry_text: str):
+        """
+        :return: The classification dict if the confidence reaches the threshold, else None.
+        """
+        classification, confidence = classify(inquiry_text)
+        if classification is None or confidence < self.threshold:
+            return None
+        return classification
@@ -0,0 +1,53 @@
+"""
+Production profile: gunicorn managing uvicorn workers, sized to the machine.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The master applies migrations once before forking, so that workers neither race
+nor wait for each other at startup. Every worker runs its own event broker,
+but only one of them at a time runs the classification workers and the email
+sender, see background.py.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv("BIND", "127.0.0.1:8000")
+# The workers are async, so one per core keeps every core busy.
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Open event streams end when the broker stops, so shutdown does not wait for them.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Above the keepalive timeout of nginx towards the upstream.
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+# Recycles workers now and then, with jitter so that they do not restart together.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+accesslog = None
+errorlog = "-"
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Stale files of a previous run would be added to the new counters.
+        shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+    from database import engine, init_db
+    from observability import configure_logging
+
+    configure_logging()
+    init_db()
+    # Forked workers must not share the master's connections.
+    engine.dispose()
+    # Inherited by the workers forked from here on.
+    os.environ["RUN_MIGRATIONS_ON_STARTUP"] = "false"
+
+def child_exit(server, worker):
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,119 @@
+"""
+Warm-up and health checks.
+
+The app starts serving before its heavy components exist: LangChain and the
+Bedrock client are built on the first classification, the compiled email
+templates and the SES client (or the first SMTP connection) on the first
+email. With WARMUP_ON_STARTUP, a background task builds them right after
+startup instead, so the first requests do not pay for it.
+
+- Liveness (`/api/health/live`): the process is up and serving.
+- Readiness (`/api/health/ready`): warm-up has finished and the database
+  answers. The LLM and the email transport are reported too, but do not fail
+  readiness: while they are down, classifications and emails wait in their
+  queues.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import text
+
+from classification_engine import current_engine, get_engine
+from database import AsyncSessionLocal
+from email_transport import transport as email_transport
+import email_rendering
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "2.0"))
+
+
+class WarmUp:
+    def __init__(self):
+        self.state = "pending"
+        self.seconds = None
+        self._task = None
+
+    def start(self):
+        if WARMUP_ON_STARTUP and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="warm-up")
+        elif not WARMUP_ON_STARTUP:
+            self.state = "skipped"
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        started = time.perf_counter()
+        self.state = "running"
+        try:
+            # Importing LangChain and building the client block, so keep them off the event loop.
+            await asyncio.to_thread(get_engine)
+            email_rendering.load_templates()
+            if os.getenv("SENDER_EMAIL"):
+                await email_transport.warm_up()
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT 1"))
+            self.state = "done"
+        except Exception:
+            self.state = "failed"
+            logger.exception("Warm-up failed")
+        self.seconds = time.perf_counter() - started
+        logger.info("Warm-up finished", extra={"state": self.state, "seconds": self.seconds})
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed", "skipped")
+
+
+warm_up = WarmUp()
+
+
+async def _check_database() -> dict:
+    started = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            await asyncio.wait_for(db.execute(text("SELECT 1")), READINESS_DB_TIMEOUT)
+    except Exception as e:
+        return {"status": "down", "error": str(e) or type(e).__name__}
+    return {"status": "up", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+def _check_llm() -> dict:
+    # Only reports the engine once built: building it here would stall the event loop.
+    engine = current_engine()
+    if engine is None:
+        return {"status": "not_initialized", "circuit": None}
+    if engine.chain is None:
+        return {"status": "down", "error": "LLM chain failed to initialize", "circuit": None}
+    circuit = engine.breaker.state
+    return {"status": "down" if circuit == "open" else "up", "circuit": circuit}
+
+def _check_email() -> dict:
+    if not os.getenv("SENDER_EMAIL"):
+        return {"status": "down", "error": "SENDER_EMAIL is not set"}
+    circuit = email_transport.breaker.state
+    if circuit == "open":
+        return {"status": "down", "transport": email_transport.name, "circuit": circuit}
+    return {"status": "up" if email_transport.ready() else "not_initialized",
+            "transport": email_transport.name, "circuit": circuit}
+
+async def readiness() -> tuple:
+    """
+    :return: The readiness report and its HTTP status: 503 until warm-up has
+             finished or while the database is down, else 200. The report's
+             status is "degraded" if the LLM or the email transport is down.
+    """
+    checks = {"database": await _check_database(), "llm": _check_llm(), "email": _check_email()}
+    warm = {"state": warm_up.state, "seconds": warm_up.seconds}
+    if not warm_up.finished or checks["database"]["status"] != "up":
+        status, code = "not_ready", 503
+    elif any(check["status"] == "down" for check in checks.values()):
+        status, code = "degraded", 200
+    else:
+        status, code = "ready", 200
+    return {"status": status, "warm_up": warm, "checks": checks}, code
@@ -0,0 +1,131 @@
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_, update
+
+from database import InquiryRecord, ResponseRecord
+from pagination import decode_queue_cursor, encode_queue_cursor
+
+OPEN = "open"
+ANSWERED = "answered"
+CLOSED = "closed"
+STATUSES = (OPEN, ANSWERED, CLOSED)
+
+# Priority of the open queue. "Pending" inquiries are still being classified and
+# "N/A" ones could not be classified, so they come after the known urgencies.
+URGENCY_ORDER = ("High", "Medium", "Low", "Pending", "N/A")
+
+
+async def _conflict(db, inquiry_id: int):
+    """
+    Explains why a conditional status update matched no row.
+
+    :raises HTTPException: 404 if the inquiry does not exist, else 409.
+    """
+    current = (await db.execute(
+        select(InquiryRecord.status, InquiryRecord.response_count).where(InquiryRecord.id == inquiry_id)
+    )).first()
+    if current is None:
+        raise HTTPException(status_code=404, detail="Inquiry not found")
+    raise HTTPException(
+        status_code=409,
+        detail=f"Inquiry is {current.status} and has {current.response_count} response(s); reload it and try again.",
+    )
+
+async def add_response(db, inquiry_id: int, response_text: str, responder: str = None,
+                       expected_response_count: int = None) -> ResponseRecord:
+    """
+    Marks the inquiry answered and adds the response to the current session.
+
+    The status change is a single conditional UPDATE, so of two managers
+    answering the same inquiry concurrently only one succeeds. Without
+    `expected_response_count` only open inquiries can be answered; with it, a
+    follow-up is accepted if nobody else responded since the caller loaded the
+    thread. Closed inquiries never accept responses.
+
+    :raises HTTPException: 404 if the inquiry does not exist, 409 on a conflict.
+    """
+    conditions = [InquiryRecord.id == inquiry_id, InquiryRecord.status != CLOSED]
+    if expected_response_count is None:
+        conditions.append(InquiryRecord.status == OPEN)
+    else:
+        conditions.append(InquiryRecord.response_count == expected_response_count)
+
+    result = await db.execute(
+        update(InquiryRecord)
+        .where(*conditions)
+        .values(status=ANSWERED, response_count=InquiryRecord.response_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        await _conflict(db, inquiry_id)
+
+    response = ResponseRecord(inquiry_id=inquiry_id, response_text=response_text, responder=responder)
+    db.add(response)
+    return response
+
+async def set_status(db, inquiry_id: int, status: str, allowed_from: tuple):
+    """
+    Atomically moves the inquiry to `status` if it is currently in one of the
+    `allowed_from` statuses.
+
+    :raises HTTPException: 404 if the inquiry does not exist, 409 on a conflict.
+    """
+    result = await db.execute(
+        update(InquiryRecord)
+        .where(InquiryRecord.id == inquiry_id, InquiryRecord.status.in_(allowed_from))
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        await _conflict(db, inquiry_id)
+
+async def get_thread(db, inquiry_id: int) -> list:
+    return (await db.execute(
+        select(ResponseRecord)
+        .where(ResponseRecord.inquiry_id == inquiry_id)
+        .order_by(ResponseRecord.created_at, ResponseRecord.id)
+    )).scalars().all()
+
+async def fetch_open_queue(db, columns: tuple, limit: int, cursor: str = None):
+    """
+    Open inquiries by urgency (see `URGENCY_ORDER`) and then oldest first.
+
+    Rather than sorting all open inquiries by a computed urgency rank, every
+    urgency is read as its own range of the (status, urgency, created_at, id)
+    index, in priority order, until the page is full.
+
+    :return: The rows of the page and the cursor of the next page, or None.
+    """
+    start_rank, after = 0, None
+    if cursor:
+        start_rank, created_at, record_id = decode_queue_cursor(cursor)
+        after = (created_at, record_id)
+
+    rows = []
+    for rank in range(start_rank, len(URGENCY_ORDER)):
+        query = select(*columns).where(
+            InquiryRecord.status == OPEN,
+            InquiryRecord.urgency == URGENCY_ORDER[rank],
+        )
+        if rank == start_rank and after:
+            query = query.where(tuple_(InquiryRecord.created_at, InquiryRecord.id) > tuple_(*after))
+        query = query.order_by(InquiryRecord.created_at, InquiryRecord.id).limit(limit + 1 - len(rows))
+        rows += [(rank, row) for row in (await db.execute(query)).all()]
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rank, row = rows[limit - 1]
+        next_cursor = encode_queue_cursor(rank, row.created_at, row.id)
+    return [row for _, row in rows[:limit]], next_cursor
+
+async def open_backlog(db) -> dict:
+    """
+    Counts open inquiries per urgency, from the open queue index alone.
+    """
+    counts = dict((await db.execute(
+        select(InquiryRecord.urgency, func.count())
+        .where(InquiryRecord.status == OPEN)
+        .group_by(InquiryRecord.urgency)
+    )).all())
+    return {"total": sum(counts.values()), "by_urgency": counts}
@@ -1,18 +1,68 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
-from database import get_db, InquiryRecord, init_db
-from bedrock_llm import chain, parser, InquiryClassification
-from ses import send_confirmation_email, send_response_email
+from sqlalchemy import select
+
+from database import engine, async_engine, get_async_db, InquiryRecord, init_db
+from background import BackgroundWorkers
+from classification_queue import ClassificationWorkerPool, enqueue_classification, queue_stats, PENDING_CLASSIFICATION
+from classification_engine import current_engine
+from email_outbox import EmailOutboxWorker, enqueue_email, outbox_stats
+from email_transport import transport as email_transport
+import email_rendering
+from pagination import encode_cursor, after_cursor, encode_offset_cursor, decode_offset_cursor
+import inquiry_status
+from serializers import INQUIRY_LIST_COLUMNS, list_item
+import events
+from response_cache import cached_json, response_cache, table_version, row_version
+from search import search_inquiries
+from export import export_query, export_stream, MEDIA_TYPES
+import archive
+import bulk_import
+import stats
+from rate_limit import SubmissionGuard
+from health import readiness, warm_up
+from observability import configure_logging, instrument_engine, metrics_payload, MetricsMiddleware
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+# Disabled in gunicorn workers, whose master migrates once before forking.
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
 
-init_db()
+classification_workers = ClassificationWorkerPool()
+email_worker = EmailOutboxWorker()
+# Only one process of the deployment runs them, see background.py.
+background_workers = BackgroundWorkers([classification_workers, email_worker])
+submission_guard = SubmissionGuard()
 
-app = FastAPI(title="Customer Inquiry Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if RUN_MIGRATIONS_ON_STARTUP:
+        await asyncio.to_thread(init_db)
+    await background_workers.start()
+    await events.broker.start()
+    warm_up.start()
+    yield
+    await warm_up.stop()
+    await events.broker.stop()
+    await background_workers.stop()
+    await email_transport.close()
+
+app = FastAPI(title="Customer Inquiry Backend", lifespan=lifespan)
 
 origins = [
     os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")
@@ -24,7 +74,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
+app.add_middleware(MetricsMiddleware)
+
+MAX_PAGE_SIZE = 200
+MAX_SEARCH_PAGE_SIZE = 50
 
 class Inquiry(BaseModel):
     name: str
@@ -33,31 +88,30 @@ class Inquiry(BaseModel):
 
 class InquiryResponse(BaseModel):
     response: str
+    responder: Optional[str] = None
+    # Response count the manager saw; required to add a follow-up to an answered inquiry.
+    expected_response_count: Optional[int] = None
 
 
 @app.get("/api/health")
+@app.get("/api/health/live")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/api/health/ready")
+async def readiness_check():
+    report, status_code = await readiness()
+    return JSONResponse(report, status_code=status_code)
+
+@app.get("/api/metrics")
+def metrics():
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
 @app.post("/api/inquiries")
-async def submit_inquiry(inquiry: Inquiry, db=Depends(get_db)):
-    classification = None
-    if chain and parser:
-        try:
-            classification = chain.invoke({
-                "inquiry_text": inquiry.inquiry,
-                "format_instructions": parser.get_format_instructions(),
-            })
-            print(classification)
-        except Exception as e:
-            print(f"Error during classification: {e}")
-    
-    if not classification:
-        classification = InquiryClassification(
-            category="N/A",
-            urgency="N/A",
-            summary="Classification failed.",
-        )
+async def submit_inquiry(inquiry: Inquiry, request: Request, db=Depends(get_async_db)):
+    await submission_guard.check(request, inquiry.email)
+    classification = PENDING_CLASSIFICATION
 
     try:
         record = InquiryRecord(
@@ -69,79 +123,285 @@ async def submit_inquiry(inquiry: Inquiry, db=Depends(get_db)):
             summary=classification["summary"],
         )
         db.add(record)
-        db.commit()
-        db.refresh(record)
-    except Exception as e:
-        db.rollback()
-        print(f"DB error while saving inquiry: {e}")
+        await db.flush()
+        enqueue_classification(db, record)
+        enqueue_email(
+            db,
+            to_address=record.email,
+            template_name=email_rendering.CONFIRMATION_TEMPLATE,
+            template_data=email_rendering.confirmation_email_data(record.name, record.id, record.inquiry_text),
+            inquiry_id=record.id,
+        )
+        await stats.count_created(db, [(record.created_at, record.category, record.urgency)])
+        await events.record_events(db, [record.id], events.INQUIRY_CREATED)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        logger.exception("DB error while saving inquiry")
         raise HTTPException(status_code=500, detail="Failed to save inquiry to database")
-    
-    email_message_id = send_confirmation_email(
-        to_address=record.email,
-        name=record.name,
-        inquiry_id=record.id,
-        inquiry_text=record.inquiry_text
-    )
-    
-    if not email_message_id:
-        raise HTTPException(status_code=500, detail="Inquiry saved, but failed to send confirmation email.")
-    
+    classification_workers.notify()
+    email_worker.notify()
+    events.broker.notify()
+
     return {
-        "message": "Inquiry classified and confirmation email sent successfully",
+        "message": "Inquiry received and confirmation email queued",
         "data": inquiry.model_dump(),
         "classification": classification,
     }
 
 @app.get("/api/manager/inquiries")
-async def get_manager_inquiries(db=Depends(get_db)):
-    records = db.query(InquiryRecord).order_by(InquiryRecord.created_at.desc()).all()
-    inquiries = [
-        {
-            "id": r.id,
-            "name": r.name,
-            "email": r.email,
-            "inquiry": r.inquiry_text,
-            "category": r.category,
-            "urgency": r.urgency,
-            "summary": r.summary,
-            "created_at": r.created_at.isoformat() if r.created_at else None,
+async def get_manager_inquiries(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    urgency: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db=Depends(get_async_db),
+):
+    async def build():
+        query = select(*INQUIRY_LIST_COLUMNS)
+        if category:
+            query = query.where(InquiryRecord.category == category)
+        if urgency:
+            query = query.where(InquiryRecord.urgency == urgency)
+        if status:
+            query = query.where(InquiryRecord.status == status)
+        if created_from:
+            query = query.where(InquiryRecord.created_at >= created_from)
+        if created_to:
+            query = query.where(InquiryRecord.created_at < created_to)
+        if cursor:
+            query = query.where(after_cursor(InquiryRecord.created_at, InquiryRecord.id, cursor))
+
+        rows = (await db.execute(
+            query.order_by(InquiryRecord.created_at.desc(), InquiryRecord.id.desc())
+            .limit(limit + 1)
+        )).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        return {"inquiries": [list_item(r) for r in rows], "next_cursor": next_cursor}
+
+    key = ("list", limit, cursor, category, urgency, status, created_from, created_to)
+    return await cached_json(request, key, await table_version(db), build)
+
+@app.get("/api/manager/inquiries/export")
+async def export_inquiries(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    category: Optional[str] = None,
+    urgency: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    query = export_query(category, urgency, status, created_from, created_to)
+    filename = f"inquiries-{datetime.utcnow():%Y%m%dT%H%M%SZ}.{format}"
+    return StreamingResponse(
+        export_stream(format, query),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/manager/inquiries/import")
+async def import_inquiries(request: Request, send_confirmation: bool = False):
+    """
+    Imports an NDJSON body of inquiries, see bulk_import. Inquiries whose
+    external_id is already stored are skipped, so a failed import can be sent
+    again as a whole.
+    """
+    def on_chunk(report):
+        # Workers and SSE clients pick up every chunk as soon as it is committed.
+        classification_workers.notify()
+        email_worker.notify()
+        events.broker.notify()
+        logger.info("Bulk import progress", extra=report.as_dict() | {"errors": len(report.errors)})
+
+    report = await bulk_import.import_lines(
+        bulk_import.iter_lines(request.stream()), send_confirmation, on_chunk=on_chunk,
+    )
+    return JSONResponse(report.as_dict(), status_code=200 if report.failure is None else 500)
+
+@app.get("/api/manager/inquiries/stream")
+async def stream_manager_inquiries(
+    request: Request,
+    since_id: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[str] = Header(None),
+):
+    # Browsers send Last-Event-ID when they reconnect; it wins over since_id.
+    if last_event_id and last_event_id.isdigit():
+        since_id = int(last_event_id)
+    return StreamingResponse(
+        events.event_stream(request, since_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/manager/inquiries/open")
+async def get_open_queue(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db=Depends(get_async_db),
+):
+    async def build():
+        rows, next_cursor = await inquiry_status.fetch_open_queue(db, INQUIRY_LIST_COLUMNS, limit, cursor)
+        result = {"inquiries": [list_item(r) for r in rows], "next_cursor": next_cursor}
+        # The backlog is only counted for the first page.
+        if not cursor:
+            result["backlog"] = await inquiry_status.open_backlog(db)
+        return result
+
+    return await cached_json(request, ("open", limit, cursor), await table_version(db), build)
+
+@app.get("/api/manager/inquiries/search")
+async def search_manager_inquiries(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    urgency: Optional[str] = None,
+    db=Depends(get_async_db),
+):
+    offset = decode_offset_cursor(cursor)
+
+    async def build():
+        results = await search_inquiries(db, q, limit + 1, offset, category, urgency)
+        has_more = len(results) > limit
+        return {
+            "inquiries": results[:limit],
+            "next_cursor": encode_offset_cursor(offset + limit) if has_more else None,
         }
-        for r in records
-    ]
-    return {"inquiries": inquiries}
 
-@app.get("/api/inquiries/{inquiry_id}")
-async def get_inquiry_by_id(inquiry_id: int, db=Depends(get_db)):
-    record = db.query(InquiryRecord).filter(InquiryRecord.id == inquiry_id).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Inquiry not found")
+    key = ("search", q, limit, offset, category, urgency)
+    return await cached_json(request, key, await table_version(db), build)
+
+@app.get("/api/manager/stats")
+async def get_inquiry_stats(
+    request: Request,
+    days: int = Query(30, ge=1, le=stats.MAX_STATS_DAYS),
+    category: Optional[str] = None,
+    urgency: Optional[str] = None,
+    db=Depends(get_async_db),
+):
+    # The day is part of the key, as the window moves at midnight without a new event.
+    today = datetime.utcnow().date()
+
+    async def build():
+        return await stats.daily_stats(db, days, category, urgency, today)
+
+    key = ("stats", days, category, urgency, today)
+    return await cached_json(request, key, await table_version(db), build)
+
+@app.get("/api/manager/classification/stats")
+async def get_classification_stats(db=Depends(get_async_db)):
+    # Stats never build the engine; it is None until the first classification or warm-up.
+    engine = current_engine()
+    return {
+        "engine": engine.stats() if engine else None,
+        "queue": await queue_stats(db),
+    }
+
+@app.get("/api/manager/cache/stats")
+async def get_cache_stats():
+    return {"responses": response_cache.stats()}
+
+@app.get("/api/manager/email/stats")
+async def get_email_stats(db=Depends(get_async_db)):
     return {
-        "id": record.id,
-        "name": record.name,
-        "email": record.email,
-        "inquiry": record.inquiry_text,
-        "category": record.category,
-        "urgency": record.urgency,
-        "summary": record.summary,
-        "created_at": record.created_at.isoformat() if record.created_at else None,
+        "outbox": await outbox_stats(db),
+        "transport": email_transport.name,
+        "circuit": email_transport.breaker.stats(),
     }
 
+@app.get("/api/inquiries/{inquiry_id}")
+async def get_inquiry_by_id(inquiry_id: int, request: Request, db=Depends(get_async_db)):
+    async def build():
+        record = await db.get(InquiryRecord, inquiry_id)
+        if not record:
+            archived = await archive.get_archived(db, inquiry_id)
+            if archived is None:
+                raise HTTPException(status_code=404, detail="Inquiry not found")
+            return archived
+        return {
+            "id": record.id,
+            "name": record.name,
+            "email": record.email,
+            "inquiry": record.inquiry_text,
+            "category": record.category,
+            "urgency": record.urgency,
+            "summary": record.summary,
+            "status": record.status,
+            "response_count": record.response_count,
+            "created_at": record.created_at.isoformat() if record.created_at else None,
+            "responses": [
+                {
+                    "id": r.id,
+                    "response": r.response_text,
+                    "responder": r.responder,
+                    "created_at": r.created_at.isoformat() if r.created_at else None,
+                }
+                for r in await inquiry_status.get_thread(db, inquiry_id)
+            ],
+        }
+
+    return await cached_json(request, ("detail", inquiry_id), await row_version(db, inquiry_id), build)
+
 @app.post("/api/inquiries/{inquiry_id}/respond")
-async def respond_to_inquiry(inquiry_id: int, response: InquiryResponse, db=Depends(get_db)):
-    record = db.query(InquiryRecord).filter(InquiryRecord.id == inquiry_id).first()
+async def respond_to_inquiry(inquiry_id: int, response: InquiryResponse, db=Depends(get_async_db)):
+    record = await db.get(InquiryRecord, inquiry_id)
     if not record:
         raise HTTPException(status_code=404, detail="Inquiry not found")
 
-    print(f"Response for inquiry {inquiry_id}: {response.response}")
+    try:
+        stored = await inquiry_status.add_response(
+            db,
+            inquiry_id,
+            response.response,
+            responder=response.responder,
+            expected_response_count=response.expected_response_count,
+        )
+        email = enqueue_email(
+            db,
+            to_address=record.email,
+            template_name=email_rendering.RESPONSE_TEMPLATE,
+            template_data=email_rendering.response_email_data(inquiry_id, response.response, record.inquiry_text),
+            inquiry_id=inquiry_id,
+        )
+        await events.record_events(db, [inquiry_id], events.INQUIRY_STATUS_CHANGED)
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception:
+        await db.rollback()
+        logger.exception("DB error while saving response", extra={"inquiry_id": inquiry_id})
+        raise HTTPException(status_code=500, detail="Failed to save response to database")
+    email_worker.notify()
+    events.broker.notify()
 
-    message_id = send_response_email(
-        to_address=record.email,
-        inquiry_id=inquiry_id,
-        response_text=response.response,
-        inquiry_text=record.inquiry_text
+    return {"message": "Response submitted and email queued", "responseId": stored.id, "emailId": email.id}
+
+@app.post("/api/inquiries/{inquiry_id}/close")
+async def close_inquiry(inquiry_id: int, db=Depends(get_async_db)):
+    await inquiry_status.set_status(
+        db, inquiry_id, inquiry_status.CLOSED, (inquiry_status.OPEN, inquiry_status.ANSWERED)
     )
+    await events.record_events(db, [inquiry_id], events.INQUIRY_STATUS_CHANGED)
+    await db.commit()
+    events.broker.notify()
+    return {"id": inquiry_id, "status": inquiry_status.CLOSED}
 
-    if message_id:
-        return {"message": "Response submitted and email sent successfully", "emailMessageId": message_id}
-    else:
-        raise HTTPException(status_code=500, detail="Response submitted but failed to send email.")
\ No newline at end of file
+@app.post("/api/inquiries/{inquiry_id}/reopen")
+async def reopen_inquiry(inquiry_id: int, db=Depends(get_async_db)):
+    await inquiry_status.set_status(
+        db, inquiry_id, inquiry_status.OPEN, (inquiry_status.ANSWERED, inquiry_status.CLOSED)
+    )
+    await events.record_events(db, [inquiry_id], events.INQUIRY_STATUS_CHANGED)
+    await db.commit()
+    events.broker.notify()
+    return {"id": inquiry_id, "status": inquiry_status.OPEN}
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Versioned schema migrations.
+
+`init_db` creates missing tables from the models and then applies every
+migration in `MIGRATIONS` whose version is not yet recorded in the
+`schema_migrations` table. Migrations must be idempotent, because tables created
+by `create_all` on a fresh database already match the latest models.
+
+Guidelines for changes on a live Postgres database:
+- Add columns as nullable or with a constant default; neither rewrites the table.
+- Create indexes with `create_index`, which uses CREATE INDEX CONCURRENTLY on
+  Postgres and therefore does not block writes. Such migrations must set
+  `transactional=False`.
+- Backfill large tables in batches in a separate migration.
+"""
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import inspect, text
+
+from search import FTS_TABLE, POSTGRES_SEARCH_VECTOR, sqlite_fts_available
+from stats import rebuild_daily_counts
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable
+    transactional: bool = True
+
+
+MIGRATIONS = []
+
+def migration(version: int, description: str, transactional: bool = True):
+    def register(upgrade):
+        MIGRATIONS.append(Migration(version, description, upgrade, transactional))
+        return upgrade
+    return register
+
+
+def has_column(connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(connection).get_columns(table))
+
+def add_column(connection, table: str, column: str, definition: str):
+    """
+    Adds a column unless it exists. Keep `definition` nullable or with a constant
+    default so that Postgres does not rewrite the table.
+    """
+    if not has_column(connection, table, column):
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+
+def create_index(connection, name: str, table: str, columns: list, unique: bool = False, using: str = None):
+    """
+    Creates an index unless a valid one of that name exists. On Postgres the
+    index is built concurrently, and a leftover invalid index from an
+    interrupted build is dropped first.
+    """
+    unique_sql = "UNIQUE " if unique else ""
+    using_sql = f" USING {using}" if using else ""
+    column_sql = ", ".join(columns)
+    if connection.dialect.name == "postgresql":
+        valid = connection.execute(
+            text(
+                "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name"
+            ),
+            {"name": name},
+        ).scalar()
+        if valid:
+            return
+        if valid is not None:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        connection.execute(text(f"CREATE {unique_sql}INDEX CONCURRENTLY {name} ON {table}{using_sql} ({column_sql})"))
+    else:
+        connection.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column_sql})"))
+
+
+@migration(1, "Claim token and result source for classification jobs")
+def add_classification_job_columns(connection):
+    add_column(connection, "classification_jobs", "locked_by", "VARCHAR(32)")
+    add_column(connection, "classification_jobs", "source", "VARCHAR(20)")
+
+@migration(2, "Indexes for the dashboard and job queue access patterns", transactional=False)
+def add_dashboard_indexes(connection):
+    create_index(connection, "ix_inquiries_created_at_id", "inquiries", ["created_at", "id"])
+    create_index(connection, "ix_inquiries_category_created_at_id", "inquiries", ["category", "created_at", "id"])
+    create_index(connection, "ix_inquiries_urgency_created_at_id", "inquiries", ["urgency", "created_at", "id"])
+    create_index(connection, "ix_inquiries_email", "inquiries", ["email"])
+    create_index(
+        connection,
+        "ix_classification_jobs_status_available_at_id",
+        "classification_jobs",
+        ["status", "available_at", "id"],
+    )
+    # Built here rather than in migration 1, whose transaction CREATE INDEX CONCURRENTLY cannot run in.
+    create_index(connection, "ix_classification_jobs_locked_by", "classification_jobs", ["locked_by"])
+
+@migration(3, "Full-text search over name, email, summary and inquiry text")
+def add_full_text_search(connection):
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        # Unlike other column additions, a stored generated column rewrites the table once.
+        if not has_column(connection, "inquiries", "search_vector"):
+            connection.execute(text(
+                "ALTER TABLE inquiries ADD COLUMN search_vector tsvector "
+                f"GENERATED ALWAYS AS ({POSTGRES_SEARCH_VECTOR}) STORED"
+            ))
+    elif dialect == "sqlite" and sqlite_fts_available(connection):
+        # External-content FTS5 table kept in sync by triggers on every write.
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, email, summary, inquiry_text, "
+            "content='inquiries', content_rowid='id', tokenize='porter unicode61')"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inquiries BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, name, email, summary, inquiry_text) "
+            "VALUES (new.id, new.name, new.email, new.summary, new.inquiry_text); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inquiries BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, summary, inquiry_text) "
+            "VALUES ('delete', old.id, old.name, old.email, old.summary, old.inquiry_text); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+            "AFTER UPDATE OF name, email, summary, inquiry_text ON inquiries BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, summary, inquiry_text) "
+            "VALUES ('delete', old.id, old.name, old.email, old.summary, old.inquiry_text); "
+            f"INSERT INTO {FTS_TABLE}(rowid, name, email, summary, inquiry_text) "
+            "VALUES (new.id, new.name, new.email, new.summary, new.inquiry_text); END"
+        ))
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+@migration(4, "GIN index for full-text search", transactional=False)
+def add_search_vector_index(connection):
+    if connection.dialect.name == "postgresql":
+        create_index(connection, "ix_inquiries_search_vector", "inquiries", ["search_vector"], using="gin")
+
+@migration(5, "Inquiry status and response count")
+def add_inquiry_status(connection):
+    # Constant defaults, so existing inquiries become open without a table rewrite.
+    add_column(connection, "inquiries", "status", "VARCHAR(20) NOT NULL DEFAULT 'open'")
+    add_column(connection, "inquiries", "response_count", "INTEGER NOT NULL DEFAULT 0")
+
+@migration(6, "Index for the open inquiry queue", transactional=False)
+def add_open_queue_index(connection):
+    create_index(
+        connection,
+        "ix_inquiries_status_urgency_created_at_id",
+        "inquiries",
+        ["status", "urgency", "created_at", "id"],
+    )
+
+@migration(7, "Index for per-inquiry versions", transactional=False)
+def add_inquiry_event_index(connection):
+    create_index(connection, "ix_inquiry_events_inquiry_id_id", "inquiry_events", ["inquiry_id", "id"])
+
+@migration(8, "External id of imported inquiries")
+def add_external_id(connection):
+    add_column(connection, "inquiries", "external_id", "VARCHAR(255)")
+
+@migration(9, "Unique index on the external id", transactional=False)
+def add_external_id_index(connection):
+    create_index(connection, "ix_inquiries_external_id", "inquiries", ["external_id"], unique=True)
+
+@migration(10, "Backfill of the daily inquiry counts")
+def backfill_daily_counts(connection):
+    # The table itself is created by create_all; one grouped scan of the inquiries fills it.
+    rebuild_daily_counts(connection)
+
+@migration(11, "Events outlive archived inquiries")
+def drop_inquiry_event_foreign_key(connection):
+    # SQLite does not enforce foreign keys here, so only Postgres needs the constraint dropped.
+    if connection.dialect.name != "postgresql":
+        return
+    for foreign_key in inspect(connection).get_foreign_keys("inquiry_events"):
+        if foreign_key["referred_table"] == "inquiries" and foreign_key["name"]:
+            connection.execute(text(f'ALTER TABLE inquiry_events DROP CONSTRAINT "{foreign_key["name"]}"'))
+
+
+@migration(12, "Commit-ordered version of the inquiry list")
+def seed_inquiries_version(connection):
+    # Starts above every event id, which older ETags were built from, so none of them matches again.
+    connection.execute(text(
+        "INSERT INTO data_versions (name, version) "
+        "SELECT 'inquiries', COALESCE(MAX(id), 0) FROM inquiry_events "
+        "WHERE NOT EXISTS (SELECT 1 FROM data_versions WHERE name = 'inquiries')"
+    ))
+
+
+# Arbitrary, but fixed: every process must lock the same key.
+MIGRATION_LOCK_KEY = 727_151_001
+
+
+@contextmanager
+def migration_lock(engine):
+    """
+    Holds an exclusive, cross-process lock while migrating, so that workers
+    starting at the same time do not race to create tables: a Postgres advisory
+    lock, or a lock file next to a SQLite database.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        return
+
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        yield
+        return
+
+    import fcntl
+
+    with open(f"{database}.migrate.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _ensure_version_table(engine):
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR(255) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+
+def applied_versions(engine) -> set:
+    _ensure_version_table(engine)
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+def run_migrations(engine, target: int = None):
+    """
+    Applies all pending migrations up to `target` (default: the latest).
+
+    :return: The versions that were applied.
+    """
+    done = applied_versions(engine)
+    applied = []
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        if m.version in done or (target is not None and m.version > target):
+            continue
+
+        logger.info("Applying migration", extra={"version": m.version, "description": m.description})
+        if m.transactional:
+            with engine.begin() as connection:
+                m.upgrade(connection)
+                _record(connection, m)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                m.upgrade(connection)
+                _record(connection, m)
+        applied.append(m.version)
+    return applied
+
+def _record(connection, m: Migration):
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+        {"version": m.version, "description": m.description, "applied_at": datetime.utcnow()},
+    )
+
+
+if __name__ == "__main__":
+    from database import init_db
+    init_db()
@@ -0,0 +1,242 @@
+"""
+Structured logging and Prometheus metrics.
+
+Metrics are exposed at `/api/metrics`. Hot paths are timed with `timed`, which
+works as a decorator on sync and async functions and as a context manager:
+
+    @timed(SES_SEND_SECONDS, operation="send")
+    async def send_raw_email(...): ...
+
+    with timed(LLM_BATCH_SECONDS):
+        ...
+
+If the histogram has an `outcome` label, `timed` sets it to "success" or
+"error" depending on whether the block raised.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from sqlalchemy import event
+
+# Buckets in seconds, from sub-millisecond queries to slow LLM batches.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent, per route.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database statement execution time.",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+LLM_BATCH_SECONDS = Histogram(
+    "llm_batch_duration_seconds", "Duration of one batched LLM classification call.",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+LLM_CLASSIFICATIONS = Counter(
+    "llm_classifications_total", "Inquiries sent to the LLM, by outcome.", ["outcome"],
+)
+CLASSIFICATIONS = Counter(
+    "classifications_total", "Classified inquiries by source (fast, cache, llm).", ["source"],
+)
+CLASSIFICATION_FALLBACKS = Counter(
+    "classification_fallbacks_total", "Inquiries stored with the 'Classification failed.' fallback.",
+)
+SES_SEND_SECONDS = Histogram(
+    "ses_send_duration_seconds", "Duration of one SES API call.",
+    ["operation", "outcome"], buckets=LATENCY_BUCKETS,
+)
+SMTP_SEND_SECONDS = Histogram(
+    "smtp_send_duration_seconds", "Duration of one SMTP delivery.",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+EMAIL_RENDER_SECONDS = Histogram(
+    "email_render_duration_seconds", "Time to render one email from its template.",
+    ["outcome"], buckets=LATENCY_BUCKETS,
+)
+EMAILS_SENT = Counter("emails_sent_total", "Emails accepted by SES or the SMTP server.")
+EMAIL_FAILURES = Counter(
+    "email_failures_total", "Failed email sends, by whether they are retried.", ["result"],
+)
+
+IMPORTED_INQUIRIES = Counter(
+    "imported_inquiries_total", "Lines of bulk imports, by result (inserted, duplicate, invalid).", ["result"],
+)
+
+ARCHIVED_INQUIRIES = Counter("archived_inquiries_total", "Inquiries moved to the archive.")
+
+REJECTED_SUBMISSIONS = Counter(
+    "rejected_submissions_total", "Inquiry submissions turned away, by reason (ip, email, or the full queue).",
+    ["reason"],
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes, by dependency and new state.",
+    ["name", "state"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total", "Calls not made because the circuit was open.", ["name"],
+)
+
+_RESERVED_LOG_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. Fields passed with `extra=` are included as is.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_LOG_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """
+    Sends all log records to stdout, as JSON lines by default. Reads LOG_LEVEL
+    and LOG_FORMAT ("json" or "text") when called, i.e. after `load_dotenv`.
+    """
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_format = os.getenv("LOG_FORMAT", "json")
+    handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+class timed:
+    """
+    Observes the elapsed time into a histogram; see the module docstring.
+    """
+
+    def __init__(self, histogram: Histogram, **labels):
+        self._with_outcome = "outcome" in histogram._labelnames
+        if self._with_outcome:
+            self._success = histogram.labels(outcome="success", **labels)
+            self._error = histogram.labels(outcome="error", **labels)
+        else:
+            self._success = self._error = histogram.labels(**labels) if labels else histogram
+        self._started = []
+
+    def __enter__(self):
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started.pop()
+        (self._error if exc_type else self._success).observe(elapsed)
+        return False
+
+    def __call__(self, func):
+        success, error = self._success, self._error
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    error.observe(time.perf_counter() - started)
+                    raise
+                success.observe(time.perf_counter() - started)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                error.observe(time.perf_counter() - started)
+                raise
+            success.observe(time.perf_counter() - started)
+            return result
+        return wrapper
+
+
+def instrument_engine(engine):
+    """
+    Times every statement executed on a (sync) engine. For an async engine pass
+    `async_engine.sync_engine`.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+            if operation not in ("select", "insert", "update", "delete", "with"):
+                operation = "other"
+            DB_QUERY_SECONDS.labels(operation=operation).observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the request latency per route template, e.g.
+    `/api/inquiries/{inquiry_id}`, up to the start of the response. For the SSE
+    stream that is the time to open it, not its lifetime.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        observed = False
+
+        async def send_wrapper(message):
+            nonlocal observed
+            if message["type"] == "http.response.start" and not observed:
+                observed = True
+                route = scope.get("route")
+                REQUEST_SECONDS.labels(
+                    method=scope["method"],
+                    route=getattr(route, "path", "unmatched"),
+                    status=str(message["status"]),
+                ).observe(time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def metrics_payload():
+    """
+    :return: The exposition body and its content type. Under a multi-process
+             server set PROMETHEUS_MULTIPROC_DIR so that all workers are merged.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
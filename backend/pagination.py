@@ -0,0 +1,69 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at: datetime, record_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """
+    :return: The (created_at, id) pair the cursor points at.
+    :raises HTTPException: 400 if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, record_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(record_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(created_at_column, id_column, cursor: str):
+    """
+    Builds the keyset condition for rows after the cursor in
+    (created_at DESC, id DESC) order. The row-value comparison lets Postgres and
+    SQLite seek directly into the (created_at, id) index.
+    """
+    created_at, record_id = decode_cursor(cursor)
+    return tuple_(created_at_column, id_column) < tuple_(created_at, record_id)
+
+def encode_offset_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"offset|{offset}".encode("utf-8")).decode("ascii")
+
+def decode_offset_cursor(cursor: str) -> int:
+    """
+    Cursor for ranked results, which have no stable keyset to seek on.
+
+    :raises HTTPException: 400 if the cursor is malformed.
+    """
+    if not cursor:
+        return 0
+    try:
+        kind, offset = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        if kind != "offset" or int(offset) < 0:
+            raise ValueError(cursor)
+        return int(offset)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def encode_queue_cursor(rank: int, created_at: datetime, record_id: int) -> str:
+    raw = f"queue|{rank}|{created_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_queue_cursor(cursor: str):
+    """
+    Cursor for the open queue, which is ordered by urgency rank and then age.
+
+    :return: The (rank, created_at, id) triple the cursor points at.
+    :raises HTTPException: 400 if the cursor is malformed.
+    """
+    try:
+        kind, rank, created_at, record_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        if kind != "queue":
+            raise ValueError(cursor)
+        return int(rank), datetime.fromisoformat(created_at), int(record_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,249 @@
+"""
+Admission control for `POST /api/inquiries`, which is public and costs a
+Bedrock invocation and an SES send per call.
+
+- Rate limits: token buckets per client IP and per email address. A bucket holds
+  up to `burst` tokens and refills at `per_minute` tokens per minute; every
+  submission takes one token, and without one it is rejected with 429 and a
+  `Retry-After` of the time until the next token.
+- Backpressure: while the classification queue or the email outbox holds more
+  pending entries than its limit, submissions are rejected with 503 and a
+  `Retry-After`, rather than letting the queues and the latency grow without
+  bound.
+
+The buckets live in memory by default, so every worker process limits on its
+own. With RATE_LIMIT_BACKEND=database they live in the `rate_limit_buckets`
+table and are shared by all workers and hosts. Other backends implement
+`RateLimiter.acquire`.
+
+The client IP is taken from nginx's `X-Real-IP` header, but only if the request
+comes from one of RATE_LIMIT_TRUSTED_PROXIES; otherwise anyone could pick their
+own bucket.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+from sqlalchemy import delete, func, select
+
+from database import AsyncSessionLocal, async_engine, dialect_insert, ClassificationJob, EmailOutboxEntry, RateLimitBucket
+from observability import REJECTED_SUBMISSIONS
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "10"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "2"))
+RATE_LIMIT_EMAIL_BURST = int(os.getenv("RATE_LIMIT_EMAIL_BURST", "5"))
+RATE_LIMIT_TRUSTED_PROXIES = {
+    address.strip() for address in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if address.strip()
+}
+# Buckets kept by the memory backend; the least recently used are dropped first.
+RATE_LIMIT_MEMORY_SIZE = int(os.getenv("RATE_LIMIT_MEMORY_SIZE", "100000"))
+
+BACKPRESSURE_CLASSIFICATION_LIMIT = int(os.getenv("BACKPRESSURE_CLASSIFICATION_LIMIT", "5000"))
+BACKPRESSURE_EMAIL_LIMIT = int(os.getenv("BACKPRESSURE_EMAIL_LIMIT", "5000"))
+# Queue depths are counted at most this often per process.
+BACKPRESSURE_CHECK_INTERVAL = float(os.getenv("BACKPRESSURE_CHECK_INTERVAL", "1.0"))
+BACKPRESSURE_RETRY_AFTER = int(os.getenv("BACKPRESSURE_RETRY_AFTER", "30"))
+
+
+class RateLimiter(ABC):
+    @abstractmethod
+    async def acquire(self, key: str, per_minute: float, burst: int) -> float:
+        """
+        Takes a token from the bucket `key`.
+
+        :return: 0 if a token was taken, else the seconds until one is available.
+        """
+
+
+def _refill(tokens: float, elapsed: float, per_minute: float, burst: int) -> float:
+    return min(burst, tokens + max(elapsed, 0.0) * per_minute / 60)
+
+def _wait(tokens: float, per_minute: float) -> float:
+    return (1 - tokens) * 60 / per_minute
+
+
+class MemoryRateLimiter(RateLimiter):
+    def __init__(self, max_size: int = RATE_LIMIT_MEMORY_SIZE):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, per_minute: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, refilled_at = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, now - refilled_at, per_minute, burst)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else _wait(tokens, per_minute)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseRateLimiter(RateLimiter):
+    """
+    Buckets in `rate_limit_buckets`, shared by all processes. Refilling and
+    taking a token is one conditional upsert, so concurrent requests cannot
+    take the same token. Buckets that have refilled completely are purged
+    every `purge_interval` seconds.
+    """
+
+    def __init__(self, purge_interval: float = 60.0):
+        self.purge_interval = purge_interval
+        self._purged_at = time.monotonic()
+
+    async def acquire(self, key: str, per_minute: float, burst: int) -> float:
+        key = key[:255]
+        now = time.time()
+        table = RateLimitBucket.__table__
+        least = func.least if async_engine.dialect.name == "postgresql" else func.min
+        tokens = least(burst, table.c.tokens + (now - table.c.refilled_at) * (per_minute / 60))
+        upsert = dialect_insert(async_engine.dialect.name)(table).values(key=key, tokens=burst - 1, refilled_at=now)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"tokens": tokens - 1, "refilled_at": now},
+            where=tokens >= 1,
+        ).returning(table.c.tokens)
+
+        async with AsyncSessionLocal() as db:
+            taken = (await db.execute(upsert)).first()
+            if taken is None:
+                row = (await db.execute(
+                    select(table.c.tokens, table.c.refilled_at).where(table.c.key == key)
+                )).first()
+            await db.commit()
+            if time.monotonic() - self._purged_at > self.purge_interval:
+                self._purged_at = time.monotonic()
+                await self._purge(db, now)
+        if taken is not None:
+            return 0.0
+        return _wait(_refill(row.tokens, now - row.refilled_at, per_minute, burst), per_minute)
+
+    @staticmethod
+    async def _purge(db, now: float):
+        # A bucket untouched for longer than the slowest limit takes to refill is full again.
+        slowest = max(
+            RATE_LIMIT_IP_BURST * 60 / RATE_LIMIT_IP_PER_MINUTE,
+            RATE_LIMIT_EMAIL_BURST * 60 / RATE_LIMIT_EMAIL_PER_MINUTE,
+        )
+        await db.execute(delete(RateLimitBucket).where(RateLimitBucket.refilled_at < now - slowest))
+        await db.commit()
+
+
+def create_rate_limiter(backend: str = RATE_LIMIT_BACKEND) -> RateLimiter:
+    if backend == "memory":
+        return MemoryRateLimiter()
+    if backend == "database":
+        return DatabaseRateLimiter()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+def client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else "unknown"
+    if peer in RATE_LIMIT_TRUSTED_PROXIES:
+        return request.headers.get("x-real-ip", peer)
+    return peer
+
+
+class Backpressure:
+    """
+    Pending entries of the classification queue and the email outbox, counted
+    at most every `check_interval` seconds.
+    """
+
+    def __init__(self, check_interval: float = BACKPRESSURE_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._depths = {"classification_queue": 0, "email_queue": 0}
+        self._checked_at = None
+
+    async def depths(self) -> dict:
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            # Set first, so that concurrent requests do not all count at once.
+            self._checked_at = time.monotonic()
+            async with AsyncSessionLocal() as db:
+                self._depths = {
+                    "classification_queue": (await db.execute(
+                        select(func.count()).select_from(ClassificationJob).where(ClassificationJob.status == "pending")
+                    )).scalar(),
+                    "email_queue": (await db.execute(
+                        select(func.count()).select_from(EmailOutboxEntry).where(EmailOutboxEntry.status == "pending")
+                    )).scalar(),
+                }
+        return self._depths
+
+    async def overloaded(self):
+        """
+        :return: The name of the first queue over its limit, or None.
+        """
+        depths = await self.depths()
+        if depths["classification_queue"] > BACKPRESSURE_CLASSIFICATION_LIMIT:
+            return "classification_queue"
+        if depths["email_queue"] > BACKPRESSURE_EMAIL_LIMIT:
+            return "email_queue"
+        return None
+
+
+class SubmissionGuard:
+    def __init__(self, limiter: RateLimiter = None, backpressure: Backpressure = None,
+                 enabled: bool = RATE_LIMIT_ENABLED):
+        self.limiter = limiter or create_rate_limiter()
+        self.backpressure = backpressure or Backpressure()
+        self.enabled = enabled
+
+    async def check(self, request: Request, email: str):
+        """
+        :raises HTTPException: 503 while a queue is over its limit, 429 if the
+                               client IP or the email is over its rate limit,
+                               both with a `Retry-After` header.
+        """
+        if not self.enabled:
+            return
+        retry_after = reason = None
+        try:
+            overloaded = await self.backpressure.overloaded()
+            if not overloaded:
+                retry_after, reason = await self._rate_limit(client_ip(request), email)
+        except Exception:
+            # Never turn away customers because the limiter itself failed.
+            logger.exception("Admission check failed; letting the submission through")
+            return
+        if overloaded:
+            REJECTED_SUBMISSIONS.labels(reason=overloaded).inc()
+            raise HTTPException(
+                status_code=503,
+                detail="We are receiving too many inquiries right now. Please try again in a few minutes.",
+                headers={"Retry-After": str(BACKPRESSURE_RETRY_AFTER)},
+            )
+        if retry_after:
+            REJECTED_SUBMISSIONS.labels(reason=reason).inc()
+            logger.info("Rate limited submission", extra={"reason": reason, "retry_after": retry_after})
+            raise HTTPException(
+                status_code=429,
+                detail="Too many inquiries. Please wait a moment before submitting another one.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    async def _rate_limit(self, ip: str, email: str) -> tuple:
+        retry_after = await self.limiter.acquire(f"ip:{ip}", RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST)
+        if retry_after:
+            return retry_after, "ip"
+        retry_after = await self.limiter.acquire(
+            f"email:{email.strip().lower()}", RATE_LIMIT_EMAIL_PER_MINUTE, RATE_LIMIT_EMAIL_BURST,
+        )
+        return retry_after, "email"
@@ -0,0 +1,169 @@
+"""
+Circuit breakers and backoff for calls to Bedrock and SES.
+
+A `CircuitBreaker` wraps the calls to one dependency:
+
+- closed: calls go through, each with a timeout derived from recent latencies
+  (the p99 of the last successful calls times `timeout_multiplier`, within
+  `min_timeout` and `max_timeout`), so that a slow dependency fails fast
+  instead of holding a worker for a fixed client timeout.
+- open: after `failure_threshold` consecutive failures or timeouts, calls fail
+  immediately with `CircuitOpenError` for about `reset_timeout` seconds
+  (jittered, so that processes do not all probe at the same moment).
+- half-open: then a single probe call is let through; it closes the circuit if
+  it succeeds and opens it again if not.
+
+Callers defer work rejected with `CircuitOpenError` (see the classification
+queue and the email outbox) instead of counting it as a failed attempt. Every
+process has its own breakers.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+
+from observability import CIRCUIT_REJECTIONS, CIRCUIT_TRANSITIONS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Successful calls needed before the timeout adapts; until then it is `max_timeout`.
+MIN_LATENCY_SAMPLES = 10
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit {name} is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def jittered_backoff(base: float, attempt: int, cap: float = None) -> float:
+    """
+    Exponential backoff with "equal jitter": a random delay between half and
+    all of `base * 2 ** (attempt - 1)`, so that entries that failed together
+    are not all retried at the same moment.
+    """
+    delay = base * 2 ** (attempt - 1)
+    if cap is not None:
+        delay = min(delay, cap)
+    return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 min_timeout: float = 1.0, max_timeout: float = 30.0, timeout_multiplier: float = 3.0,
+                 is_failure=None, latency_samples: int = 100):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        # Errors for which this returns False (e.g. a rejected email address)
+        # say nothing about the dependency's health and do not trip the circuit.
+        self.is_failure = is_failure or (lambda error: True)
+        self.state = CLOSED
+        self._latencies = deque(maxlen=latency_samples)
+        self._failures = 0
+        self._opened_until = 0.0
+        self._probing = False
+        self._counters = {"calls": 0, "failures": 0, "timeouts": 0, "rejected": 0, "opened": 0}
+
+    def timeout(self) -> float:
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return self.max_timeout
+        ordered = sorted(self._latencies)
+        p99 = ordered[min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))]
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def retry_after(self) -> float:
+        """
+        :return: Seconds until the circuit lets a probe through, 0 if it is closed.
+        """
+        if self.state == CLOSED:
+            return 0.0
+        return max(self._opened_until - time.monotonic(), 0.0)
+
+    @property
+    def is_open(self) -> bool:
+        """
+        True while calls would be rejected: open and not yet due for a probe,
+        or half-open with the probe in flight.
+        """
+        if self.state == OPEN:
+            return time.monotonic() < self._opened_until
+        return self.state == HALF_OPEN and self._probing
+
+    def _transition(self, state: str):
+        self.state = state
+        CIRCUIT_TRANSITIONS.labels(name=self.name, state=state).inc()
+
+    def _acquire(self):
+        if self.state == OPEN and time.monotonic() >= self._opened_until:
+            self._transition(HALF_OPEN)
+        if self.state == CLOSED:
+            return
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        self._counters["rejected"] += 1
+        CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+        raise CircuitOpenError(self.name, max(self.retry_after(), 1.0))
+
+    def record_success(self, elapsed: float):
+        self._latencies.append(elapsed)
+        self._failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self._counters["failures"] += 1
+        self._failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self._counters["opened"] += 1
+        self._opened_until = time.monotonic() + self.reset_timeout * random.uniform(0.8, 1.2)
+        self._transition(OPEN)
+
+    async def call(self, function, *args, **kwargs):
+        """
+        Awaits `function(*args, **kwargs)` with the current timeout.
+
+        :raises CircuitOpenError: Without calling, while the circuit is open.
+        :raises asyncio.TimeoutError: If the call took longer than the timeout.
+        """
+        self._acquire()
+        self._counters["calls"] += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(function(*args, **kwargs), self.timeout())
+        except asyncio.TimeoutError:
+            self._counters["timeouts"] += 1
+            self.record_failure()
+            raise
+        except asyncio.CancelledError:
+            self._probing = False
+            raise
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success(time.monotonic() - started)
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "timeout_seconds": self.timeout(),
+            "retry_after_seconds": self.retry_after(),
+        }
@@ -0,0 +1,126 @@
+"""
+Conditional GET and a cache of serialized responses for the manager endpoints.
+
+Every change to an inquiry is recorded in `inquiry_events` in the same
+transaction (see `events.py`), which also bumps the `inquiries` counter in
+`data_versions`. That counter is the version of the whole table, and the latest
+event id of one inquiry is the version of that row. Both are assigned while the
+counter row is locked, so they become visible in the order they were assigned:
+once a version is seen, no earlier change can still commit and be missed.
+Both are a single lookup by key or index. A response is identified by its
+endpoint, its query parameters and the version it was built from:
+
+- If the client's `If-None-Match` matches, the reply is an empty 304 and nothing
+  but the version is queried.
+- Otherwise a cached body for the same version is returned as is.
+- Only then is the response built, serialized once and cached.
+
+Entries of older versions are never served; they age out of the LRU.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+
+from database import DataVersion, InquiryEvent, INQUIRIES_VERSION
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+
+async def table_version(db) -> int:
+    return (await db.execute(
+        select(DataVersion.version).where(DataVersion.name == INQUIRIES_VERSION)
+    )).scalar() or 0
+
+async def row_version(db, inquiry_id: int) -> int:
+    return (await db.execute(
+        select(func.max(InquiryEvent.id)).where(InquiryEvent.inquiry_id == inquiry_id)
+    )).scalar() or 0
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "not_modified": 0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def etag(key: tuple, version: int) -> str:
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:16]
+        return f'W/"{version}-{digest}"'
+
+    def get(self, key: tuple, version: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: tuple, version: int, body: bytes):
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def count_not_modified(self):
+        with self._lock:
+            self._counters["not_modified"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._entries)
+        served = counters["not_modified"] + counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "entries": entries,
+            "max_size": self.max_size,
+            "hit_rate": (counters["not_modified"] + counters["hits"]) / served if served else 0.0,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+async def cached_json(request: Request, key: tuple, version: int, build) -> Response:
+    """
+    Serves the JSON returned by `await build()` for `key` at `version`, from the
+    client's cache (304) or this process's cache where possible.
+    """
+    etag = ResponseCache.etag(key, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag):
+        response_cache.count_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    # The version was read before the data, so a cached body is never older than its version.
+    body = response_cache.get(key, version)
+    if body is None:
+        body = json.dumps(await build()).encode("utf-8")
+        response_cache.put(key, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,162 @@
+import html
+import re
+
+from sqlalchemy import text, DateTime
+
+# Private-use characters mark highlighted terms in the database output; they are
+# turned into <mark> tags after the snippet has been HTML-escaped.
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_END = "\ue001"
+
+FTS_TABLE = "inquiries_fts"
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+POSTGRES_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(email, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(inquiry_text, '')), 'C')"
+)
+
+SEARCH_COLUMNS = "i.id, i.name, i.email, i.category, i.urgency, i.summary, i.status, i.created_at"
+
+
+def render_highlight(snippet: str):
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet)
+    return escaped.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+_sqlite_fts_ready = False
+
+
+def sqlite_fts_available(connection) -> bool:
+    return bool(connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+async def _sqlite_fts_table_exists(db) -> bool:
+    global _sqlite_fts_ready
+    if not _sqlite_fts_ready:
+        _sqlite_fts_ready = (await db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        )).first() is not None
+    return _sqlite_fts_ready
+
+def _fts5_query(query: str):
+    """
+    Turns free text into an FTS5 query that cannot raise syntax errors: every
+    token is quoted, and the last one matches as a prefix for search-as-you-type.
+    """
+    tokens = TOKEN_PATTERN.findall(query)
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def _filters(category, urgency):
+    clauses, params = [], {}
+    if category:
+        clauses.append("i.category = :category")
+        params["category"] = category
+    if urgency:
+        clauses.append("i.urgency = :urgency")
+        params["urgency"] = urgency
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+async def _search_postgres(db, query, limit, offset, filter_sql, params):
+    options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}"
+    sql = text(f"""
+        WITH matches AS (
+            SELECT {SEARCH_COLUMNS}, i.inquiry_text, ts_rank_cd(i.search_vector, q) AS rank, q
+            FROM inquiries i, websearch_to_tsquery('english', :query) q
+            WHERE i.search_vector @@ q{filter_sql}
+            ORDER BY rank DESC, i.id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT id, name, email, category, urgency, summary, status, created_at, rank,
+               ts_headline('english', summary, q, :summary_options) AS summary_highlight,
+               ts_headline('english', inquiry_text, q, :inquiry_options) AS inquiry_highlight
+        FROM matches
+        ORDER BY rank DESC, id DESC
+    """).columns(created_at=DateTime)
+    return (await db.execute(sql, {
+        **params,
+        "query": query,
+        "limit": limit,
+        "offset": offset,
+        "summary_options": f"{options}, HighlightAll=true",
+        "inquiry_options": f"{options}, MaxFragments=2, MaxWords=20, MinWords=5",
+    })).mappings().all()
+
+async def _search_sqlite(db, query, limit, offset, filter_sql, params):
+    fts_query = _fts5_query(query)
+    if fts_query is None:
+        return []
+    # bm25 weights follow the column order: name, email, summary, inquiry_text.
+    sql = text(f"""
+        SELECT {SEARCH_COLUMNS}, -bm25({FTS_TABLE}, 10.0, 10.0, 4.0, 1.0) AS rank,
+               highlight({FTS_TABLE}, 2, :start, :end) AS summary_highlight,
+               snippet({FTS_TABLE}, 3, :start, :end, '…', 16) AS inquiry_highlight
+        FROM {FTS_TABLE}
+        JOIN inquiries i ON i.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH :query{filter_sql}
+        ORDER BY bm25({FTS_TABLE}, 10.0, 10.0, 4.0, 1.0), i.id DESC
+        LIMIT :limit OFFSET :offset
+    """).columns(created_at=DateTime)
+    return (await db.execute(sql, {
+        **params,
+        "query": fts_query,
+        "start": HIGHLIGHT_START,
+        "end": HIGHLIGHT_END,
+        "limit": limit,
+        "offset": offset,
+    })).mappings().all()
+
+async def _search_like(db, query, limit, offset, filter_sql, params):
+    """
+    Unranked fallback for databases without a full-text index.
+    """
+    sql = text(f"""
+        SELECT {SEARCH_COLUMNS}, 0.0 AS rank, i.summary AS summary_highlight, NULL AS inquiry_highlight
+        FROM inquiries i
+        WHERE (lower(i.name) LIKE :pattern OR lower(i.email) LIKE :pattern
+               OR lower(i.summary) LIKE :pattern OR lower(i.inquiry_text) LIKE :pattern){filter_sql}
+        ORDER BY i.created_at DESC, i.id DESC
+        LIMIT :limit OFFSET :offset
+    """).columns(created_at=DateTime)
+    pattern = "%" + query.lower().replace("\\", "").replace("%", "").replace("_", "") + "%"
+    return (await db.execute(sql, {**params, "pattern": pattern, "limit": limit, "offset": offset})).mappings().all()
+
+async def search_inquiries(db, query: str, limit: int, offset: int = 0, category: str = None, urgency: str = None):
+    """
+    Ranked full-text search over name, email, summary and inquiry text.
+
+    :return: Up to `limit` result dicts, best match first, with the summary and
+             an inquiry text snippet as HTML-escaped strings in which matches
+             are wrapped in <mark> tags.
+    """
+    filter_sql, params = _filters(category, urgency)
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        rows = await _search_postgres(db, query, limit, offset, filter_sql, params)
+    elif dialect == "sqlite" and await _sqlite_fts_table_exists(db):
+        rows = await _search_sqlite(db, query, limit, offset, filter_sql, params)
+    else:
+        rows = await _search_like(db, query, limit, offset, filter_sql, params)
+
+    return [
+        {
+            "id": r["id"],
+            "name": r["name"],
+            "email": r["email"],
+            "category": r["category"],
+            "urgency": r["urgency"],
+            "summary": r["summary"],
+            "status": r["status"],
+            "created_at": r["created_at"].isoformat() if r["created_at"] else None,
+            "rank": r["rank"],
+            "summary_highlight": render_highlight(r["summary_highlight"]),
+            "inquiry_highlight": render_highlight(r["inquiry_highlight"]),
+        }
+        for r in rows
+    ]
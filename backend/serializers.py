@@ -0,0 +1,26 @@
+from database import InquiryRecord
+
+# The list view only needs the summary; the full inquiry text is loaded by the detail view.
+INQUIRY_LIST_COLUMNS = (
+    InquiryRecord.id,
+    InquiryRecord.name,
+    InquiryRecord.email,
+    InquiryRecord.category,
+    InquiryRecord.urgency,
+    InquiryRecord.summary,
+    InquiryRecord.status,
+    InquiryRecord.created_at,
+)
+
+
+def list_item(row) -> dict:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "email": row.email,
+        "category": row.category,
+        "urgency": row.urgency,
+        "summary": row.summary,
+        "status": row.status,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
@@ -1,57 +1,112 @@
-import boto3
-from botocore.exceptions import ClientError
+from contextlib import AsyncExitStack
+import asyncio
+import logging
 import os
-import json
 
-def send_templated_email(to_address: str, template_name: str, template_data: dict):
+from observability import SES_SEND_SECONDS, timed
+from resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+SES_REGION = os.getenv("SES_REGION", "us-east-1")
+# Points the client at a local SES stand-in such as `moto_server`.
+SES_ENDPOINT_URL = os.getenv("SES_ENDPOINT_URL") or None
+SES_MAX_POOL_CONNECTIONS = int(os.getenv("SES_MAX_POOL_CONNECTIONS", "10"))
+
+# Circuit breaker around the SES calls, see resilience.py.
+SES_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("SES_CIRCUIT_FAILURE_THRESHOLD", "5"))
+SES_CIRCUIT_RESET_TIMEOUT = float(os.getenv("SES_CIRCUIT_RESET_TIMEOUT", "30"))
+SES_TIMEOUT_MIN = float(os.getenv("SES_TIMEOUT_MIN", "1"))
+SES_TIMEOUT_MAX = float(os.getenv("SES_TIMEOUT_MAX", "15"))
+SES_TIMEOUT_MULTIPLIER = float(os.getenv("SES_TIMEOUT_MULTIPLIER", "3"))
+
+# Error codes that mean SES itself is struggling, rather than the request being wrong.
+OUTAGE_ERROR_CODES = {"Throttling", "ThrottlingException", "ServiceUnavailable", "InternalFailure"}
+
+# Error codes of messages that SES will not accept on a retry either.
+PERMANENT_ERROR_CODES = {"MessageRejected", "InvalidParameterValue"}
+
+_client = None
+_client_stack = None
+_client_lock = asyncio.Lock()
+
+
+async def get_client():
     """
-    Sends a templated email using AWS SES.
+    Returns the shared SES client, creating it on first use. The client keeps a
+    pool of open HTTPS connections, so credentials, endpoint resolution and the
+    TLS handshake are paid once per process rather than once per email.
+    """
+    global _client, _client_stack
+    async with _client_lock:
+        if _client is None:
+            # Imported here, as aioboto3 takes a while to import.
+            import aioboto3
+            from botocore.config import Config
+
+            stack = AsyncExitStack()
+            # Retries are left to the email outbox, which backs off between attempts.
+            _client = await stack.enter_async_context(aioboto3.Session().client(
+                'ses',
+                region_name=SES_REGION,
+                endpoint_url=SES_ENDPOINT_URL,
+                config=Config(max_pool_connections=SES_MAX_POOL_CONNECTIONS, retries={"max_attempts": 0}),
+            ))
+            _client_stack = stack
+        return _client
 
-    :param to_address: The recipient's email address.
-    :param template_name: The name of the SES template.
-    :param template_data: A dictionary of data to pass to the template.
-    :return: The message ID if the email was sent successfully, else None.
+async def close_client():
+    global _client, _client_stack
+    async with _client_lock:
+        if _client_stack is not None:
+            await _client_stack.aclose()
+        _client = None
+        _client_stack = None
+
+def client_ready() -> bool:
+    return _client is not None
+
+def _is_outage(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    if not isinstance(response, dict):
+        # Connection errors, timeouts and the like.
+        return True
+    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 500
+    return status >= 500 or response.get("Error", {}).get("Code") in OUTAGE_ERROR_CODES
+
+breaker = CircuitBreaker(
+    "ses",
+    failure_threshold=SES_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=SES_CIRCUIT_RESET_TIMEOUT,
+    min_timeout=SES_TIMEOUT_MIN,
+    max_timeout=SES_TIMEOUT_MAX,
+    timeout_multiplier=SES_TIMEOUT_MULTIPLIER,
+    is_failure=_is_outage,
+)
+
+@timed(SES_SEND_SECONDS, operation="send_raw")
+async def send_raw_email(sender: str, to_address: str, data: bytes) -> str:
     """
-    SENDER = os.getenv("SENDER_EMAIL")
-
-    if not SENDER:
-        print("ERROR: SENDER_EMAIL environment variable not set. Cannot send email.")
-        return None
-
-    client = boto3.client('ses', region_name="us-east-1")
-
-    try:
-        response = client.send_templated_email(
-            Source=SENDER,
-            Destination={'ToAddresses': [to_address]},
-            Template=template_name,
-            TemplateData=json.dumps(template_data)
-        )
-    except ClientError as e:
-        print(f"Email sending failed: {e.response['Error']['Message']}")
-        return None
-    else:
-        print(f"Email sent! Template: {template_name}, Message ID: {response['MessageId']}")
-        return response['MessageId']
-
-def send_confirmation_email(to_address: str, name: str, inquiry_id: int, inquiry_text: str):
-    return send_templated_email(
-        to_address=to_address,
-        template_name="InquiryConfirmationTemplate",
-        template_data={
-            "name": name,
-            "inquiry_id": str(inquiry_id),
-            "inquiry_text": inquiry_text
-        }
-    )
+    Sends a complete MIME message using AWS SES.
 
-def send_response_email(to_address: str, inquiry_id: int, response_text: str, inquiry_text: str):
-    return send_templated_email(
-        to_address=to_address,
-        template_name="InquiryResponseTemplate",
-        template_data={
-            "inquiry_id": str(inquiry_id),
-            "response_text": response_text,
-            "inquiry_text": inquiry_text
-        }
+    :param data: The message, with headers, as rendered by email_rendering.
+    :return: The message ID.
+    :raises botocore.exceptions.ClientError: If SES rejects the request.
+    :raises resilience.CircuitOpenError: While SES is considered down.
+    """
+    client = await get_client()
+    response = await breaker.call(
+        client.send_raw_email,
+        Source=sender,
+        Destinations=[to_address],
+        RawMessage={'Data': data},
     )
+    logger.info("Email sent", extra={"message_id": response['MessageId']})
+    return response['MessageId']
+
+def is_permanent(error: Exception) -> bool:
+    """
+    True if SES rejected the message itself, so that sending it again fails again.
+    """
+    response = getattr(error, "response", None)
+    return isinstance(response, dict) and response.get("Error", {}).get("Code") in PERMANENT_ERROR_CODES
@@ -0,0 +1,154 @@
+"""
+Inquiry counts per day, category and urgency for the dashboard.
+
+`inquiry_daily_counts` holds one row per (day, category, urgency) with the
+number of inquiries created that day (UTC) that currently have that category
+and urgency. It is maintained incrementally, in the same transaction as the
+change it counts:
+
+- a created inquiry adds 1 to its row (as "Pending" until it is classified),
+- a classification moves 1 from the inquiry's old row to its new one.
+
+Archiving an inquiry (see archive.py) does not change the counts.
+
+Every change is an upsert of `count = count + delta`, so concurrent writers
+never lose an update. Reading the last N days touches at most N times the
+number of category/urgency combinations rows, regardless of the size of
+`inquiries`.
+
+If the table ever drifts, e.g. after inquiries were changed by hand, rebuild it
+while the app is stopped:
+
+    python stats.py --rebuild
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, union_all
+
+from database import async_engine, dialect_insert, InquiryArchiveRecord, InquiryDailyCount, InquiryRecord
+
+MAX_STATS_DAYS = 366
+
+
+def _day(created_at) -> date:
+    return (created_at or datetime.utcnow()).date()
+
+async def _apply(db, deltas: Counter):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = InquiryDailyCount.__table__
+    upsert = dialect_insert(async_engine.dialect.name)(table)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.category, table.c.urgency],
+        set_={"count": table.c.count + upsert.excluded["count"]},
+    )
+    # Always in key order, so that concurrent transactions lock rows in the same order.
+    await db.execute(upsert, [
+        {"day": day, "category": category, "urgency": urgency, "count": delta}
+        for (day, category, urgency), delta in sorted(deltas.items())
+    ])
+
+async def count_created(db, inquiries):
+    """
+    Counts new inquiries in the current transaction.
+
+    :param inquiries: (created_at, category, urgency) of every new inquiry.
+    """
+    await _apply(db, Counter((_day(created_at), category, urgency) for created_at, category, urgency in inquiries))
+
+async def count_reclassified(db, changes):
+    """
+    Moves reclassified inquiries to their new category and urgency, in the
+    current transaction.
+
+    :param changes: (created_at, old category, old urgency, new category, new
+                    urgency) of every reclassified inquiry.
+    """
+    deltas = Counter()
+    for created_at, old_category, old_urgency, category, urgency in changes:
+        day = _day(created_at)
+        deltas[(day, old_category, old_urgency)] -= 1
+        deltas[(day, category, urgency)] += 1
+    await _apply(db, deltas)
+
+async def daily_stats(db, days: int, category: str = None, urgency: str = None, today: date = None) -> dict:
+    """
+    Totals by category and urgency over the last `days` days including today
+    (UTC), and one bucket per day, oldest first. Days without inquiries are
+    included with zero counts.
+    """
+    today = today or datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    query = (
+        select(InquiryDailyCount.day, InquiryDailyCount.category, InquiryDailyCount.urgency, InquiryDailyCount.count)
+        .where(InquiryDailyCount.day >= first_day, InquiryDailyCount.day <= today, InquiryDailyCount.count != 0)
+    )
+    if category:
+        query = query.where(InquiryDailyCount.category == category)
+    if urgency:
+        query = query.where(InquiryDailyCount.urgency == urgency)
+
+    series = {
+        first_day + timedelta(days=offset): {"total": 0, "by_category": Counter(), "by_urgency": Counter()}
+        for offset in range(days)
+    }
+    by_category, by_urgency = Counter(), Counter()
+    for day, row_category, row_urgency, count in (await db.execute(query)).all():
+        bucket = series[day]
+        bucket["total"] += count
+        bucket["by_category"][row_category] += count
+        bucket["by_urgency"][row_urgency] += count
+        by_category[row_category] += count
+        by_urgency[row_urgency] += count
+
+    return {
+        "from": first_day.isoformat(),
+        "to": today.isoformat(),
+        "total": sum(by_category.values()),
+        "by_category": dict(by_category),
+        "by_urgency": dict(by_urgency),
+        "series": [
+            {"day": day.isoformat(), "total": bucket["total"],
+             "by_category": dict(bucket["by_category"]), "by_urgency": dict(bucket["by_urgency"])}
+            for day, bucket in series.items()
+        ],
+    }
+
+def rebuild_daily_counts(connection):
+    """
+    Recomputes `inquiry_daily_counts` from `inquiries` and `inquiries_archive`
+    with one scan of each table, in the caller's transaction.
+    """
+    counted = union_all(
+        select(InquiryRecord.created_at, InquiryRecord.category, InquiryRecord.urgency),
+        select(InquiryArchiveRecord.created_at, InquiryArchiveRecord.category, InquiryArchiveRecord.urgency),
+    ).subquery()
+    day = func.date(counted.c.created_at)
+    connection.execute(delete(InquiryDailyCount))
+    connection.execute(insert(InquiryDailyCount).from_select(
+        ["day", "category", "urgency", "count"],
+        select(day, counted.c.category, counted.c.urgency, func.count())
+        .group_by(day, counted.c.category, counted.c.urgency),
+    ))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import engine, init_db
+
+    arg_parser = argparse.ArgumentParser(description="Maintains the daily inquiry counts.")
+    arg_parser.add_argument("--rebuild", action="store_true", help="Recompute the counts from the inquiries")
+    args = arg_parser.parse_args()
+
+    init_db()
+    if args.rebuild:
+        with engine.begin() as connection:
+            rebuild_daily_counts(connection)
+    with engine.connect() as connection:
+        rows, total = connection.execute(
+            select(func.count(), func.coalesce(func.sum(InquiryDailyCount.count), 0))
+        ).one()
+    print(f"{rows} daily count rows, {total} inquiries")
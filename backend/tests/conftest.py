@@ -0,0 +1,148 @@
+"""
+Fixtures for the backend tests.
+
+The app runs against a scratch SQLite database, with a fake chat model in
+place of Bedrock and a fake `ses.send_raw_email`, so the tests need no AWS
+account. The environment is set before any app module is imported, as the
+modules read it at import time.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DATABASE_DIR = tempfile.mkdtemp(prefix="inquiry-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_DIR}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["WARMUP_ON_STARTUP"] = "false"
+os.environ["SENDER_EMAIL"] = "support@example.com"
+os.environ["FAST_CLASSIFIER_ENABLED"] = "false"
+os.environ["CLASSIFICATION_CACHE_PERSISTENT"] = "false"
+os.environ["CLASSIFICATION_BATCH_WINDOW"] = "0"
+os.environ["CLASSIFICATION_POLL_INTERVAL"] = "0.1"
+os.environ["EMAIL_POLL_INTERVAL"] = "0.1"
+# Tests that need the limiter build their own SubmissionGuard.
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["EVENTS_BACKEND"] = "memory"
+os.environ["LOG_LEVEL"] = "ERROR"
+
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from sqlalchemy import delete, insert
+
+import bedrock_llm
+import classification_engine
+import database
+import ses
+
+FAKE_CLASSIFICATION = {"category": "Billing", "urgency": "Low", "summary": "Customer asks about an invoice."}
+
+# Tables emptied before every test; the migration history and version counters stay.
+KEPT_TABLES = {"schema_migrations", "data_versions"}
+
+sent_emails = []
+
+
+def wait_for(condition, timeout: float = 5.0):
+    """
+    Polls `condition` until it returns something truthy, e.g. while the workers
+    of a running client catch up.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError("Condition not met in time")
+
+
+async def fake_send_raw_email(sender: str, to_address: str, data: bytes) -> str:
+    sent_emails.append({"sender": sender, "to": to_address, "data": data})
+    return f"fake-{len(sent_emails)}"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def app_environment():
+    database.init_db()
+    ses.send_raw_email = fake_send_raw_email
+    chain, parser = bedrock_llm.build_chain(FakeListChatModel(responses=[json.dumps(FAKE_CLASSIFICATION)]))
+    classification_engine.set_engine(classification_engine.ClassificationEngine(chain=chain, parser=parser))
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    import main
+
+    with database.engine.begin() as connection:
+        for table in reversed(database.Base.metadata.sorted_tables):
+            if table.name not in KEPT_TABLES:
+                connection.execute(delete(table))
+    main.response_cache.clear()
+    sent_emails.clear()
+    yield
+
+
+@pytest.fixture
+def client():
+    """
+    The app with its lifespan, i.e. with the classification and email workers running.
+    """
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+    # Pooled connections belong to the client's event loop, which is gone now.
+    asyncio.run(database.async_engine.dispose())
+
+
+@pytest.fixture
+def run_async():
+    """
+    Runs a coroutine function to completion in a fresh event loop.
+    """
+    def run(function, *args, **kwargs):
+        async def main():
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                await database.async_engine.dispose()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def add_inquiries():
+    """
+    Inserts inquiries directly, without classification jobs or emails.
+
+    :return: A function taking a list of column overrides and returning the new ids.
+    """
+    def add(rows: list) -> list:
+        defaults = {
+            "name": "Jane Doe",
+            "email": "jane@example.com",
+            "inquiry_text": "My invoice is wrong.",
+            "summary": "Invoice question.",
+            "category": "Billing",
+            "urgency": "Low",
+            "status": "open",
+            "response_count": 0,
+            "created_at": datetime(2025, 1, 1),
+        }
+        with database.engine.begin() as connection:
+            result = connection.execute(
+                insert(database.InquiryRecord).returning(database.InquiryRecord.id, sort_by_parameter_order=True),
+                [{**defaults, **row} for row in rows],
+            )
+            return [row.id for row in result]
+    return add
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+import archive
+import database
+import events
+from database import EmailOutboxEntry, ResponseRecord
+
+OLD = datetime.utcnow() - timedelta(days=archive.ARCHIVE_AFTER_DAYS + 30)
+
+
+def add_closed_inquiry(add_inquiries, **fields):
+    [inquiry_id] = add_inquiries([{"status": "closed", "response_count": 1, "created_at": OLD, **fields}])
+    with database.engine.begin() as connection:
+        connection.execute(insert(ResponseRecord).values(
+            inquiry_id=inquiry_id, response_text="We refunded you.", responder="Max", created_at=OLD,
+        ))
+    return inquiry_id
+
+
+def run_archive(client):
+    # On the app's event loop, which owns the pooled connections.
+    return client.portal.call(archive.archive_inquiries, archive.ARCHIVE_AFTER_DAYS).as_dict()
+
+
+def test_archived_inquiry_round_trips_through_the_detail_view(client, add_inquiries):
+    inquiry_id = add_closed_inquiry(add_inquiries, inquiry_text="Please refund my order.", external_id="mail-1")
+    before = client.get(f"/api/inquiries/{inquiry_id}").json()
+
+    assert run_archive(client)["archived"] == 1
+
+    after = client.get(f"/api/inquiries/{inquiry_id}").json()
+    assert after.pop("archived_at")
+    assert after == before
+    assert after["responses"][0]["response"] == "We refunded you."
+
+
+def test_archived_inquiry_leaves_lists_and_search_and_is_read_only(client, add_inquiries):
+    inquiry_id = add_closed_inquiry(add_inquiries, inquiry_text="Chargeback for order 7.")
+    [recent] = add_inquiries([{"status": "closed", "created_at": datetime.utcnow()}])
+
+    run_archive(client)
+
+    assert [i["id"] for i in client.get("/api/manager/inquiries").json()["inquiries"]] == [recent]
+    assert client.get("/api/manager/inquiries/search", params={"q": "chargeback"}).json()["inquiries"] == []
+    assert client.post(f"/api/inquiries/{inquiry_id}/reopen").status_code == 404
+    with database.engine.connect() as connection:
+        assert connection.execute(select(ResponseRecord)).all() == []
+
+
+def test_inquiries_with_pending_work_or_still_open_stay(client, add_inquiries):
+    waiting = add_closed_inquiry(add_inquiries)
+    add_inquiries([{"status": "open", "created_at": OLD}])
+    with database.engine.begin() as connection:
+        connection.execute(insert(EmailOutboxEntry).values(
+            inquiry_id=waiting, to_address="jane@example.com", template_name="InquiryResponse",
+            template_data="{}", status="sending",
+        ))
+
+    assert run_archive(client)["archived"] == 0
+
+
+def test_stream_replays_the_archive_as_a_removal(client, add_inquiries, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_MAX_STREAM_SECONDS", 0)
+    inquiry_id = add_closed_inquiry(add_inquiries)
+    [reopened] = add_inquiries([{"status": "closed"}])
+    assert client.post(f"/api/inquiries/{reopened}/reopen").status_code == 200
+
+    run_archive(client)
+
+    body = client.get("/api/manager/inquiries/stream", params={"since_id": 0}).text
+    replayed = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert [(event["type"], event["inquiry"]) for event in replayed][-1] == (
+        events.INQUIRY_ARCHIVED, {"id": inquiry_id},
+    )
+    # Events of inquiries that still exist keep their projection.
+    assert replayed[0]["inquiry"]["status"] == "open"
+
+
+@pytest.mark.parametrize("codec", sorted(archive.CODECS))
+def test_payload_codecs_round_trip(codec):
+    document = {"name": "Jane", "inquiry": "Ünïcode and \"quotes\"", "responses": []}
+
+    compressed = archive.compress_payload(archive.encode_payload(document), codec)
+
+    assert archive.decode_payload(compressed, codec) == document
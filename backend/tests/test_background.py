@@ -0,0 +1,57 @@
+import asyncio
+
+from background import BackgroundWorkers
+
+
+class Worker:
+    def __init__(self):
+        self.running = False
+
+    async def start(self):
+        self.running = True
+
+    async def stop(self):
+        self.running = False
+
+
+async def settle():
+    # Lets the election task run its first round.
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_only_one_process_runs_the_workers_and_another_takes_over():
+    async def scenario():
+        first_worker, second_worker = Worker(), Worker()
+        first = BackgroundWorkers([first_worker], enabled=True, retry_interval=0.01)
+        second = BackgroundWorkers([second_worker], enabled=True, retry_interval=0.01)
+
+        await first.start()
+        await settle()
+        await second.start()
+        await asyncio.sleep(0.05)
+        assert (first.state, second.state) == ("running", "standby")
+        assert (first_worker.running, second_worker.running) == (True, False)
+
+        await first.stop()
+        await asyncio.sleep(0.05)
+        assert (first.state, second.state) == ("stopped", "running")
+        assert (first_worker.running, second_worker.running) == (False, True)
+
+        await second.stop()
+        assert not second_worker.running
+
+    asyncio.run(scenario())
+
+
+def test_disabled_process_never_runs_the_workers():
+    async def scenario():
+        worker = Worker()
+        background = BackgroundWorkers([worker], enabled=False, retry_interval=0.01)
+
+        await background.start()
+        await asyncio.sleep(0.05)
+        await background.stop()
+        return background.state, worker.running
+
+    assert asyncio.run(scenario()) == ("disabled", False)
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from bulk_import import ImportedInquiry
+
+LINE = {"external_id": "mailbox-1", "name": "Jane Doe", "email": "jane@example.com", "inquiry": "Where is my order?"}
+
+
+@pytest.mark.parametrize("created_at, stored", [
+    ("2024-01-31T23:30:00-05:00", datetime(2024, 2, 1, 4, 30)),
+    ("2024-01-31T23:30:00Z", datetime(2024, 1, 31, 23, 30)),
+    # Without an offset the time is taken to be UTC already.
+    ("2024-01-31T23:30:00", datetime(2024, 1, 31, 23, 30)),
+])
+def test_created_at_is_stored_as_naive_utc(created_at, stored):
+    value = ImportedInquiry(**LINE, created_at=created_at).created_at
+
+    assert value == stored
+    assert value.tzinfo is None
+
+
+def test_missing_fields_are_rejected():
+    with pytest.raises(ValidationError):
+        ImportedInquiry(**{**LINE, "external_id": ""})
+
+
+def test_import_skips_lines_already_stored(client):
+    body = "\n".join([
+        '{"external_id": "a", "name": "Jane", "email": "jane@example.com", "inquiry": "Refund?", '
+        '"created_at": "2024-01-31T23:30:00-05:00"}',
+        '{"external_id": "b", "name": "John", "email": "john@example.com", "inquiry": "Invoice?"}',
+        'not json',
+    ])
+
+    first = client.post("/api/manager/inquiries/import", content=body).json()
+    second = client.post("/api/manager/inquiries/import", content=body).json()
+
+    assert (first["inserted"], first["invalid"]) == (2, 1)
+    assert (second["inserted"], second["duplicates"]) == (0, 2)
+    created = {i["name"]: i["created_at"] for i in client.get("/api/manager/inquiries").json()["inquiries"]}
+    assert created["Jane"].startswith("2024-02-01T04:30")
@@ -0,0 +1,33 @@
+import pytest
+
+from classification_cache import cache_key, normalize_inquiry_text
+
+
+@pytest.mark.parametrize("text", [
+    "My invoice is wrong.\n\nBest regards,\nJane Doe",
+    "My invoice is wrong.\n\nThanks!\n\nKind regards,\nJane Doe\nACME Inc.\nTel: +49 30 1234567\njane@acme.example",
+    "My invoice is wrong.\n-- \nJane",
+    "My  invoice is WRONG.\nSent from my iPhone",
+])
+def test_trailing_signature_is_dropped(text):
+    assert normalize_inquiry_text(text) == "my invoice is wrong."
+
+
+@pytest.mark.parametrize("text", [
+    "Hi,\nRegards,\nI was charged twice for order 123.",
+    "Hi,\nRegards,\nRefund please.",
+    "Hi,\nThanks\nMy app crashes",
+])
+def test_closing_followed_by_the_request_is_kept(text):
+    assert normalize_inquiry_text(text) == " ".join(text.split()).lower()
+
+
+def test_inquiries_sharing_an_opener_get_different_keys():
+    first = cache_key("Hi,\nRegards,\nI was charged twice for my subscription.", "fingerprint")
+    second = cache_key("Hi,\nRegards,\nMy login does not work since the update.", "fingerprint")
+
+    assert first != second
+
+
+def test_key_depends_on_the_fingerprint():
+    assert cache_key("My invoice is wrong.", "a") != cache_key("My invoice is wrong.", "b")
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from classification_queue import claim_jobs, requeue_stale_jobs
+from database import AsyncSessionLocal, ClassificationJob
+from conftest import FAKE_CLASSIFICATION, wait_for
+
+
+def add_jobs(run_async, inquiry_ids, **values):
+    async def add():
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(ClassificationJob), [
+                {"inquiry_id": inquiry_id, "status": "pending", **values} for inquiry_id in inquiry_ids
+            ])
+            await db.commit()
+    run_async(add)
+
+
+def test_concurrent_claims_never_share_a_job(run_async, add_inquiries):
+    add_jobs(run_async, add_inquiries([{}] * 10))
+
+    async def claim_concurrently():
+        async def claim():
+            async with AsyncSessionLocal() as db:
+                return [(job.id, job.locked_by) for job in await claim_jobs(db, 4)]
+        return await asyncio.gather(*(claim() for _ in range(4)))
+
+    claims = run_async(claim_concurrently)
+
+    claimed = [job_id for jobs in claims for job_id, _ in jobs]
+    assert len(claimed) == len(set(claimed)) == 10
+    # Every claim tags its jobs with a token of its own.
+    tokens = [{token for _, token in jobs} for jobs in claims if jobs]
+    assert all(len(batch_tokens) == 1 for batch_tokens in tokens)
+    assert len(set.union(*tokens)) == len(tokens)
+
+
+def test_claim_counts_the_attempt_and_skips_jobs_not_yet_due(run_async, add_inquiries):
+    due, later = add_inquiries([{}, {}])
+    add_jobs(run_async, [due])
+    add_jobs(run_async, [later], available_at=datetime.utcnow() + timedelta(minutes=5))
+
+    async def claim():
+        async with AsyncSessionLocal() as db:
+            return [(job.inquiry_id, job.status, job.attempts) for job in await claim_jobs(db, 10)]
+
+    assert run_async(claim) == [(due, "running", 1)]
+    assert run_async(claim) == []
+
+
+def test_stale_running_jobs_are_requeued(run_async, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+    add_jobs(run_async, [inquiry_id], status="running", locked_by="dead-worker",
+             locked_at=datetime.utcnow() - timedelta(hours=1))
+
+    async def requeue():
+        async with AsyncSessionLocal() as db:
+            requeued = await requeue_stale_jobs(db, stale_after=60)
+            job = (await db.execute(select(ClassificationJob))).scalar_one()
+            return requeued, job.status, job.locked_by
+
+    assert run_async(requeue) == (1, "pending", None)
+
+
+def test_submitted_inquiry_is_classified_by_the_workers(client):
+    response = client.post("/api/inquiries", json={
+        "name": "Jane Doe", "email": "jane@example.com", "inquiry": "I was charged twice for my subscription.",
+    })
+    assert response.status_code == 200
+
+    def classified():
+        inquiries = client.get("/api/manager/inquiries").json()["inquiries"]
+        return inquiries if inquiries and inquiries[0]["category"] != "Pending" else None
+
+    [inquiry] = wait_for(classified)
+    assert (inquiry["category"], inquiry["urgency"]) == (FAKE_CLASSIFICATION["category"], FAKE_CLASSIFICATION["urgency"])
+    assert client.get("/api/manager/classification/stats").json()["queue"]["done"] == 1
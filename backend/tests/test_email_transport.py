@@ -0,0 +1,151 @@
+import asyncio
+import socketserver
+import threading
+from email.message import EmailMessage, Message
+
+import pytest
+
+from email_transport import EmailTransport, SmtpTransport, create_transport
+
+
+class SmtpServer(socketserver.ThreadingTCPServer):
+    """
+    Just enough SMTP for smtplib: accepts every message, refuses the recipients
+    in `replies` with the given reply, and hangs up after a message while
+    `drop_after_message` is set, as a server closing an idle connection would.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.messages = []
+        self.connections = 0
+        self.replies = {}
+        self.drop_after_message = False
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 test ESMTP")
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250 test")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                self.reply(self.server.replies.get(address, "250 OK"))
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                    lines.append(data)
+                self.server.messages.append(b"".join(lines))
+                self.reply("250 Queued")
+                if self.server.drop_after_message:
+                    return
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_server():
+    server = SmtpServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport(smtp_server):
+    transport = SmtpTransport(host="127.0.0.1", port=smtp_server.server_address[1], security="none", timeout=5)
+    yield transport
+    asyncio.run(transport.close())
+
+
+def message(to: str = "jane@example.com") -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "support@example.com"
+    message["To"] = to
+    message["Subject"] = "Your inquiry"
+    message.set_content("We refunded you.")
+    return message
+
+
+def test_messages_are_delivered_over_one_kept_open_connection(smtp_server, transport):
+    async def scenario():
+        return [await transport.send(message()) for _ in range(2)]
+
+    first_id, second_id = asyncio.run(scenario())
+
+    assert first_id != second_id and first_id.endswith("@example.com>")
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 2
+    assert f"Message-ID: {first_id}".encode() in smtp_server.messages[0]
+    assert b"We refunded you." in smtp_server.messages[0]
+    assert transport.ready()
+
+
+def test_connection_closed_by_the_server_is_replaced(smtp_server, transport):
+    smtp_server.drop_after_message = True
+
+    async def scenario():
+        await transport.send(message())
+        await transport.send(message())
+
+    asyncio.run(scenario())
+
+    assert (smtp_server.connections, len(smtp_server.messages)) == (2, 2)
+    assert transport.breaker.stats()["consecutive_failures"] == 0
+
+
+@pytest.mark.parametrize("reply, permanent", [
+    ("550 No such user", True),
+    ("451 Try again later", False),
+])
+def test_refused_recipients(smtp_server, transport, reply, permanent):
+    smtp_server.replies["gone@example.com"] = reply
+
+    async def scenario():
+        with pytest.raises(Exception) as raised:
+            await transport.send(message("gone@example.com"))
+        return raised.value
+
+    error = asyncio.run(scenario())
+
+    assert transport.is_permanent(error) is permanent
+    # Only failures that say something about the server count towards the circuit.
+    assert transport.breaker.stats()["consecutive_failures"] == (0 if permanent else 1)
+    assert smtp_server.messages == []
+
+
+def test_transports_must_implement_send():
+    class Incomplete(EmailTransport):
+        name = "incomplete"
+
+    class Complete(Incomplete):
+        async def send(self, message: Message) -> str:
+            return "id"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    assert not Complete().is_permanent(RuntimeError())
+
+
+def test_unknown_settings_are_rejected():
+    with pytest.raises(ValueError):
+        create_transport("carrier-pigeon")
+    with pytest.raises(ValueError):
+        SmtpTransport(security="tls")
@@ -0,0 +1,104 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+import database
+import events
+from conftest import wait_for
+from database import InquiryEvent
+
+
+def parse(body: str) -> list:
+    """
+    Splits an SSE body into one dict of fields per message.
+    """
+    messages = []
+    for block in body.strip().split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            if not line.startswith(":"):
+                name, _, value = line.partition(": ")
+                fields[name] = value
+        messages.append(fields)
+    return messages
+
+
+def event_ids() -> list:
+    with database.engine.connect() as connection:
+        return list(connection.execute(select(InquiryEvent.id).order_by(InquiryEvent.id)).scalars())
+
+
+@pytest.fixture
+def short_streams(monkeypatch):
+    # Streams end right after the replay instead of waiting for live events.
+    monkeypatch.setattr(events, "EVENTS_MAX_STREAM_SECONDS", 0)
+
+
+def stream(client, **kwargs):
+    response = client.get("/api/manager/inquiries/stream", **kwargs)
+    assert response.status_code == 200
+    return parse(response.text)
+
+
+def test_resume_replays_the_events_after_last_event_id(client, add_inquiries, short_streams):
+    inquiry_ids = add_inquiries([{}, {}, {}])
+    for inquiry_id in inquiry_ids:
+        assert client.post(f"/api/inquiries/{inquiry_id}/close").status_code == 200
+    first, *later = event_ids()
+
+    opening, *replayed = stream(client, headers={"Last-Event-ID": str(first)})
+
+    assert opening == {"retry": str(events.RECONNECT_DELAY_MS), "id": str(first)}
+    assert [int(message["id"]) for message in replayed] == later
+    data = json.loads(replayed[0]["data"])
+    assert data["type"] == events.INQUIRY_STATUS_CHANGED
+    assert (data["inquiry"]["id"], data["inquiry"]["status"]) == (inquiry_ids[1], "closed")
+
+
+def test_last_event_id_wins_over_since_id(client, add_inquiries, short_streams):
+    for inquiry_id in add_inquiries([{}, {}]):
+        client.post(f"/api/inquiries/{inquiry_id}/close")
+    first, second = event_ids()
+
+    _, *replayed = stream(client, params={"since_id": 0}, headers={"Last-Event-ID": str(first)})
+
+    assert [int(message["id"]) for message in replayed] == [second]
+
+
+def test_new_stream_starts_at_the_latest_event(client, add_inquiries, short_streams):
+    [inquiry_id] = add_inquiries([{}])
+    client.post(f"/api/inquiries/{inquiry_id}/close")
+    [latest] = event_ids()
+
+    wait_for(lambda: events.broker.last_id == latest)
+
+    # Nothing to replay, but the id lets the browser resume from here.
+    assert stream(client) == [{"retry": str(events.RECONNECT_DELAY_MS), "id": str(latest)}]
+
+
+def test_client_too_far_behind_is_told_to_reset(client, add_inquiries, short_streams, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_BACKFILL_LIMIT", 1)
+    for inquiry_id in add_inquiries([{}, {}]):
+        client.post(f"/api/inquiries/{inquiry_id}/close")
+
+    _, reset = stream(client, params={"since_id": 0})
+
+    assert reset["event"] == "reset"
+
+
+def test_prune_keeps_the_newest_event_so_ids_are_never_reused(run_async):
+    old = datetime.utcnow() - timedelta(hours=events.EVENTS_RETENTION_HOURS + 1)
+    with database.engine.begin() as connection:
+        connection.execute(insert(InquiryEvent), [
+            {"inquiry_id": i, "type": events.INQUIRY_CREATED, "created_at": old} for i in range(1, 4)
+        ])
+    newest = event_ids()[-1]
+
+    run_async(events.EventBroker()._prune)
+
+    assert event_ids() == [newest]
+    with database.engine.begin() as connection:
+        connection.execute(insert(InquiryEvent).values(inquiry_id=4, type=events.INQUIRY_CREATED))
+    assert event_ids()[-1] > newest
@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from export import export_query, export_stream, FIELD_NAMES
+
+BASE = datetime(2025, 1, 1, 12, 0)
+
+
+def export(client, **params):
+    response = client.get("/api/manager/inquiries/export", params=params)
+    assert response.status_code == 200
+    return response
+
+
+def test_csv_has_every_column_oldest_first(client, add_inquiries):
+    ids = add_inquiries([{"created_at": BASE + timedelta(minutes=-i), "inquiry_text": f"Line {i},\nwith a comma"}
+                         for i in range(3)])
+
+    response = export(client, format="csv")
+
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"].endswith('.csv"')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert list(rows[0]) == FIELD_NAMES
+    assert [int(row["id"]) for row in rows] == ids[::-1]
+    assert rows[-1]["inquiry_text"] == "Line 0,\nwith a comma"
+    assert rows[-1]["created_at"] == BASE.isoformat()
+
+
+def test_ndjson_applies_the_filters(client, add_inquiries):
+    billing = add_inquiries([{"category": "Billing", "created_at": BASE + timedelta(days=i)} for i in range(3)])
+    add_inquiries([{"category": "Sales", "created_at": BASE}])
+
+    response = export(client, format="ndjson", category="Billing", created_from=(BASE + timedelta(days=1)).isoformat())
+
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == billing[1:]
+
+
+def test_parquet_round_trip(client, add_inquiries):
+    pq = pytest.importorskip("pyarrow.parquet")
+    ids = add_inquiries([{"created_at": BASE + timedelta(minutes=i)} for i in range(3)])
+
+    table = pq.read_table(io.BytesIO(export(client, format="parquet").content))
+
+    assert table.column_names == FIELD_NAMES
+    assert table.column("id").to_pylist() == ids
+    assert table.column("created_at").to_pylist()[0] == BASE
+
+
+def test_every_chunk_is_sent_as_it_is_read(run_async, add_inquiries):
+    add_inquiries([{"created_at": BASE + timedelta(minutes=i)} for i in range(5)])
+
+    async def collect():
+        return [chunk async for chunk in export_stream("ndjson", export_query(), chunk_size=2)]
+
+    chunks = run_async(collect)
+
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+
+
+def test_parquet_without_pyarrow_is_not_implemented(client, monkeypatch):
+    # A None entry makes the import fail as if the package were missing.
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    response = client.get("/api/manager/inquiries/export", params={"format": "parquet"})
+
+    assert response.status_code == 501
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/api/manager/inquiries/export", params={"format": "xml"}).status_code == 422
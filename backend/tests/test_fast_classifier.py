@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import bedrock_llm
+import fast_classifier
+from classification_engine import ClassificationEngine
+from conftest import FAKE_CLASSIFICATION
+from fast_classifier import FastClassifier
+
+
+@pytest.mark.parametrize("text, category", [
+    ("I was double charged on my invoice.", "Billing"),
+    ("The app crashes every time I open the settings page.", "Technical"),
+    ("Do you offer discounts for non-profits?", "Sales"),
+])
+def test_single_topic_inquiries_pass_the_default_threshold(text, category):
+    classification = FastClassifier().classify(text)
+
+    assert classification["category"] == category
+    # The summary is the first sentence of the inquiry itself.
+    assert classification["summary"] == text
+
+
+@pytest.mark.parametrize("text", [
+    # Hits of two categories: Technical and Billing.
+    "The payment page throws an error when I try to pay.",
+    # No keyword at all.
+    "Do you have an office in Berlin?",
+])
+def test_ambiguous_or_unmatched_inquiries_fall_through(text):
+    assert FastClassifier().classify(text) is None
+
+
+def test_confidence_grows_with_unambiguous_hits():
+    _, one = fast_classifier.classify("Where is my invoice?")
+    _, two = fast_classifier.classify("Where is my invoice? I need a refund.")
+    _, mixed = fast_classifier.classify("Where is my invoice? The download link is broken.")
+
+    assert mixed < FastClassifier().threshold < one < two
+
+
+def test_urgency_keywords():
+    assert FastClassifier().classify("Urgent: I was charged twice!")["urgency"] == "High"
+    assert FastClassifier().classify("No rush, but where is my invoice?")["urgency"] == "Low"
+    assert FastClassifier().classify("Where is my invoice?")["urgency"] == "Medium"
+
+
+def test_engine_only_sends_what_the_fast_path_cannot_answer():
+    model = FakeListChatModel(responses=[json.dumps(FAKE_CLASSIFICATION)])
+    chain, parser = bedrock_llm.build_chain(model)
+    engine = ClassificationEngine(chain=chain, parser=parser, fast_classifier=FastClassifier())
+
+    results = asyncio.run(engine.classify_many([
+        "I was double charged on my invoice.",
+        "Do you have an office in Berlin?",
+        "The payment page throws an error when I try to pay.",
+    ]))
+
+    assert [result["source"] for result in results] == ["fast", "llm", "llm"]
+    assert results[0]["category"] == "Billing"
+    assert engine.stats()["fast_path"] == 1
+    assert engine.stats()["classified"] == 2
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def respond(client, inquiry_id, text="We have fixed your invoice.", **fields):
+    return client.post(f"/api/inquiries/{inquiry_id}/respond", json={"response": text, **fields})
+
+
+def test_first_response_answers_the_inquiry(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+
+    assert respond(client, inquiry_id).status_code == 200
+
+    detail = client.get(f"/api/inquiries/{inquiry_id}").json()
+    assert detail["status"] == "answered"
+    assert detail["response_count"] == 1
+    assert [r["response"] for r in detail["responses"]] == ["We have fixed your invoice."]
+
+
+def test_second_response_without_expected_count_conflicts(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+    assert respond(client, inquiry_id).status_code == 200
+
+    assert respond(client, inquiry_id).status_code == 409
+
+
+def test_follow_up_needs_the_current_response_count(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+    assert respond(client, inquiry_id, expected_response_count=0).status_code == 200
+
+    # Someone else answered since this manager loaded the thread.
+    stale = respond(client, inquiry_id, "Follow-up", expected_response_count=0)
+    assert stale.status_code == 409
+    assert "1 response" in stale.json()["detail"]
+
+    assert respond(client, inquiry_id, "Follow-up", expected_response_count=1).status_code == 200
+    assert client.get(f"/api/inquiries/{inquiry_id}").json()["response_count"] == 2
+
+
+def test_closed_inquiry_accepts_no_response_until_reopened(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+
+    assert client.post(f"/api/inquiries/{inquiry_id}/close").status_code == 200
+    assert client.post(f"/api/inquiries/{inquiry_id}/close").status_code == 409
+    assert respond(client, inquiry_id, expected_response_count=0).status_code == 409
+
+    assert client.post(f"/api/inquiries/{inquiry_id}/reopen").status_code == 200
+    assert client.post(f"/api/inquiries/{inquiry_id}/reopen").status_code == 409
+    assert respond(client, inquiry_id).status_code == 200
+
+
+def test_status_changes_of_unknown_inquiries_are_not_found(client):
+    assert respond(client, 999999).status_code == 404
+    assert client.post("/api/inquiries/999999/close").status_code == 404
+    assert client.post("/api/inquiries/999999/reopen").status_code == 404
+
+
+def test_concurrent_responses_have_a_single_winner(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(
+            lambda i: respond(client, inquiry_id, f"Response {i}", expected_response_count=0).status_code,
+            range(8),
+        ))
+
+    assert sorted(statuses) == [200] + [409] * 7
+    detail = client.get(f"/api/inquiries/{inquiry_id}").json()
+    assert detail["response_count"] == 1
+    assert len(detail["responses"]) == 1
+
+
+def test_concurrent_closes_have_a_single_winner(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{"status": "answered", "response_count": 1}])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(lambda _: client.post(f"/api/inquiries/{inquiry_id}/close").status_code, range(8)))
+
+    assert sorted(statuses) == [200] + [409] * 7
+
+
+def test_response_queues_an_email(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+
+    body = respond(client, inquiry_id).json()
+
+    outbox = client.get("/api/manager/email/stats").json()["outbox"]
+    assert body["emailId"]
+    assert sum(outbox.values()) == 1
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+BASE = datetime(2025, 1, 1, 12, 0)
+
+
+def pages(client, path, **params):
+    """
+    Follows `next_cursor` from the first page to the last.
+    """
+    ids, cursor, count = [], None, 0
+    while True:
+        body = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        ids += [inquiry["id"] for inquiry in body["inquiries"]]
+        count += 1
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids, count
+
+
+def test_list_pages_cover_every_inquiry_once_newest_first(client, add_inquiries):
+    # Pairs share a timestamp, so the id has to break ties.
+    created = [BASE + timedelta(minutes=i // 2) for i in range(11)]
+    ids = add_inquiries([{"created_at": created_at} for created_at in created])
+
+    listed, count = pages(client, "/api/manager/inquiries", limit=3)
+
+    assert listed == [i for _, i in sorted(zip(created, ids), reverse=True)]
+    assert count == 4
+
+
+def test_list_cursor_keeps_its_place_when_new_inquiries_arrive(client, add_inquiries):
+    ids = add_inquiries([{"created_at": BASE + timedelta(minutes=i)} for i in range(6)])
+    first = client.get("/api/manager/inquiries", params={"limit": 3}).json()
+
+    add_inquiries([{"created_at": BASE + timedelta(days=1)}])
+    second = client.get("/api/manager/inquiries", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    assert [i["id"] for i in first["inquiries"] + second["inquiries"]] == ids[::-1]
+
+
+def test_list_pages_apply_the_filter(client, add_inquiries):
+    billing = add_inquiries([{"category": "Billing", "created_at": BASE + timedelta(minutes=i)} for i in range(5)])
+    add_inquiries([{"category": "Sales", "created_at": BASE + timedelta(minutes=i)} for i in range(5)])
+
+    listed, _ = pages(client, "/api/manager/inquiries", limit=2, category="Billing")
+
+    assert listed == billing[::-1]
+
+
+def test_open_queue_pages_by_urgency_then_age(client, add_inquiries):
+    rows = [
+        {"urgency": "Low", "created_at": BASE},
+        {"urgency": "High", "created_at": BASE + timedelta(minutes=2)},
+        {"urgency": "Pending", "created_at": BASE - timedelta(days=1)},
+        {"urgency": "High", "created_at": BASE + timedelta(minutes=1)},
+        {"urgency": "Medium", "created_at": BASE},
+        {"urgency": "High", "status": "closed", "created_at": BASE},
+        {"urgency": "Low", "created_at": BASE - timedelta(minutes=1)},
+    ]
+    low, high_late, pending, high_early, medium, _, low_early = add_inquiries(rows)
+
+    queued, count = pages(client, "/api/manager/inquiries/open", limit=2)
+
+    assert queued == [high_early, high_late, medium, low_early, low, pending]
+    assert count == 3
+
+
+@pytest.mark.parametrize("path", ["/api/manager/inquiries", "/api/manager/inquiries/open"])
+def test_malformed_cursor_is_rejected(client, path):
+    assert client.get(path, params={"cursor": "not-a-cursor"}).status_code == 400
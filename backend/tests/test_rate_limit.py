@@ -0,0 +1,115 @@
+import pytest
+
+import rate_limit
+from rate_limit import Backpressure, DatabaseRateLimiter, MemoryRateLimiter, RateLimiter, SubmissionGuard
+
+
+class Clock:
+    """
+    Stands in for the `time` module of rate_limit only; the event loop keeps the real one.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("limiter_class", [MemoryRateLimiter, DatabaseRateLimiter])
+def test_bucket_allows_a_burst_then_refills_at_the_rate(run_async, clock, limiter_class):
+    limiter = limiter_class()
+
+    async def take(count):
+        return [await limiter.acquire("ip:203.0.113.7", per_minute=6, burst=3) for _ in range(count)]
+
+    assert run_async(take, 3) == [0, 0, 0]
+    # Six per minute: the next token is ten seconds away.
+    [wait] = run_async(take, 1)
+    assert wait == pytest.approx(10)
+
+    clock.now += 5
+    [wait] = run_async(take, 1)
+    assert wait == pytest.approx(5)
+
+    clock.now += 5
+    assert run_async(take, 2) == [0, pytest.approx(10)]
+
+
+def test_buckets_are_independent(run_async, clock):
+    limiter = MemoryRateLimiter()
+
+    async def take(key):
+        return await limiter.acquire(key, per_minute=1, burst=1)
+
+    assert run_async(take, "email:a@example.com") == 0
+    assert run_async(take, "email:a@example.com") > 0
+    assert run_async(take, "email:b@example.com") == 0
+
+
+def test_memory_limiter_drops_the_least_recently_used_bucket(run_async, clock):
+    limiter = MemoryRateLimiter(max_size=2)
+
+    async def take(key):
+        return await limiter.acquire(key, per_minute=1, burst=1)
+
+    for key in ("a", "b", "c"):
+        run_async(take, key)
+
+    # "a" was forgotten, so it starts from a full bucket again.
+    assert run_async(take, "a") == 0
+    assert run_async(take, "c") > 0
+
+
+def test_backend_without_acquire_cannot_be_created():
+    class Incomplete(RateLimiter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_submissions_over_the_email_limit_get_429(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_EMAIL_BURST", 2)
+    monkeypatch.setattr(main, "submission_guard", SubmissionGuard(limiter=MemoryRateLimiter(), enabled=True))
+    inquiry = {"name": "Jane Doe", "email": "Jane@Example.com", "inquiry": "Where is my order?"}
+
+    statuses = [client.post("/api/inquiries", json=inquiry).status_code for _ in range(2)]
+    # The same address in another spelling shares the bucket.
+    rejected = client.post("/api/inquiries", json={**inquiry, "email": " jane@example.com"})
+
+    assert statuses == [200, 200]
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+
+def test_submissions_get_503_while_a_queue_is_over_its_limit(client, monkeypatch):
+    import main
+
+    class FullQueue(Backpressure):
+        async def depths(self):
+            return {"classification_queue": rate_limit.BACKPRESSURE_CLASSIFICATION_LIMIT + 1, "email_queue": 0}
+
+    monkeypatch.setattr(main, "submission_guard", SubmissionGuard(
+        limiter=MemoryRateLimiter(), backpressure=FullQueue(), enabled=True,
+    ))
+
+    rejected = client.post("/api/inquiries", json={
+        "name": "Jane Doe", "email": "jane@example.com", "inquiry": "Where is my order?",
+    })
+
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == str(rate_limit.BACKPRESSURE_RETRY_AFTER)
+    assert client.get("/api/manager/inquiries").json()["inquiries"] == []
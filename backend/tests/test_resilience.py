@@ -0,0 +1,239 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import bedrock_llm
+import resilience
+from classification_engine import ClassificationEngine
+from conftest import FAKE_CLASSIFICATION
+from resilience import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN, jittered_backoff
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class NoJitter:
+    @staticmethod
+    def uniform(low, high):
+        return (low + high) / 2
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only resilience's view of time and randomness; the event loop keeps the real ones.
+    monkeypatch.setattr(resilience, "time", clock)
+    monkeypatch.setattr(resilience, "random", NoJitter)
+    return clock
+
+
+class Flaky:
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return "ok"
+
+
+def call(breaker, function):
+    return asyncio.run(breaker.call(function))
+
+
+def test_opens_after_consecutive_failures_and_rejects_without_calling(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    dependency = Flaky()
+    dependency.error = ConnectionError("down")
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            call(breaker, dependency)
+
+    assert breaker.state == OPEN and breaker.is_open
+    with pytest.raises(CircuitOpenError) as rejected:
+        call(breaker, dependency)
+    assert dependency.calls == 3
+    assert rejected.value.retry_after == pytest.approx(30)
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_a_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    dependency = Flaky()
+
+    for error in (ConnectionError("down"), None, ConnectionError("down"), None):
+        dependency.error = error
+        try:
+            call(breaker, dependency)
+        except ConnectionError:
+            pass
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_the_circuit_on_success(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    dependency = Flaky()
+    dependency.error = ConnectionError("down")
+    with pytest.raises(ConnectionError):
+        call(breaker, dependency)
+
+    clock.now += 29
+    assert breaker.is_open
+    clock.now += 1
+    assert not breaker.is_open
+
+    dependency.error = None
+    assert call(breaker, dependency) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    dependency = Flaky()
+    dependency.error = ConnectionError("down")
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            call(breaker, dependency)
+
+    clock.now += 30
+    # A single failed probe is enough, however high the threshold.
+    with pytest.raises(ConnectionError):
+        call(breaker, dependency)
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == pytest.approx(30)
+
+
+def test_only_one_probe_at_a_time(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    dependency = Flaky()
+    dependency.error = ConnectionError("down")
+    with pytest.raises(ConnectionError):
+        call(breaker, dependency)
+    clock.now += 30
+
+    async def probe_twice():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(breaker.call(slow))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN and breaker.is_open
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(slow)
+        release.set()
+        return await probe
+
+    assert asyncio.run(probe_twice()) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_errors_that_are_not_failures_do_not_trip_the_circuit(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, is_failure=lambda error: not isinstance(error, ValueError))
+    dependency = Flaky()
+    dependency.error = ValueError("invalid address")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            call(breaker, dependency)
+
+    assert breaker.state == CLOSED
+
+
+def test_timeouts_count_as_failures():
+    breaker = CircuitBreaker("test", failure_threshold=1, max_timeout=0.01)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        call(breaker, hang)
+    assert breaker.state == OPEN
+    assert breaker.stats()["timeouts"] == 1
+
+
+def test_timeout_follows_recent_latencies(clock):
+    breaker = CircuitBreaker("test", min_timeout=1, max_timeout=30, timeout_multiplier=3)
+    assert breaker.timeout() == 30
+
+    for _ in range(resilience.MIN_LATENCY_SAMPLES):
+        breaker.record_success(2.0)
+    assert breaker.timeout() == pytest.approx(6)
+
+    for _ in range(100):
+        breaker.record_success(0.01)
+    assert breaker.timeout() == 1
+
+
+def test_jittered_backoff_stays_within_half_and_all_of_the_capped_delay():
+    for attempt in range(1, 10):
+        delay = min(5 * 2 ** (attempt - 1), 60)
+        assert delay / 2 <= jittered_backoff(5, attempt, cap=60) <= delay
+
+
+class SlowChatModel(FakeListChatModel):
+    latency: float = 0.03
+    fail: bool = False
+
+    async def _agenerate(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError("Bedrock is down")
+        return self._generate(*args, **kwargs)
+
+
+def engine_with(model, breaker, max_concurrency=2):
+    chain, parser = bedrock_llm.build_chain(model)
+    return ClassificationEngine(chain=chain, parser=parser, max_concurrency=max_concurrency, breaker=breaker)
+
+
+def llm_breaker(**kwargs):
+    return CircuitBreaker("llm", is_failure=lambda error: not isinstance(error, ValueError), **kwargs)
+
+
+def test_llm_timeout_applies_to_each_call_not_to_the_batch():
+    breaker = llm_breaker(failure_threshold=1, min_timeout=0.01, max_timeout=5, timeout_multiplier=3)
+    for _ in range(resilience.MIN_LATENCY_SAMPLES):
+        breaker.record_success(0.03)
+    engine = engine_with(SlowChatModel(responses=[json.dumps(FAKE_CLASSIFICATION)]), breaker)
+
+    # Four rounds of two calls take about 0.12s, longer than the 0.09s timeout of one call.
+    results = asyncio.run(engine.classify_many([f"Inquiry {i}" for i in range(8)]))
+
+    assert [result["category"] for result in results] == [FAKE_CLASSIFICATION["category"]] * 8
+    assert breaker.state == CLOSED
+    assert breaker.stats()["timeouts"] == 0
+
+
+def test_malformed_llm_answers_do_not_trip_the_circuit():
+    breaker = llm_breaker(failure_threshold=1)
+    engine = engine_with(FakeListChatModel(responses=["Sorry, I cannot help with that."]), breaker)
+
+    results = asyncio.run(engine.classify_many(["Inquiry 1", "Inquiry 2"]))
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert breaker.state == CLOSED
+
+
+def test_failing_llm_opens_the_circuit_and_the_rest_of_the_batch_is_deferred():
+    breaker = llm_breaker(failure_threshold=2)
+    engine = engine_with(SlowChatModel(responses=["{}"], fail=True), breaker, max_concurrency=1)
+
+    results = asyncio.run(engine.classify_many([f"Inquiry {i}" for i in range(5)]))
+
+    assert [type(result) for result in results] == [ConnectionError] * 2 + [CircuitOpenError] * 3
+    assert breaker.state == OPEN
+    assert engine.stats()["failed"] == 2
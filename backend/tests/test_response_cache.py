@@ -0,0 +1,23 @@
+def test_list_revalidates_until_an_inquiry_changes(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{}])
+    first = client.get("/api/manager/inquiries")
+    etag = first.headers["etag"]
+
+    assert client.get("/api/manager/inquiries", headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.post(f"/api/inquiries/{inquiry_id}/close").status_code == 200
+    changed = client.get("/api/manager/inquiries", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["inquiries"][0]["status"] == "closed"
+
+
+def test_detail_version_only_changes_with_its_inquiry(client, add_inquiries):
+    first_id, second_id = add_inquiries([{}, {}])
+    etag = client.get(f"/api/inquiries/{first_id}").headers["etag"]
+
+    assert client.post(f"/api/inquiries/{second_id}/close").status_code == 200
+    assert client.get(f"/api/inquiries/{first_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.post(f"/api/inquiries/{first_id}/close").status_code == 200
+    assert client.get(f"/api/inquiries/{first_id}", headers={"If-None-Match": etag}).status_code == 200
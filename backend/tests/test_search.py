@@ -0,0 +1,66 @@
+from sqlalchemy import update
+
+import database
+
+
+def search(client, q, **params):
+    response = client.get("/api/manager/inquiries/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_matches_in_the_name_rank_above_matches_in_the_text(client, add_inquiries):
+    in_text, in_name, _ = add_inquiries([
+        {"inquiry_text": "Please ask Miller from accounting about the invoice."},
+        {"name": "Anna Miller"},
+        {"inquiry_text": "Where is my parcel?"},
+    ])
+
+    results = search(client, "miller")["inquiries"]
+
+    assert [r["id"] for r in results] == [in_name, in_text]
+
+
+def test_last_word_matches_as_a_prefix(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{"inquiry_text": "The subscription renewal failed."}])
+
+    assert [r["id"] for r in search(client, "subscr")["inquiries"]] == [inquiry_id]
+
+
+def test_matches_are_highlighted_in_escaped_html(client, add_inquiries):
+    add_inquiries([{"summary": "<b>Refund</b> for order 42", "inquiry_text": "I want a refund."}])
+
+    [result] = search(client, "refund")["inquiries"]
+
+    assert result["summary_highlight"] == "&lt;b&gt;<mark>Refund</mark>&lt;/b&gt; for order 42"
+    assert "<mark>refund</mark>" in result["inquiry_highlight"]
+
+
+def test_index_follows_updates_of_the_summary(client, add_inquiries):
+    [inquiry_id] = add_inquiries([{"summary": "Pending."}])
+    assert search(client, "chargeback")["inquiries"] == []
+
+    import main
+    with database.engine.begin() as connection:
+        connection.execute(update(database.InquiryRecord).values(summary="Chargeback dispute."))
+    # Written behind the app's back, so no new version invalidates the cached result.
+    main.response_cache.clear()
+
+    assert [r["id"] for r in search(client, "chargeback")["inquiries"]] == [inquiry_id]
+
+
+def test_filters_and_pages(client, add_inquiries):
+    billing = add_inquiries([{"inquiry_text": f"Invoice question {i}."} for i in range(3)])
+    add_inquiries([{"category": "Sales", "inquiry_text": "Invoice for the quote?"}])
+
+    first = search(client, "invoice", category="Billing", limit=2)
+    second = search(client, "invoice", category="Billing", limit=2, cursor=first["next_cursor"])
+
+    assert sorted(r["id"] for r in first["inquiries"] + second["inquiries"]) == billing
+    assert second["next_cursor"] is None
+
+
+def test_query_without_words_finds_nothing(client, add_inquiries):
+    add_inquiries([{}])
+
+    assert search(client, '"*')["inquiries"] == []
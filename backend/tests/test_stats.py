@@ -0,0 +1,68 @@
+import json
+from datetime import datetime, timedelta
+
+import database
+import stats
+from conftest import FAKE_CLASSIFICATION, wait_for
+
+
+def import_inquiries(client, days_ago: list):
+    now = datetime.utcnow()
+    body = "\n".join(json.dumps({
+        "external_id": f"stats-{i}",
+        "name": "Jane Doe",
+        "email": "jane@example.com",
+        "inquiry": "Where is my invoice?",
+        "created_at": (now - timedelta(days=days)).isoformat(),
+    }) for i, days in enumerate(days_ago))
+    assert client.post("/api/manager/inquiries/import", content=body).json()["inserted"] == len(days_ago)
+
+
+def get_stats(client, **params):
+    response = client.get("/api/manager/stats", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_counts_follow_creation_and_classification(client):
+    import_inquiries(client, [1, 1, 3, 40])
+
+    # Counted right away, as Pending until classified.
+    assert get_stats(client, days=7)["total"] == 3
+
+    wait_for(lambda: client.get("/api/manager/classification/stats").json()["queue"].get("done") == 4)
+    body = get_stats(client, days=7)
+
+    category, urgency = FAKE_CLASSIFICATION["category"], FAKE_CLASSIFICATION["urgency"]
+    assert (body["total"], body["by_category"], body["by_urgency"]) == (3, {category: 3}, {urgency: 3})
+    assert [bucket["total"] for bucket in body["series"]] == [0, 0, 0, 1, 0, 2, 0]
+    assert body["series"][-1]["day"] == datetime.utcnow().date().isoformat()
+    assert get_stats(client, days=60)["total"] == 4
+
+
+def test_filters_apply_to_totals_and_series(client):
+    import_inquiries(client, [0, 2])
+    wait_for(lambda: client.get("/api/manager/classification/stats").json()["queue"].get("done") == 2)
+
+    assert get_stats(client, days=7, category=FAKE_CLASSIFICATION["category"])["total"] == 2
+    other = get_stats(client, days=7, category="Sales")
+    assert other["total"] == 0
+    assert all(bucket["total"] == 0 for bucket in other["series"])
+
+
+def test_rebuild_matches_the_incremental_counts(client):
+    import_inquiries(client, [0, 1, 1])
+    wait_for(lambda: client.get("/api/manager/classification/stats").json()["queue"].get("done") == 3)
+    incremental = get_stats(client, days=7)
+
+    with database.engine.begin() as connection:
+        stats.rebuild_daily_counts(connection)
+    import main
+    main.response_cache.clear()
+
+    assert get_stats(client, days=7) == incremental
+
+
+def test_days_are_bounded(client):
+    assert client.get("/api/manager/stats", params={"days": 0}).status_code == 422
+    assert client.get("/api/manager/stats", params={"days": stats.MAX_STATS_DAYS + 1}).status_code == 422
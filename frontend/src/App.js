@@ -45,7 +45,7 @@ function App() {
           />
           <Route
             path="/inquiry/:id"
-            element={isAuthenticated ? <InquiryDetailView /> : <Navigate to="/login" replace />}
+            element={isAuthenticated ? <InquiryDetailView username={username} /> : <Navigate to="/login" replace />}
           />
         </Routes>
       </div>
@@ -1,34 +1,60 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { useParams } from 'react-router-dom';
 import './InquiryDetailView.css';
 import { toast } from 'react-toastify';
 
-const InquiryDetailView = () => {
+const InquiryDetailView = ({ username }) => {
     const { id } = useParams();
     const [inquiry, setInquiry] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null); // This is for fetching inquiry details, not response submission
     const [response, setResponse] = useState('');
 
-    useEffect(() => {
-        const fetchInquiry = async () => {
-            try {
-                const res = await fetch(`${process.env.REACT_APP_BACKEND_URL || ''}/api/inquiries/${id}`);
-                if (!res.ok) {
-                    throw new Error(`HTTP error! status: ${res.status}`);
-                }
-                const data = await res.json();
-                setInquiry(data);
-            } catch (err) {
-                setError(err.message);
-                toast.error(`Error fetching inquiry details: ${err.message}`); // Also show toast for fetch errors
-            } finally {
-                setLoading(false);
+    const fetchInquiry = useCallback(async () => {
+        try {
+            const res = await fetch(`${process.env.REACT_APP_BACKEND_URL || ''}/api/inquiries/${id}`);
+            if (!res.ok) {
+                throw new Error(`HTTP error! status: ${res.status}`);
             }
-        };
+            const data = await res.json();
+            setInquiry(data);
+        } catch (err) {
+            setError(err.message);
+            toast.error(`Error fetching inquiry details: ${err.message}`); // Also show toast for fetch errors
+        } finally {
+            setLoading(false);
+        }
+    }, [id]);
 
+    useEffect(() => {
         fetchInquiry();
-    }, [id]);
+    }, [fetchInquiry]);
+
+    // Another manager changed the inquiry in the meantime: show the error and the current thread.
+    const handleConflict = async (res) => {
+        const errorData = await res.json();
+        toast.error(errorData.detail || 'The inquiry was changed by someone else.');
+        fetchInquiry();
+    };
+
+    const changeStatus = async (action) => {
+        try {
+            const res = await fetch(`${process.env.REACT_APP_BACKEND_URL || ''}/api/inquiries/${id}/${action}`, {
+                method: 'POST',
+            });
+            if (res.status === 409) {
+                await handleConflict(res);
+                return;
+            }
+            if (!res.ok) {
+                throw new Error(`HTTP error! status: ${res.status}`);
+            }
+            const data = await res.json();
+            setInquiry(prev => ({ ...prev, status: data.status }));
+        } catch (err) {
+            toast.error(`Failed to update the inquiry: ${err.message}`);
+        }
+    };
 
     const handleResponseSubmit = async (e) => {
         e.preventDefault();
@@ -43,9 +69,17 @@ const InquiryDetailView = () => {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ response }),
+                body: JSON.stringify({
+                    response,
+                    responder: username,
+                    expected_response_count: inquiry.response_count,
+                }),
             });
 
+            if (res.status === 409) {
+                await handleConflict(res);
+                return;
+            }
             if (!res.ok) {
                 const errorData = await res.json();
                 const errorMessage = errorData.detail || `Failed to submit response. HTTP error! status: ${res.status}`;
@@ -55,6 +89,7 @@ const InquiryDetailView = () => {
 
             toast.success("Response submitted successfully!");
             setResponse('');
+            fetchInquiry();
 
         } catch (err) {
             console.error('Error submitting response:', err);
@@ -95,6 +130,10 @@ const InquiryDetailView = () => {
                     <strong>Created At</strong>
                     <span>{new Date(inquiry.created_at).toLocaleString()}</span>
                 </div>
+                <div className="info-item">
+                    <strong>Status</strong>
+                    <span className={`status-badge status-badge-${inquiry.status}`}>{inquiry.status}</span>
+                </div>
             </div>
 
             <div className="inquiry-text-section">
@@ -102,21 +141,49 @@ const InquiryDetailView = () => {
                 <p className="inquiry-text">{inquiry.inquiry}</p>
             </div>
 
-            <div className="response-section">
-                <h3>Respond to Inquiry</h3>
-                <form onSubmit={handleResponseSubmit}>
-                    <textarea
-                        className="response-textarea"
-                        value={response}
-                        onChange={(e) => setResponse(e.target.value)}
-                        placeholder="Type your response here..."
-                        required
-                    />
-                    <button type="submit" className="submit-response-btn">
-                        Send
+            {inquiry.responses.length > 0 && (
+                <div className="thread-section">
+                    <h3>Responses</h3>
+                    {inquiry.responses.map((r) => (
+                        <div key={r.id} className="thread-item">
+                            <div className="thread-meta">
+                                {r.responder || 'Manager'} · {new Date(r.created_at).toLocaleString()}
+                            </div>
+                            <p className="thread-text">{r.response}</p>
+                        </div>
+                    ))}
+                </div>
+            )}
+
+            <div className="status-actions">
+                {inquiry.status === 'closed' ? (
+                    <button type="button" className="status-btn" onClick={() => changeStatus('reopen')}>
+                        Reopen
                     </button>
-                </form>
+                ) : (
+                    <button type="button" className="status-btn" onClick={() => changeStatus('close')}>
+                        Close Inquiry
+                    </button>
+                )}
             </div>
+
+            {inquiry.status !== 'closed' && (
+                <div className="response-section">
+                    <h3>{inquiry.status === 'answered' ? 'Send a Follow-up' : 'Respond to Inquiry'}</h3>
+                    <form onSubmit={handleResponseSubmit}>
+                        <textarea
+                            className="response-textarea"
+                            value={response}
+                            onChange={(e) => setResponse(e.target.value)}
+                            placeholder="Type your response here..."
+                            required
+                        />
+                        <button type="submit" className="submit-response-btn">
+                            Send
+                        </button>
+                    </form>
+                </div>
+            )}
         </div>
     );
 };
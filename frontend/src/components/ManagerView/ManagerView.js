@@ -1,35 +1,150 @@
-import React, { useState, useEffect, useMemo } from 'react';
+import React, { useState, useEffect, useMemo, useCallback, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import './ManagerView.css';
 
+const PAGE_SIZE = 50;
+const SEARCH_DEBOUNCE_MS = 300;
+const QUEUE_URGENCY_ORDER = ['High', 'Medium', 'Low', 'Pending', 'N/A'];
+
+const queueOrder = (a, b) => {
+  const rank = QUEUE_URGENCY_ORDER.indexOf(a.urgency) - QUEUE_URGENCY_ORDER.indexOf(b.urgency);
+  return rank !== 0 ? rank : a.created_at.localeCompare(b.created_at) || a.id - b.id;
+};
+
 const ManagerView = ({ username }) => {
   const [inquiries, setInquiries] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [sortConfig, setSortConfig] = useState({ key: null, direction: 'ascending' });
   const [filterCategory, setFilterCategory] = useState('All');
   const [filterUrgency, setFilterUrgency] = useState('All');
+  const [filterStatus, setFilterStatus] = useState('All');
+  const [backlog, setBacklog] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [debouncedSearchTerm, setDebouncedSearchTerm] = useState('');
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
+  const [reloadToken, setReloadToken] = useState(0);
+  const sentinelRef = useRef(null);
+  const mergeRef = useRef(null);
   const navigate = useNavigate();
 
   useEffect(() => {
-    const fetchInquiries = async () => {
+    const timeout = setTimeout(() => setDebouncedSearchTerm(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timeout);
+  }, [searchTerm]);
+
+  // Filtering and search run server-side, so a filter or search change starts a new cursor.
+  // The open queue is ordered by urgency and age on the server and has no further filters.
+  const openQueue = filterStatus === 'queue' && debouncedSearchTerm === '';
+
+  const fetchPage = useCallback(async (cursor) => {
+    const searching = debouncedSearchTerm !== '';
+    const params = new URLSearchParams({ limit: searching ? 20 : PAGE_SIZE });
+    if (searching) params.set('q', debouncedSearchTerm);
+    if (!openQueue) {
+      if (filterCategory !== 'All') params.set('category', filterCategory);
+      if (filterUrgency !== 'All') params.set('urgency', filterUrgency);
+      if (!searching && filterStatus !== 'All' && filterStatus !== 'queue') params.set('status', filterStatus);
+    }
+    if (cursor) params.set('cursor', cursor);
+
+    let path = '/api/manager/inquiries';
+    if (searching) path = '/api/manager/inquiries/search';
+    else if (openQueue) path = '/api/manager/inquiries/open';
+    const response = await fetch(`${process.env.REACT_APP_BACKEND_URL || ''}${path}?${params}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+  }, [filterCategory, filterUrgency, filterStatus, openQueue, debouncedSearchTerm]);
+
+  useEffect(() => {
+    let cancelled = false;
+    const fetchFirstPage = async () => {
+      setLoading(true);
       try {
-        const response = await fetch(`${process.env.REACT_APP_BACKEND_URL || ''}/api/manager/inquiries`);
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
+        const data = await fetchPage(null);
+        if (!cancelled) {
+          setInquiries(data.inquiries);
+          setNextCursor(data.next_cursor);
+          setBacklog(data.backlog || null);
         }
-        const data = await response.json();
-        setInquiries(data.inquiries);
       } catch (err) {
-        setError(err.message);
+        if (!cancelled) setError(err.message);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
-    fetchInquiries();
+    fetchFirstPage();
+    return () => { cancelled = true; };
+  }, [fetchPage, reloadToken]);
+
+  // Applies a live update to the loaded rows: updated rows are replaced (or dropped
+  // once they no longer match the filters) and new inquiries are inserted in order.
+  mergeRef.current = (event) => {
+    const searching = debouncedSearchTerm !== '';
+    const inquiry = event.inquiry;
+    // Archived inquiries leave every list; their events carry only the id.
+    if (event.type === 'inquiry.archived') {
+      setInquiries(prev => prev.filter(row => row.id !== inquiry.id));
+      return;
+    }
+    const matches = openQueue
+      ? inquiry.status === 'open'
+      : (filterCategory === 'All' || inquiry.category === filterCategory)
+        && (filterUrgency === 'All' || inquiry.urgency === filterUrgency)
+        && (filterStatus === 'All' || inquiry.status === filterStatus);
+
+    setInquiries(prev => {
+      const index = prev.findIndex(row => row.id === inquiry.id);
+      if (index !== -1) {
+        if (!matches) return prev.filter(row => row.id !== inquiry.id);
+        const next = [...prev];
+        next[index] = { ...prev[index], ...inquiry };
+        return openQueue && !nextCursor ? next.sort(queueOrder) : next;
+      }
+      if (!matches || searching || event.type !== 'inquiry.created') return prev;
+      // The open queue is ordered by urgency, so a new row is only placed once every page is loaded.
+      if (openQueue) return nextCursor ? prev : [...prev, inquiry].sort(queueOrder);
+      return [inquiry, ...prev];
+    });
+  };
+
+  // One stream for the lifetime of the view; the browser reconnects with Last-Event-ID.
+  useEffect(() => {
+    const source = new EventSource(`${process.env.REACT_APP_BACKEND_URL || ''}/api/manager/inquiries/stream`);
+    source.onmessage = (e) => mergeRef.current(JSON.parse(e.data));
+    // Sent when updates were missed; reload the first page instead.
+    source.addEventListener('reset', () => setReloadToken(token => token + 1));
+    return () => source.close();
   }, []);
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loading || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchPage(nextCursor);
+      setInquiries(prev => [...prev, ...data.inquiries]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [fetchPage, nextCursor, loading, loadingMore]);
+
+  // Infinite scroll: load the next page once the end of the table comes into view.
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel) return undefined;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) loadMore();
+    }, { rootMargin: '200px' });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [loadMore]);
+
   const sortedInquiries = useMemo(() => {
     let sortableItems = [...inquiries];
     if (sortConfig.key !== null) {
@@ -46,18 +161,6 @@ const ManagerView = ({ username }) => {
     return sortableItems;
   }, [inquiries, sortConfig]);
 
-  const filteredInquiries = useMemo(() => {
-    return sortedInquiries.filter(inquiry => {
-      const matchesCategory = filterCategory === 'All' || inquiry.category === filterCategory;
-      const matchesUrgency = filterUrgency === 'All' || inquiry.urgency === filterUrgency;
-      const matchesSearch = searchTerm === '' ||
-                            Object.values(inquiry).some(value =>
-                              String(value).toLowerCase().includes(searchTerm.toLowerCase())
-                            );
-      return matchesCategory && matchesUrgency && matchesSearch;
-    });
-  }, [sortedInquiries, filterCategory, filterUrgency, searchTerm]);
-
   const requestSort = (key) => {
     let direction = 'ascending';
     if (sortConfig.key === key && sortConfig.direction === 'ascending') {
@@ -82,10 +185,9 @@ const ManagerView = ({ username }) => {
       <h1 className="welcome-greeting">Hi, {username}!</h1>
       <p className="welcome-text">Here's a summary of the current inquiries to manage them efficiently.</p>
 
-      {loading && <div className="loading-message">Loading inquiries...</div>}
       {error && <div className="error-message">Error: {error}</div>}
 
-      {!loading && !error && (
+      {!error && (
         <>
           <div className="filter-search-section">
             <h2 className="section-title">Filter & Search:</h2>
@@ -93,22 +195,37 @@ const ManagerView = ({ username }) => {
               value={filterCategory}
               onChange={(e) => setFilterCategory(e.target.value)}
               className="filter-select"
+              disabled={openQueue}
             >
               <option value="All">All Categories</option>
               <option value="Technical">Technical</option>
               <option value="Billing">Billing</option>
               <option value="General">General</option>
               <option value="Sales">Sales</option>
+              <option value="Pending">Pending</option>
             </select>
             <select
               value={filterUrgency}
               onChange={(e) => setFilterUrgency(e.target.value)}
               className="filter-select"
+              disabled={openQueue}
             >
               <option value="All">All Urgencies</option>
               <option value="Low">Low</option>
               <option value="Medium">Medium</option>
               <option value="High">High</option>
+              <option value="Pending">Pending</option>
+            </select>
+            <select
+              value={filterStatus}
+              onChange={(e) => setFilterStatus(e.target.value)}
+              className="filter-select"
+            >
+              <option value="All">All Statuses</option>
+              <option value="queue">Open Queue (by urgency)</option>
+              <option value="open">Open</option>
+              <option value="answered">Answered</option>
+              <option value="closed">Closed</option>
             </select>
             <input
               type="text"
@@ -120,7 +237,15 @@ const ManagerView = ({ username }) => {
           </div>
 
           <div className="inquiries-table-section">
-            <h2 className="section-title">Inquiries</h2>
+            <h2 className="section-title">
+              Inquiries
+              {openQueue && backlog && (
+                <span className="backlog-count">
+                  {backlog.total} open
+                  {['High', 'Medium', 'Low'].map(u => backlog.by_urgency[u] ? ` · ${backlog.by_urgency[u]} ${u}` : '').join('')}
+                </span>
+              )}
+            </h2>
             <div className="table-responsive">
               <table className="inquiries-table">
                 <thead>
@@ -129,12 +254,17 @@ const ManagerView = ({ username }) => {
                     <th onClick={() => requestSort('category')}>Category {getSortIndicator('category')}</th>
                     <th onClick={() => requestSort('urgency')}>Urgency {getSortIndicator('urgency')}</th>
                     <th>Summary</th>
+                    <th onClick={() => requestSort('status')}>Status {getSortIndicator('status')}</th>
                     <th>Email</th>
                   </tr>
                 </thead>
                 <tbody>
-                  {filteredInquiries.length > 0 ? (
-                    filteredInquiries.map((inquiry) => (
+                  {loading ? (
+                    <tr>
+                      <td colSpan="6" className="loading-message">Loading inquiries...</td>
+                    </tr>
+                  ) : sortedInquiries.length > 0 ? (
+                    sortedInquiries.map((inquiry) => (
                       <tr key={inquiry.id} onClick={() => handleRowClick(inquiry.id)}>
                         <td>{inquiry.id}</td>
                         <td>{inquiry.category}</td>
@@ -142,19 +272,37 @@ const ManagerView = ({ username }) => {
                           <span className={`urgency-icon urgency-icon-${inquiry.urgency.toLowerCase()}`}></span>
                           {inquiry.urgency}
                         </td>
-                        <td>{inquiry.summary}</td>
+                        <td>
+                          {/* Highlights are HTML-escaped by the backend; only <mark> tags are added. */}
+                          {inquiry.summary_highlight ? (
+                            <span dangerouslySetInnerHTML={{ __html: inquiry.summary_highlight }} />
+                          ) : (
+                            inquiry.summary
+                          )}
+                          {inquiry.inquiry_highlight && (
+                            <div
+                              className="search-snippet"
+                              dangerouslySetInnerHTML={{ __html: inquiry.inquiry_highlight }}
+                            />
+                          )}
+                        </td>
+                        <td>
+                          <span className={`status-badge status-badge-${inquiry.status}`}>{inquiry.status}</span>
+                        </td>
                         <td>{inquiry.email}</td>
                       </tr>
                     ))
                   ) : (
                     <tr>
-                      <td colSpan="5" className="no-inquiries-found">
+                      <td colSpan="6" className="no-inquiries-found">
                         No inquiries found matching your criteria.
                       </td>
                     </tr>
                   )}
                 </tbody>
               </table>
+              <div ref={sentinelRef} />
+              {loadingMore && <div className="loading-message">Loading more inquiries...</div>}
             </div>
           </div>
         </>